@@ -1,39 +1,217 @@
 import streamlit as st
+import pandas as pd
 import os
 import logging
-from dotenv import load_dotenv
 import yaml
-from typing import List
+import re
+import json
+import copy
+import hashlib
+import time
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Load environment variables first
-load_dotenv()
+try:
+    # libyaml-backed loader when PyYAML was built with it
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Load environment variables first; env_config owns .env parsing so Reload environment can re-read it
+from env_config import S3Config, load_environment, get_s3_config, get_aws_session, reset_aws_clients
+load_environment()
 
 # Import modules after loading environment
 from pdf_processor import PDFProcessor
-from bedrock_client import BedrockClient
+from bedrock_client import (BedrockClient, MAX_DOCUMENT_CHARS, MULTI_DOCUMENT_MAX_CHARS, GENERAL_SECTION,
+                            BATCH_TERMINAL_STATUSES)
 from output_handler import OutputHandler
 from bot_interface import BotInterface
-from env_config import get_s3_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of concurrent Bedrock extraction requests
+MAX_EXTRACTION_WORKERS = 8
+
+# Upper bound on PDFs downloaded and parsed in parallel (further capped by CPU count)
+MAX_PDF_WORKERS = 8
+
+# Maximum number of PDFs listed from the input location
+MAX_LISTED_PDFS = 5000
+
+# Bedrock Batch Inference rejects jobs with fewer records than this
+BATCH_INFERENCE_MIN_PDFS = 100
+# Seconds a script run waits on a pending batch job; 0 checks its status once per rerun
+BATCH_STATUS_TIMEOUT_SECONDS = 0
+
+# Minimum seconds between re-renders of a streaming chatbot answer
+STREAM_RENDER_INTERVAL = 0.1
+
+# Status glyphs; confidence tiers index COLOR_BY_TIER by (c > 0.5) + (c > 0.8)
+GREEN, YELLOW, RED, OK, NO = "🟢", "🟡", "🔴", "✅", "❌"
+COLOR_BY_TIER = (RED, YELLOW, GREEN)
+NOT_SET = f"{NO} Not Set"
+
+# Static page text, built once at import instead of on every rerun
+INTRO_MD = """
+This app allows you to select financial statement PDFs from an AWS S3 bucket, extract key financial attributes using AWS Bedrock Claude, and analyze the data with an interactive chatbot.
+
+**S3 Configuration Support:**
+- **Single Bucket Mode**: Use one bucket with separate folders for input and output
+- **Separate Buckets Mode**: Use different buckets for input and output (legacy)
+"""
+
+CONFIDENCE_EXPLANATION_MD = """
+**Confidence Score Calculation:**
+
+Each extracted attribute receives a confidence score (0-100%) based on four factors:
+
+1. **Text Clarity (25% weight)**: How clear and readable is the source text?
+   - 🟢 90-100%: Perfect, clear text with no ambiguity
+   - 🟡 60-89%: Minor formatting issues or slight ambiguity  
+   - 🔴 0-59%: Significant text quality issues or OCR errors
+
+2. **Exact Match (30% weight)**: How well does the found text match the attribute description?
+   - 🟢 90-100%: Perfect match with expected attribute name/label
+   - 🟡 60-89%: Close match with minor variations in terminology
+   - 🔴 0-59%: Weak match, significant interpretation needed
+
+3. **Context Match (25% weight)**: Is the value found in the right context/section?
+   - 🟢 90-100%: Found in perfect context (e.g., income statement for revenue)
+   - 🟡 60-89%: Found in appropriate section with minor context issues
+   - 🔴 0-59%: Found in questionable or wrong context
+
+4. **Format Validity (20% weight)**: Is the extracted value in the expected format?
+   - 🟢 90-100%: Perfect format (e.g., proper number format for currency)
+   - 🟡 60-89%: Minor format issues but clearly interpretable
+   - 🔴 0-59%: Significant format problems or invalid format
+
+**Final Formula:**
+```
+Confidence = (Text Clarity × 0.25) + (Exact Match × 0.30) + (Context Match × 0.25) + (Format Validity × 0.20)
+```
+
+**Quality Indicators:**
+- 🟢 **High Quality (80-100%)**: Reliable extraction, minimal review needed
+- 🟡 **Medium Quality (50-79%)**: Good extraction, may need verification
+- 🔴 **Low Quality (0-49%)**: Requires manual review and validation
+"""
+
 # Load config.yaml
 @st.cache_data
 def load_config():
     with open("config.yaml", "r") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=YamlLoader)
 
 config = load_config()
 
+def _compile_section_pattern(sections: List[Dict[str, Any]]):
+    """Compile one multi-heading regex for the configured statement sections"""
+    headings = [heading for section in sections for heading in section.get('headings', [])]
+    if not headings:
+        return None
+    alternatives = "|".join(re.escape(heading) for heading in sorted(headings, key=len, reverse=True))
+    return re.compile(rf"^[ \t]*({alternatives})\b", re.IGNORECASE | re.MULTILINE)
+
+# Short documents grouped into one Bedrock extraction request
+DOCUMENTS_PER_REQUEST = max(1, int(config.get('aws', {}).get('documents_per_request', 1)))
+
+SECTION_PATTERN = _compile_section_pattern(config.get('sections', []))
+SECTION_BY_HEADING = {
+    heading.lower(): section['name']
+    for section in config.get('sections', [])
+    for heading in section.get('headings', [])
+}
+
+def _section_chunk(text: str) -> Dict[str, str]:
+    """Split document text at statement headings; returns {} when no heading is found"""
+    matches = list(SECTION_PATTERN.finditer(text)) if SECTION_PATTERN else []
+    if not matches:
+        return {}
+    
+    parts = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        section = SECTION_BY_HEADING[match.group(1).lower()]
+        end = next_match.start() if next_match else len(text)
+        parts.setdefault(section, []).append(text[match.start():end])
+    
+    chunks = {section: "\n".join(section_parts) for section, section_parts in parts.items()}
+    chunks[GENERAL_SECTION] = text[:matches[0].start()].strip() or text[:MAX_DOCUMENT_CHARS]
+    return chunks
+
+def _group_attributes_by_section(attributes_config: List[Dict]) -> Dict[str, List[Dict]]:
+    """Group attribute definitions by their configured section"""
+    groups = {}
+    for attr in attributes_config:
+        groups.setdefault(attr.get('section', GENERAL_SECTION), []).append(attr)
+    return groups
+
+@st.cache_resource
+def get_boto_session():
+    return get_aws_session()
+
+@dataclass(frozen=True)
+class EnvSnapshot:
+    """Environment settings read once per process rather than on every Streamlit rerun"""
+    aws_region: Optional[str]
+    access_key_set: bool
+    secret_key_set: bool
+    batch_role_arn: Optional[str]
+    s3: S3Config
+
+@st.cache_resource
+def get_env_snapshot() -> EnvSnapshot:
+    env_vars = load_environment()  # Applies .env values and defaults before anything is read
+    return EnvSnapshot(
+        aws_region=env_vars['aws_region'],
+        access_key_set=bool(env_vars['aws_access_key_id']),
+        secret_key_set=bool(env_vars['aws_secret_access_key']),
+        batch_role_arn=os.getenv('BEDROCK_BATCH_ROLE_ARN'),
+        s3=get_s3_config()
+    )
+
+@st.cache_resource
+def get_env_status_table() -> pd.DataFrame:
+    """Environment Status rows as one DataFrame, built once per environment snapshot"""
+    env = get_env_snapshot()
+    s3_config = env.s3
+    
+    # AWS Status
+    aws_status = {
+        "AWS Region": env.aws_region or NOT_SET,
+        "AWS Access Key": f"{OK} Set" if env.access_key_set else NOT_SET,
+        "AWS Secret Key": f"{OK} Set" if env.secret_key_set else NOT_SET
+    }
+    
+    # S3 Status
+    if s3_config.use_single_bucket:
+        aws_status.update({
+            "S3 Bucket": s3_config.bucket_name or NOT_SET,
+            "Input Folder": s3_config.input_folder or NOT_SET,
+            "Output Folder": s3_config.output_folder or NOT_SET
+        })
+    else:
+        aws_status.update({
+            "Input Bucket": s3_config.input_bucket or NOT_SET,
+            "Output Bucket": s3_config.output_bucket or NOT_SET
+        })
+    
+    return pd.DataFrame(
+        [(key, value, value != NOT_SET) for key, value in aws_status.items()],
+        columns=["Setting", "Value", "OK"]
+    ).set_index("Setting")
+
 # Initialize clients with proper error handling
 @st.cache_resource
-def initialize_clients():
+def initialize_clients(performance_config: str = None):
     try:
-        # Check S3 configuration
-        s3_config = get_s3_config()
+        # Check S3 configuration (shared with the Environment Status snapshot)
+        env = get_env_snapshot()
+        s3_config = env.s3
         
-        if s3_config['use_single_bucket']:
+        if s3_config.use_single_bucket:
             required_vars = ['S3_BUCKET_NAME', 'AWS_REGION']
             missing_vars = []
             if not os.getenv('S3_BUCKET_NAME'):
@@ -46,14 +224,14 @@ def initialize_clients():
             if not os.getenv('S3_OUTPUT_BUCKET'):
                 missing_vars.append('S3_OUTPUT_BUCKET')
         
-        if not os.getenv('AWS_REGION'):
+        if not env.aws_region:
             missing_vars.append('AWS_REGION')
         
         if missing_vars:
             st.error(f"Missing required environment variables: {', '.join(missing_vars)}")
             st.info("Please set the following environment variables in your .env file:")
             
-            if s3_config['use_single_bucket'] or not any([os.getenv('S3_INPUT_BUCKET'), os.getenv('S3_OUTPUT_BUCKET')]):
+            if s3_config.use_single_bucket or not any([os.getenv('S3_INPUT_BUCKET'), os.getenv('S3_OUTPUT_BUCKET')]):
                 st.code("# Single bucket with folders configuration")
                 st.code("S3_BUCKET_NAME=your-bucket-name")
                 st.code("S3_INPUT_FOLDER=inputfolder")
@@ -69,9 +247,11 @@ def initialize_clients():
             
             return None, None, None, None
         
-        pdf_processor = PDFProcessor()
-        bedrock_client = BedrockClient()
-        output_handler = OutputHandler()
+        # One boto3 session shared by every client (credentials resolved once)
+        session = get_boto_session()
+        pdf_processor = PDFProcessor(session=session)
+        bedrock_client = BedrockClient(performance_config=performance_config, session=session)
+        output_handler = OutputHandler(session=session)
         bot_interface = BotInterface(bedrock_client=bedrock_client)
         
         return pdf_processor, bedrock_client, output_handler, bot_interface
@@ -79,59 +259,294 @@ def initialize_clients():
         st.error(f"Error initializing clients: {str(e)}")
         return None, None, None, None
 
-# Initialize clients
-pdf_processor, bedrock_client, output_handler, bot_interface = initialize_clients()
+@st.cache_data(ttl=60, show_spinner=False)
+def list_input_pdfs(bucket: str) -> List[Dict[str, Any]]:
+    """
+    List input PDFs, cached briefly so widget-triggered reruns don't re-list the bucket
+    
+    The input folder comes from the processor's S3 configuration; Reload environment
+    clears this cache when that changes.
+    """
+    return pdf_processor.list_pdfs_from_s3(bucket, max_items=MAX_LISTED_PDFS)
+
+def _prepare_extraction_jobs(pdf_results: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """
+    Fill in empty results for PDFs without text and group the rest by text hash,
+    so each distinct text is sent to Bedrock only once
+    """
+    jobs = {}
+    for idx, pdf_result in enumerate(pdf_results):
+        text = pdf_result.get('text', '')
+        if text:
+            text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            jobs.setdefault(text_hash, []).append(idx)
+        else:
+            pdf_result['extracted_attributes'] = {}
+            pdf_result['extraction_metadata'] = {
+                'processing_date': '',
+                'confidence_score': 0.0,
+                'extraction_method': pdf_result.get('extraction_method', 'none')
+            }
+    return jobs
+
+def _apply_attributes(pdf_results: List[Dict[str, Any]], indices: List[int], attributes: Dict[str, Any]):
+    """Write one extraction result to every PDF that shared the same text"""
+    for position, idx in enumerate(indices):
+        # Duplicates get their own copy so later per-PDF edits don't leak across results
+        result = attributes if position == 0 else copy.deepcopy(attributes)
+        pdf_results[idx]['extracted_attributes'] = result.get('extracted_attributes', {})
+        pdf_results[idx]['extraction_metadata'] = result.get('extraction_metadata', {})
+
+class _UncachedExtraction(Exception):
+    """Raised from the cached extractor so failed extractions are returned but not cached"""
+    
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("Attribute extraction failed")
+        self.result = result
+
+@st.cache_data(ttl=24 * 3600, max_entries=512, show_spinner=False)
+def _cached_extract_attributes(text_hash: str, attributes_hash: str, model_id: str,
+                               _text: str, _attributes_config: List[Dict]) -> Dict[str, Any]:
+    """Bedrock extraction keyed on hashes of the text and attribute config; raw inputs aren't hashed"""
+    # Long documents are split by statement section so no attribute's section is truncated away
+    text_chunks = _section_chunk(_text) if len(_text) > MAX_DOCUMENT_CHARS else {}
+    if len(text_chunks) > 1:
+        attributes = bedrock_client.extract_attributes_batched(text_chunks, _group_attributes_by_section(_attributes_config))
+    else:
+        attributes = bedrock_client.extract_attributes(_text, _attributes_config)
+    if 'error' in attributes or 'error' in attributes.get('extraction_metadata', {}):
+        raise _UncachedExtraction(attributes)
+    return attributes
+
+def extract_attributes_cached(text: str, text_hash: str, attributes_config: List[Dict], attributes_hash: str) -> Dict[str, Any]:
+    """Extract attributes, reusing results for text already extracted with the same attribute config"""
+    try:
+        return _cached_extract_attributes(text_hash, attributes_hash, bedrock_client.model_id, text, attributes_config)
+    except _UncachedExtraction as e:
+        return e.result
+
+@st.cache_data(ttl=24 * 3600, max_entries=512, show_spinner=False)
+def _cached_extract_attributes_multi(text_hashes: tuple, attributes_hash: str, model_id: str,
+                                     _texts: List[str], _attributes_config: List[Dict]) -> List[Dict[str, Any]]:
+    """Multi-document Bedrock extraction keyed on the ordered text hashes of the group"""
+    results = bedrock_client.extract_attributes_multi(_texts, _attributes_config)
+    if any('error' in r or 'error' in r.get('extraction_metadata', {}) for r in results):
+        raise _UncachedExtraction(results)
+    return results
+
+def extract_attributes_multi_cached(texts: List[str], text_hashes: List[str], attributes_config: List[Dict],
+                                    attributes_hash: str) -> List[Dict[str, Any]]:
+    """Extract attributes for a group of short documents, reusing results for a previously seen group"""
+    try:
+        return _cached_extract_attributes_multi(tuple(text_hashes), attributes_hash, bedrock_client.model_id, texts, attributes_config)
+    except _UncachedExtraction as e:
+        return e.result
+
+def _plan_extraction_requests(jobs: Dict[str, List[int]], pdf_results: List[Dict[str, Any]]) -> List[List[str]]:
+    """Group short documents DOCUMENTS_PER_REQUEST at a time; longer documents get a request each"""
+    if DOCUMENTS_PER_REQUEST == 1:
+        return [[text_hash] for text_hash in jobs]
+    
+    short_hashes = [
+        text_hash for text_hash, indices in jobs.items()
+        if len(pdf_results[indices[0]]['text']) <= MULTI_DOCUMENT_MAX_CHARS
+    ]
+    short_set = set(short_hashes)
+    requests = [[text_hash] for text_hash in jobs if text_hash not in short_set]
+    requests.extend(
+        short_hashes[i:i + DOCUMENTS_PER_REQUEST] for i in range(0, len(short_hashes), DOCUMENTS_PER_REQUEST)
+    )
+    return requests
+
+def extract_attributes_parallel(pdf_results: List[Dict[str, Any]], attributes_config: List[Dict],
+                                jobs: Optional[Dict[str, List[int]]] = None) -> List[Dict[str, Any]]:
+    """
+    Run Bedrock attribute extraction for all PDFs concurrently, preserving input order
+    
+    jobs is the output of _prepare_extraction_jobs when the caller has already grouped the PDFs
+    """
+    if jobs is None:
+        jobs = _prepare_extraction_jobs(pdf_results)
+    
+    if jobs:
+        attributes_hash = hashlib.sha256(json.dumps(
+            {'attributes': attributes_config, 'sections': config.get('sections', [])}, sort_keys=True
+        ).encode('utf-8')).hexdigest()
+        requests = _plan_extraction_requests(jobs, pdf_results)
+        with ThreadPoolExecutor(max_workers=min(MAX_EXTRACTION_WORKERS, len(requests))) as executor:
+            future_to_hashes = {}
+            for text_hashes in requests:
+                texts = [pdf_results[jobs[text_hash][0]]['text'] for text_hash in text_hashes]
+                if len(text_hashes) == 1:
+                    future = executor.submit(extract_attributes_cached, texts[0], text_hashes[0],
+                                             attributes_config, attributes_hash)
+                else:
+                    future = executor.submit(extract_attributes_multi_cached, texts, text_hashes,
+                                             attributes_config, attributes_hash)
+                future_to_hashes[future] = text_hashes
+            
+            for future in as_completed(future_to_hashes):
+                text_hashes = future_to_hashes[future]
+                try:
+                    results = future.result()
+                    if len(text_hashes) == 1:
+                        results = [results]
+                except Exception as e:
+                    filenames = [pdf_results[jobs[text_hash][0]].get('filename') for text_hash in text_hashes]
+                    logger.error(f"Attribute extraction failed for {', '.join(map(str, filenames))}: {str(e)}")
+                    results = [bedrock_client._get_empty_attributes_response(attributes_config) for _ in text_hashes]
+                
+                for text_hash, attributes in zip(text_hashes, results):
+                    _apply_attributes(pdf_results, jobs[text_hash], attributes)
+    
+    return pdf_results
+
+def extract_attributes_batch(pdf_results: List[Dict[str, Any]], attributes_config: List[Dict]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Run Bedrock attribute extraction for all PDFs as a single Batch Inference job
+    
+    The job is only submitted here: it is recorded in st.session_state.batch_job and None is
+    returned, and check_batch_job() collects the results on a later rerun. Results are returned
+    directly when the PDFs are extracted per request instead.
+    """
+    jobs = _prepare_extraction_jobs(pdf_results)
+    if not jobs:
+        return pdf_results
+    
+    # Bedrock rejects batch jobs below its minimum record count; duplicate texts are only
+    # sent once, so the count that matters is the distinct texts, not the selected PDFs
+    if len(jobs) < BATCH_INFERENCE_MIN_PDFS:
+        logger.info(f"{len(jobs)} distinct texts is below the batch minimum, extracting per request")
+        return extract_attributes_parallel(pdf_results, attributes_config, jobs)
+    
+    record_hashes = {f"REC{number:08d}": text_hash for number, text_hash in enumerate(jobs)}
+    texts = {record_id: pdf_results[jobs[text_hash][0]]['text'] for record_id, text_hash in record_hashes.items()}
+    prefix = f"{output_handler.output_folder}/" if output_handler.output_folder else "Output/"
+    
+    try:
+        job_arn = bedrock_client.submit_batch_extraction_job(
+            texts, attributes_config, output_handler.s3_client,
+            output_handler.output_bucket, prefix, env.batch_role_arn
+        )
+    except Exception as e:
+        logger.error(f"Batch inference submission failed: {str(e)}")
+        st.warning(f"Batch inference job could not be submitted ({str(e)}), extracting per request")
+        return extract_attributes_parallel(pdf_results, attributes_config, jobs)
+    
+    st.session_state.batch_job = {
+        'job_arn': job_arn,
+        'pdf_results': pdf_results,
+        'jobs': jobs,
+        'record_hashes': record_hashes,
+        'attributes_config': attributes_config
+    }
+    return None
+
+def check_batch_job() -> Optional[List[Dict[str, Any]]]:
+    """
+    Check the batch job in st.session_state.batch_job without blocking the script run
+    
+    Returns:
+        The PDF results once the job has ended, or None while it is still running.
+        Records the job didn't return results for are extracted per request.
+    """
+    batch_job = st.session_state.batch_job
+    job_arn, attributes_config = batch_job['job_arn'], batch_job['attributes_config']
+    
+    job_status = bedrock_client.wait_for_batch_job(job_arn, timeout=BATCH_STATUS_TIMEOUT_SECONDS)
+    if job_status not in BATCH_TERMINAL_STATUSES:
+        st.info(f"Batch inference job `{job_arn}` is {job_status.lower()}. "
+                "Results are collected on the next check once it finishes.")
+        st.button("Check batch job status")
+        return None
+    
+    del st.session_state.batch_job
+    results = {}
+    if job_status in ('Completed', 'PartiallyCompleted'):
+        try:
+            results = bedrock_client.get_batch_extraction_results(job_arn, attributes_config, output_handler.s3_client)
+        except Exception as e:
+            logger.error(f"Reading batch inference results failed: {str(e)}")
+    else:
+        st.warning(f"Batch inference job ended with status: {job_status}, extracting per request")
+    
+    pdf_results, jobs = batch_job['pdf_results'], batch_job['jobs']
+    missing = {}
+    for record_id, text_hash in batch_job['record_hashes'].items():
+        attributes = results.get(record_id)
+        if attributes:
+            _apply_attributes(pdf_results, jobs[text_hash], attributes)
+        else:
+            missing[text_hash] = jobs[text_hash]
+    
+    if missing:
+        logger.info(f"Batch inference returned no result for {len(missing)} records, extracting per request")
+        extract_attributes_parallel(pdf_results, attributes_config, missing)
+    return pdf_results
 
 st.set_page_config(page_title="Financial PDF Extractor & Bot", layout="wide")
 
-st.title("Financial Statement Extraction & Analysis")
+# Model settings are read before client initialization since they configure the Bedrock client
+st.sidebar.header("Model Settings")
+latency_optimized = st.sidebar.checkbox(
+    "Latency-optimized inference",
+    help="Requests Bedrock latency-optimized inference. Requires a Claude model and region "
+         "that support latency-optimized inference."
+)
 
-st.markdown("""
-This app allows you to select financial statement PDFs from an AWS S3 bucket, extract key financial attributes using AWS Bedrock Claude, and analyze the data with an interactive chatbot.
+# Initialize clients
+pdf_processor, bedrock_client, output_handler, bot_interface = initialize_clients(
+    'optimized' if latency_optimized else None
+)
 
-**S3 Configuration Support:**
-- **Single Bucket Mode**: Use one bucket with separate folders for input and output
-- **Separate Buckets Mode**: Use different buckets for input and output (legacy)
-""")
+st.title("Financial Statement Extraction & Analysis")
+
+st.markdown(INTRO_MD)
 
 # Check if clients are initialized
 if not all([pdf_processor, bedrock_client, output_handler, bot_interface]):
     st.stop()
 
+env = get_env_snapshot()
+s3_config = env.s3
+
 # Sidebar for S3 PDF selection
 st.sidebar.header("Select PDFs from S3")
 
 try:
-    s3_config = get_s3_config()
-    
     # Display S3 configuration
     st.sidebar.subheader("📁 S3 Configuration")
-    if s3_config['use_single_bucket']:
-        st.sidebar.success(f"**Bucket:** {s3_config['bucket_name']}")
-        st.sidebar.info(f"**Input Folder:** {s3_config['input_folder']}")
-        st.sidebar.info(f"**Output Folder:** {s3_config['output_folder']}")
+    if s3_config.use_single_bucket:
+        st.sidebar.success(f"**Bucket:** {s3_config.bucket_name}")
+        st.sidebar.info(f"**Input Folder:** {s3_config.input_folder}")
+        st.sidebar.info(f"**Output Folder:** {s3_config.output_folder}")
     else:
-        st.sidebar.info(f"**Input Bucket:** {s3_config['input_bucket']}")
-        st.sidebar.info(f"**Output Bucket:** {s3_config['output_bucket']}")
+        st.sidebar.info(f"**Input Bucket:** {s3_config.input_bucket}")
+        st.sidebar.info(f"**Output Bucket:** {s3_config.output_bucket}")
     
     # List PDFs
-    pdf_files = pdf_processor.list_pdfs_from_s3()
+    if s3_config.use_single_bucket:
+        pdf_files = list_input_pdfs(s3_config.bucket_name)
+    else:
+        pdf_files = list_input_pdfs(s3_config.input_bucket)
     
     if not pdf_files:
         st.sidebar.warning("No PDF files found in the S3 input location.")
         st.sidebar.info("Please upload PDF files to your configured input location.")
         st.stop()
     
-    st.sidebar.success(f"Found {len(pdf_files)} PDF files")
+    if len(pdf_files) >= MAX_LISTED_PDFS:
+        st.sidebar.success(f"Found {len(pdf_files)}+ PDF files (showing the newest {MAX_LISTED_PDFS})")
+    else:
+        st.sidebar.success(f"Found {len(pdf_files)} PDF files")
     
-    pdf_options = [f"{pdf['filename']} ({pdf['size_mb']} MB)" for pdf in pdf_files]
     selected_indices = st.sidebar.multiselect(
         "Select one or more PDFs to process", 
-        range(len(pdf_options)), 
-        format_func=lambda x: pdf_options[x]
+        range(len(pdf_files)), 
+        format_func=lambda i: f"{pdf_files[i]['filename']} ({pdf_files[i]['size_mb']} MB)"
     )
     
-    selected_pdf_keys = [pdf_files[i]['key'] for i in selected_indices]
+    selected_pdfs = [pdf_files[i] for i in selected_indices]
     selected_bucket = pdf_files[0]['bucket'] if pdf_files else None
     
 except Exception as e:
@@ -139,106 +554,118 @@ except Exception as e:
     st.sidebar.info("Please check your AWS credentials and S3 configuration.")
     st.stop()
 
+upload_concurrency = st.sidebar.slider(
+    "Upload concurrency",
+    min_value=1,
+    max_value=32,
+    value=8,
+    help="Number of individual JSON outputs uploaded to S3 in parallel"
+)
+
+use_batch_inference = st.sidebar.checkbox(
+    "Use Bedrock Batch Inference (lower cost, async)",
+    disabled=not env.batch_role_arn,
+    help=f"Submits one batch job instead of one request per PDF when {BATCH_INFERENCE_MIN_PDFS} or more PDFs "
+         "are selected. Requires BEDROCK_BATCH_ROLE_ARN to be set."
+)
+
+# Extraction results persist across reruns for the chatbot
+if 'extracted_results' not in st.session_state:
+    st.session_state.extracted_results = []
+    st.session_state.bot_context = {}
+
+def save_and_show_outputs(extracted_results: List[Dict[str, Any]]):
+    """Save extraction outputs to S3, keep them for the chatbot and show their download links"""
+    # Save outputs to S3
+    output_summary = output_handler.process_and_save_all_outputs(extracted_results, max_workers=upload_concurrency)
+    
+    # Keep results for this session and give the chatbot only what it reads (no raw text)
+    st.session_state.extracted_results = extracted_results
+    st.session_state.bot_context = {
+        "consolidated_data": [
+            {
+                'filename': result.get('filename'),
+                'extracted_attributes': result.get('extracted_attributes', {})
+            }
+            for result in extracted_results
+        ]
+    }
+    bot_interface.set_context_data(st.session_state.bot_context)
+    
+    st.success("Extraction and saving completed!")
+    
+    # Show download links
+    st.header("Download Extracted Outputs")
+    
+    # Display S3 output location info
+    if s3_config.use_single_bucket:
+        st.info(f"📁 Files saved to: **{s3_config.bucket_name}/{s3_config.output_folder}/**")
+    else:
+        st.info(f"📁 Files saved to: **{s3_config.output_bucket}**")
+    
+    if output_summary.get("download_links"):
+        dl_links = output_summary["download_links"]
+    
+        st.subheader("Individual JSON Files")
+        json_lines = []
+        for json_file in dl_links.get("individual_jsons", []):
+            confidence = json_file['confidence_score']
+            confidence_color = COLOR_BY_TIER[(confidence > 0.5) + (confidence > 0.8)]
+            json_lines.append(f"- {confidence_color} [{json_file['filename']}]({json_file['download_url']}) (Confidence: {confidence:.2%})")
+        if json_lines:
+            st.markdown("\n".join(json_lines))
+    
+        st.subheader("Consolidated Excel Report")
+        excel_link = dl_links.get("consolidated_excel")
+        if excel_link:
+            st.markdown(f"- 📊 [{excel_link['filename']}]({excel_link['download_url']}) - **Includes detailed confidence analysis**")
+        else:
+            st.info("No consolidated Excel report available.")
+    
+        # Display confidence score explanation
+        with st.expander("📊 Understanding Confidence Scores"):
+            st.markdown(CONFIDENCE_EXPLANATION_MD)
+    else:
+        st.info("No download links available.")
+
 # Extract button
 if st.sidebar.button("Extract Data from Selected PDFs"):
-    if not selected_pdf_keys:
+    if not selected_pdfs:
         st.sidebar.warning("Please select at least one PDF to extract.")
+    elif st.session_state.get('batch_job'):
+        st.sidebar.warning("A batch inference job is still running; wait for it to finish before extracting again.")
     else:
         with st.spinner("Processing PDFs and extracting data..."):
             # Process PDFs
-            pdf_results = pdf_processor.process_multiple_pdfs(selected_bucket, selected_pdf_keys)
+            progress_bar = st.progress(0.0, text="Extracting text from PDFs...")
+            pdf_results = pdf_processor.process_multiple_pdfs(
+                selected_bucket,
+                selected_pdfs,
+                max_workers=min(MAX_PDF_WORKERS, os.cpu_count() or 1),
+                strategy="auto",
+                progress_callback=lambda done, total: progress_bar.progress(
+                    done / total, text=f"Extracted text from {done}/{total} PDFs"
+                )
+            )
+            progress_bar.empty()
             
             # Extract attributes using Bedrock
-            extracted_results = []
-            for pdf_result in pdf_results:
-                text = pdf_result.get('text', '')
-                if not text:
-                    pdf_result['extracted_attributes'] = {}
-                    pdf_result['extraction_metadata'] = {
-                        'processing_date': '',
-                        'confidence_score': 0.0,
-                        'extraction_method': pdf_result.get('extraction_method', 'none')
-                    }
-                    extracted_results.append(pdf_result)
-                    continue
-                
-                attributes = bedrock_client.extract_attributes(text, config['attributes'])
-                pdf_result['extracted_attributes'] = attributes.get('extracted_attributes', {})
-                pdf_result['extraction_metadata'] = attributes.get('extraction_metadata', {})
-                extracted_results.append(pdf_result)
-            
-            # Save outputs to S3
-            output_summary = output_handler.process_and_save_all_outputs(extracted_results)
-            
-            # Update chatbot context
-            bot_interface.set_context_data({"consolidated_data": extracted_results})
-            
-            st.success("Extraction and saving completed!")
-            
-            # Show download links
-            st.header("Download Extracted Outputs")
-            
-            # Display S3 output location info
-            if s3_config['use_single_bucket']:
-                st.info(f"📁 Files saved to: **{s3_config['bucket_name']}/{s3_config['output_folder']}/**")
+            if use_batch_inference and len(pdf_results) >= BATCH_INFERENCE_MIN_PDFS:
+                extracted_results = extract_attributes_batch(pdf_results, config['attributes'])
             else:
-                st.info(f"📁 Files saved to: **{s3_config['output_bucket']}**")
+                extracted_results = extract_attributes_parallel(pdf_results, config['attributes'])
             
-            if output_summary.get("download_links"):
-                dl_links = output_summary["download_links"]
-                
-                st.subheader("Individual JSON Files")
-                for json_file in dl_links.get("individual_jsons", []):
-                    confidence = json_file['confidence_score']
-                    confidence_color = "🟢" if confidence > 0.8 else "🟡" if confidence > 0.5 else "🔴"
-                    st.markdown(f"- {confidence_color} [{json_file['filename']}]({json_file['download_url']}) (Confidence: {confidence:.2%})")
-                
-                st.subheader("Consolidated Excel Report")
-                excel_link = dl_links.get("consolidated_excel")
-                if excel_link:
-                    st.markdown(f"- 📊 [{excel_link['filename']}]({excel_link['download_url']}) - **Includes detailed confidence analysis**")
-                else:
-                    st.info("No consolidated Excel report available.")
-                
-                # Display confidence score explanation
-                with st.expander("📊 Understanding Confidence Scores"):
-                    st.markdown("""
-                    **Confidence Score Calculation:**
-                    
-                    Each extracted attribute receives a confidence score (0-100%) based on four factors:
-                    
-                    1. **Text Clarity (25% weight)**: How clear and readable is the source text?
-                       - 🟢 90-100%: Perfect, clear text with no ambiguity
-                       - 🟡 60-89%: Minor formatting issues or slight ambiguity  
-                       - 🔴 0-59%: Significant text quality issues or OCR errors
-                    
-                    2. **Exact Match (30% weight)**: How well does the found text match the attribute description?
-                       - 🟢 90-100%: Perfect match with expected attribute name/label
-                       - 🟡 60-89%: Close match with minor variations in terminology
-                       - 🔴 0-59%: Weak match, significant interpretation needed
-                    
-                    3. **Context Match (25% weight)**: Is the value found in the right context/section?
-                       - 🟢 90-100%: Found in perfect context (e.g., income statement for revenue)
-                       - 🟡 60-89%: Found in appropriate section with minor context issues
-                       - 🔴 0-59%: Found in questionable or wrong context
-                    
-                    4. **Format Validity (20% weight)**: Is the extracted value in the expected format?
-                       - 🟢 90-100%: Perfect format (e.g., proper number format for currency)
-                       - 🟡 60-89%: Minor format issues but clearly interpretable
-                       - 🔴 0-59%: Significant format problems or invalid format
-                    
-                    **Final Formula:**
-                    ```
-                    Confidence = (Text Clarity × 0.25) + (Exact Match × 0.30) + (Context Match × 0.25) + (Format Validity × 0.20)
-                    ```
-                    
-                    **Quality Indicators:**
-                    - 🟢 **High Quality (80-100%)**: Reliable extraction, minimal review needed
-                    - 🟡 **Medium Quality (50-79%)**: Good extraction, may need verification
-                    - 🔴 **Low Quality (0-49%)**: Requires manual review and validation
-                    """)
+            # A submitted batch job is picked up by check_batch_job on later reruns
+            if extracted_results is not None:
+                save_and_show_outputs(extracted_results)
             else:
-                st.info("No download links available.")
+                st.info("Batch inference job submitted. Its status is checked each time the page reruns.")
+elif st.session_state.get('batch_job'):
+    with st.spinner("Checking batch inference job..."):
+        extracted_results = check_batch_job()
+    if extracted_results is not None:
+        with st.spinner("Saving extracted outputs..."):
+            save_and_show_outputs(extracted_results)
 else:
     st.info("Select PDFs from the sidebar and click 'Extract Data from Selected PDFs' to begin.")
 
@@ -248,38 +675,38 @@ st.header("Financial Data Chatbot")
 user_question = st.text_input("Ask a question or provide an observation about the extracted financial data:")
 
 if user_question:
-    with st.spinner("Generating response..."):
-        response = bot_interface.handle_user_input(user_question)
-        st.markdown(f"**Bot:** {response.get('response', 'No response generated.')}")
+    # The bot interface is a shared resource; point it at this session's data
+    if st.session_state.bot_context:
+        bot_interface.set_context_data(st.session_state.bot_context)
+    
+    # Render tokens as they arrive (st.write_stream needs Streamlit >= 1.31)
+    response_placeholder = st.empty()
+    response_chunks = []
+    last_render = 0.0
+    for chunk in bot_interface.stream_user_input(user_question):
+        response_chunks.append(chunk)
+        # Re-send the growing answer at most every STREAM_RENDER_INTERVAL seconds, not per token
+        if time.monotonic() - last_render >= STREAM_RENDER_INTERVAL:
+            response_placeholder.markdown(f"**Bot:** {''.join(response_chunks)}▌")
+            last_render = time.monotonic()
+    response_placeholder.markdown(f"**Bot:** {''.join(response_chunks) or 'No response generated.'}")
 
 # Environment status in sidebar
 with st.sidebar:
     st.divider()
     st.subheader("Environment Status")
     
-    # AWS Status
-    aws_status = {
-        "AWS Region": os.getenv('AWS_REGION', '❌ Not Set'),
-        "AWS Access Key": "✅ Set" if os.getenv('AWS_ACCESS_KEY_ID') else "❌ Not Set",
-        "AWS Secret Key": "✅ Set" if os.getenv('AWS_SECRET_ACCESS_KEY') else "❌ Not Set"
-    }
+    st.table(get_env_status_table())
     
-    # S3 Status
-    s3_config = get_s3_config()
-    if s3_config['use_single_bucket']:
-        aws_status.update({
-            "S3 Bucket": s3_config['bucket_name'] or '❌ Not Set',
-            "Input Folder": s3_config['input_folder'] or '❌ Not Set',
-            "Output Folder": s3_config['output_folder'] or '❌ Not Set'
-        })
-    else:
-        aws_status.update({
-            "Input Bucket": s3_config['input_bucket'] or '❌ Not Set',
-            "Output Bucket": s3_config['output_bucket'] or '❌ Not Set'
-        })
-    
-    for key, value in aws_status.items():
-        if "❌" in str(value):
-            st.error(f"**{key}:** {value}")
-        else:
-            st.success(f"**{key}:** {value}")
+    if st.button("Reload environment", help="Re-read .env and rebuild the AWS clients after changing settings"):
+        load_environment.cache_clear()
+        get_s3_config.cache_clear()
+        reset_aws_clients()
+        get_boto_session.clear()
+        if pdf_processor is not None:
+            pdf_processor.clear_list_cache()
+        initialize_clients.clear()
+        list_input_pdfs.clear()
+        get_env_snapshot.clear()
+        get_env_status_table.clear()
+        st.rerun()
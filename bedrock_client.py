@@ -1,30 +1,218 @@
 import boto3
 import json
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 import os
+import time
+import threading
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from botocore.exceptions import ClientError, BotoCoreError
 
+# orjson parses and serializes several times faster; fall back to stdlib json when absent
+try:
+    import orjson
+    json_loads, json_dumps = orjson.loads, orjson.dumps
+except ImportError:
+    json_loads, json_dumps = json.loads, json.dumps
+
 logger = logging.getLogger(__name__)
 
+# Bedrock error codes that are safe to retry with backoff
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'ServiceUnavailableException', 'ModelNotReadyException'}
+
+# Document tokens sent per extraction request, estimated at CHARS_PER_TOKEN characters each
+MAX_DOCUMENT_TOKENS = 2000
+CHARS_PER_TOKEN = 4
+MAX_DOCUMENT_CHARS = MAX_DOCUMENT_TOKENS * CHARS_PER_TOKEN
+
+# Static parts of the extraction system prompt around the attribute list
+EXTRACTION_PROMPT_HEAD = """
+        You are a financial document analysis expert. Your task is to extract specific financial attributes from document text.
+        
+        Extract the following attributes:
+        """
+
+EXTRACTION_PROMPT_TAIL = """
+        
+        Return the results in this exact JSON format:
+        {
+            "extraction_metadata": {
+                "processing_date": "YYYY-MM-DD",
+                "confidence_score": 0.95,
+                "extraction_method": "bedrock_claude",
+                "confidence_calculation": {
+                    "text_clarity": 0.95,
+                    "attribute_match": 0.90,
+                    "context_relevance": 0.98,
+                    "data_consistency": 0.92
+                }
+            },
+            "extracted_attributes": {
+                "attribute_name": {
+                    "value": "extracted_value_or_null",
+                    "confidence": 0.95,
+                    "confidence_breakdown": {
+                        "text_clarity": 0.95,
+                        "exact_match": 0.90,
+                        "context_match": 0.98,
+                        "format_validity": 0.92
+                    },
+                    "source_text": "relevant_text_snippet",
+                    "extraction_reasoning": "Brief explanation of why this value was selected"
+                }
+            }
+        }
+        
+        CONFIDENCE SCORING GUIDELINES:
+        
+        For each attribute, calculate confidence based on these factors:
+        
+        1. TEXT_CLARITY (0.0-1.0): How clear and readable is the source text?
+           - 1.0: Perfect, clear text with no ambiguity
+           - 0.8-0.9: Minor formatting issues or slight ambiguity
+           - 0.6-0.7: Some OCR errors or unclear formatting
+           - 0.4-0.5: Significant text quality issues
+           - 0.0-0.3: Very poor text quality or unreadable
+        
+        2. EXACT_MATCH (0.0-1.0): How well does the found text match the attribute description?
+           - 1.0: Perfect match with expected attribute name/label
+           - 0.8-0.9: Close match with minor variations in terminology
+           - 0.6-0.7: Reasonable match but requires interpretation
+           - 0.4-0.5: Weak match, significant interpretation needed
+           - 0.0-0.3: Very weak or no clear match
+        
+        3. CONTEXT_MATCH (0.0-1.0): Is the value found in the right context/section?
+           - 1.0: Found in perfect context (e.g., income statement for revenue)
+           - 0.8-0.9: Found in appropriate section with minor context issues
+           - 0.6-0.7: Found in reasonable context but not ideal location
+           - 0.4-0.5: Found in questionable context
+           - 0.0-0.3: Found in wrong context or no clear context
+        
+        4. FORMAT_VALIDITY (0.0-1.0): Is the extracted value in the expected format?
+           - 1.0: Perfect format (e.g., proper number format for currency)
+           - 0.8-0.9: Minor format issues but clearly interpretable
+           - 0.6-0.7: Some format issues requiring normalization
+           - 0.4-0.5: Significant format problems
+           - 0.0-0.3: Invalid or unrecognizable format
+        
+        OVERALL CONFIDENCE CALCULATION:
+        confidence = (text_clarity * 0.25) + (exact_match * 0.30) + (context_match * 0.25) + (format_validity * 0.20)
+        
+        EXTRACTION GUIDELINES:
+        - For currency values, extract numbers only (no currency symbols)
+        - For dates, use YYYY-MM-DD format
+        - If an attribute cannot be found, set value to null and confidence to 0
+        - Always provide confidence scores between 0 and 1
+        - Include relevant source text snippets for verification
+        - Provide brief reasoning for each extraction
+        """
+
+# System prompt and fixed parameters shared by every chatbot request
+CHATBOT_SYSTEM_PROMPT = """
+        You are a financial analysis assistant with access to extracted financial data from PDF documents.
+        Help users understand and analyze the financial information by:
+        1. Answering questions about specific financial metrics
+        2. Providing insights on trends and patterns
+        3. Explaining financial ratios and their implications
+        4. Comparing data across different periods
+        5. Identifying potential areas of concern or opportunity
+        
+        Always base your responses on the provided data and be clear about any limitations.
+        Be concise but informative in your responses.
+        """
+
+CHATBOT_REQUEST_TEMPLATE = {
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": 1000,
+    "temperature": 0.3,
+    "system": CHATBOT_SYSTEM_PROMPT
+}
+
+# Documents at most this long may share one extraction request with others
+MULTI_DOCUMENT_MAX_CHARS = 3000
+
+# Output token budget for a multi-document extraction request
+MULTI_DOCUMENT_MAX_TOKENS = 4096
+
+# Appended to the extraction system prompt when several documents share a request
+MULTI_DOCUMENT_INSTRUCTIONS = """
+        The user message contains several documents, each starting with a line "---DOCUMENT <index>---".
+        Extract the attributes from each document independently and return one JSON object in this format:
+        {"documents": [{"index": 0, "extraction_metadata": {...}, "extracted_attributes": {...}}, ...]}
+        Use the per-document format above for each entry and include every document index exactly once.
+        """
+
+# Section key for attributes that aren't tied to a specific statement
+GENERAL_SECTION = "general"
+
+# Batch inference job states after which no further progress is made
+BATCH_TERMINAL_STATUSES = {'Completed', 'PartiallyCompleted', 'Failed', 'Stopped', 'Expired'}
+
+@functools.lru_cache(maxsize=1)
+def get_bedrock_client(region_name: str = None, model_id: str = None) -> 'BedrockClient':
+    """
+    Process-wide BedrockClient reused by callers that don't supply their own
+    
+    Call get_bedrock_client.cache_clear() after changing AWS or model settings.
+    """
+    return BedrockClient(region_name=region_name, model_id=model_id)
+
+def budgeted_text(text: str, max_tokens: int = MAX_DOCUMENT_TOKENS) -> str:
+    """
+    Cap text at an estimated token budget, cutting at a line break near the limit
+    
+    Args:
+        text: Document text
+        max_tokens: Token budget, estimated at CHARS_PER_TOKEN characters per token
+        
+    Returns:
+        The text unchanged if within budget, otherwise its longest prefix ending at a
+        line break in the last tenth of the budget (or at the budget itself)
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    
+    # Avoid splitting a table row or figure in half at the boundary
+    cut = text.rfind('\n', limit - limit // 10, limit)
+    return text[:cut if cut != -1 else limit]
+
 class BedrockClient:
     """AWS Bedrock client for Claude model interactions"""
     
-    def __init__(self, region_name: str = None, model_id: str = None):
+    def __init__(self, region_name: str = None, model_id: str = None, max_retries: int = 3,
+                 performance_config: str = None, session=None, regions: List[str] = None):
         self.region_name = region_name or os.getenv('AWS_REGION', 'us-east-1')
+        # Extra regions that model invocations round-robin across (BEDROCK_REGIONS, comma-separated)
+        self.regions = regions or [r.strip() for r in os.getenv('BEDROCK_REGIONS', '').split(',') if r.strip()]
         self.model_id = model_id or os.getenv('BEDROCK_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
+        self.max_retries = max_retries
+        # 'optimized' requests latency-optimized inference (supported models/regions only)
+        self.performance_config = performance_config
+        
+        self.session = session
+        # Extraction system prompts keyed by the attribute fields they describe
+        self._prompt_cache = {}
+        # Caps concurrent Bedrock requests across threads sharing this client
+        self.invoke_semaphore = threading.BoundedSemaphore(int(os.getenv('BEDROCK_MAX_CONCURRENCY', '8')))
+        # Worker threads backing the async wrappers; threads start on first use
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('BEDROCK_WORKERS', '16')))
         
         try:
-            self.bedrock_client = boto3.client(
-                'bedrock-runtime',
-                region_name=self.region_name,
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                aws_session_token=os.getenv('AWS_SESSION_TOKEN')
-            )
-            logger.info(f"Bedrock client initialized for region: {self.region_name}")
+            self.bedrock_client = self._create_client('bedrock-runtime')
+            self.runtime_clients = [self.bedrock_client] + [
+                self._create_client('bedrock-runtime', region)
+                for region in dict.fromkeys(self.regions) if region != self.region_name
+            ]
+            self._runtime_cycle = itertools.cycle(self.runtime_clients)
+            self.bedrock_control_client = None  # Created on first batch job
+            logger.info("Bedrock client initialized for region: %s", self.region_name)
         except Exception as e:
-            logger.error(f"Failed to initialize Bedrock client: {str(e)}")
+            logger.error("Failed to initialize Bedrock client: %s", e)
             raise
     
     def extract_attributes(self, text: str, attributes_config: List[Dict]) -> Dict[str, Any]:
@@ -39,224 +227,474 @@ class BedrockClient:
             Dictionary containing extracted attributes with confidence scores
         """
         try:
-            # Prepare the system prompt for attribute extraction
-            system_prompt = self._build_extraction_system_prompt(attributes_config)
-            
-            # Prepare the user message
-            user_message = f"""
-            Please analyze the following financial document text and extract the requested attributes.
-            Return the results in JSON format with the exact attribute names as keys.
-            If an attribute cannot be found, set its value to null and confidence to 0.
-            
-            Financial Document Text:
-            {text[:8000]}  # Limit text to avoid token limits
-            """
-            
-            # Prepare the request body
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 2000,
-                "temperature": 0.1,
-                "system": system_prompt,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": user_message
-                            }
-                        ]
-                    }
-                ]
-            }
+            request_body = self._build_extraction_request_body(text, attributes_config)
             
             # Make the API call
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body),
-                contentType='application/json'
-            )
+            response = self._invoke_model(request_body)
             
             # Parse the response
-            response_body = json.loads(response['body'].read())
-            extracted_text = response_body['content'][0]['text']
-            
-            # Parse JSON from the response
-            try:
-                extracted_data = json.loads(extracted_text)
-                logger.info("Successfully extracted attributes from PDF text")
-                return extracted_data
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract JSON from the text
-                extracted_data = self._extract_json_from_text(extracted_text)
-                return extracted_data
+            response_body = json_loads(response['body'].read())
+            return self._parse_extraction_response(response_body)
                 
         except ClientError as e:
-            logger.error(f"AWS Bedrock API error: {str(e)}")
+            logger.error("AWS Bedrock API error: %s", e)
             return self._get_empty_attributes_response(attributes_config)
         except Exception as e:
-            logger.error(f"Error in attribute extraction: {str(e)}")
+            logger.error("Error in attribute extraction: %s", e)
             return self._get_empty_attributes_response(attributes_config)
     
-    def chatbot_response(self, user_input: str, context_data: Dict[str, Any]) -> str:
+    def extract_attributes_multi(self, texts: List[str], attributes_config: List[Dict]) -> List[Dict[str, Any]]:
         """
-        Generate chatbot response based on user input and extracted financial data
+        Extract financial attributes from several short documents in one Claude request
         
         Args:
-            user_input: User's question or observation
-            context_data: Extracted financial data for context
+            texts: Extracted texts, each at most MULTI_DOCUMENT_MAX_CHARS long
+            attributes_config: List of attributes to extract from config
             
         Returns:
-            Chatbot response string
+            One extraction result per input text, in input order. Documents missing from
+            the combined response are extracted individually.
         """
+        results = [None] * len(texts)
+        
         try:
-            # Prepare system prompt for chatbot
-            system_prompt = """
-            You are a financial analysis assistant with access to extracted financial data from PDF documents.
-            Help users understand and analyze the financial information by:
-            1. Answering questions about specific financial metrics
-            2. Providing insights on trends and patterns
-            3. Explaining financial ratios and their implications
-            4. Comparing data across different periods
-            5. Identifying potential areas of concern or opportunity
+            request_body = self._build_multi_extraction_request_body(texts, attributes_config)
+            response = self._invoke_model(request_body)
+            response_body = json_loads(response['body'].read())
             
-            Always base your responses on the provided data and be clear about any limitations.
-            Be concise but informative in your responses.
-            """
-            
-            # Prepare context information
-            context_summary = self._prepare_context_summary(context_data)
+            for document in self._parse_extraction_response(response_body).get('documents', []):
+                index = document.get('index')
+                if isinstance(index, int) and 0 <= index < len(texts):
+                    results[index] = {
+                        "extraction_metadata": document.get("extraction_metadata", {}),
+                        "extracted_attributes": document.get("extracted_attributes", {})
+                    }
+        except Exception as e:
+            logger.error("Error in multi-document attribute extraction: %s", e)
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning("Multi-document response missing %s of %s documents, extracting individually", len(missing), len(texts))
+        for i in missing:
+            results[i] = self.extract_attributes(texts[i], attributes_config)
+        
+        return results
+    
+    async def aextract_attributes(self, text: str, attributes_config: List[Dict]) -> Dict[str, Any]:
+        """Async variant of extract_attributes; the blocking call runs on the client's executor"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self.extract_attributes, text, attributes_config)
+        )
+    
+    async def aextract_attributes_many(self, texts: List[str], attributes_config: List[Dict]) -> List[Dict[str, Any]]:
+        """Extract attributes from many documents concurrently, in input order"""
+        return await asyncio.gather(*(self.aextract_attributes(text, attributes_config) for text in texts))
+    
+    def extract_attributes_batched(self, text_chunks: Dict[str, str],
+                                   attributes_by_section: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        """
+        Extract attributes section by section from a long document and merge the results
+        
+        Args:
+            text_chunks: Mapping of section name to the document text for that section;
+                GENERAL_SECTION holds the start of the document
+            attributes_by_section: Mapping of section name to the attributes reported there
             
-            user_message = f"""
-            Context Data:
-            {context_summary}
+        Returns:
+            Dictionary containing extracted attributes with confidence scores
+        """
+        merged = {"extraction_metadata": {}, "extracted_attributes": {}}
+        confidence_scores = []
+        
+        # Fall back to the start of the document when a section heading wasn't found
+        jobs = [
+            (text_chunks.get(section) or text_chunks.get(GENERAL_SECTION, ""), section_attributes)
+            for section, section_attributes in attributes_by_section.items() if section_attributes
+        ]
+        
+        # Sections are independent requests, so run them concurrently
+        for result in self._executor.map(lambda job: self.extract_attributes(*job), jobs):
+            merged["extracted_attributes"].update(result.get("extracted_attributes", {}))
+            metadata = result.get("extraction_metadata", {})
+            if not merged["extraction_metadata"]:
+                merged["extraction_metadata"] = dict(metadata)
+            if "error" in metadata or "error" in result:
+                merged["extraction_metadata"]["error"] = metadata.get("error", result.get("error"))
+            confidence_scores.append(metadata.get("confidence_score", 0.0))
+        
+        if confidence_scores:
+            merged["extraction_metadata"]["confidence_score"] = sum(confidence_scores) / len(confidence_scores)
+        
+        return merged
+    
+    def submit_batch_extraction_job(self, texts: Dict[str, str], attributes_config: List[Dict],
+                                    s3_client, bucket: str, prefix: str, role_arn: str) -> str:
+        """
+        Submit a Bedrock Batch Inference job extracting attributes from many PDFs at once
+        
+        Args:
+            texts: Mapping of record ID to extracted PDF text
+            attributes_config: List of attributes to extract from config
+            s3_client: S3 client used to upload the JSONL manifest
+            bucket: S3 bucket holding the job input and output
+            prefix: Key prefix under which the job files are written
+            role_arn: IAM service role Bedrock assumes to access the bucket
             
-            User Question/Observation:
-            {user_input}
+        Returns:
+            ARN of the created model invocation job
+        """
+        job_name = f"financial-extraction-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        input_key = f"{prefix}batch_inference/{job_name}/input.jsonl"
+        output_prefix = f"{prefix}batch_inference/{job_name}/output/"
+        
+        manifest = "\n".join(
+            json.dumps({
+                "recordId": record_id,
+                "modelInput": self._build_extraction_request_body(text, attributes_config)
+            })
+            for record_id, text in texts.items()
+        )
+        
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=input_key,
+            Body=manifest.encode('utf-8'),
+            ContentType='application/jsonl'
+        )
+        
+        response = self._get_control_client().create_model_invocation_job(
+            jobName=job_name,
+            roleArn=role_arn,
+            modelId=self.model_id,
+            inputDataConfig={
+                's3InputDataConfig': {
+                    's3Uri': f"s3://{bucket}/{input_key}",
+                    's3InputFormat': 'JSONL'
+                }
+            },
+            outputDataConfig={
+                's3OutputDataConfig': {
+                    's3Uri': f"s3://{bucket}/{output_prefix}"
+                }
+            }
+        )
+        
+        logger.info("Submitted batch inference job %s with %s records", response['jobArn'], len(texts))
+        return response['jobArn']
+    
+    def wait_for_batch_job(self, job_arn: str, poll_interval: int = 30, timeout: int = 86400) -> str:
+        """
+        Poll a batch inference job until it reaches a terminal state
+        
+        Args:
+            job_arn: ARN of the model invocation job
+            poll_interval: Seconds between status checks
+            timeout: Maximum seconds to wait before giving up; 0 checks the status once
             
-            Please provide a helpful response based on the available financial data.
-            """
+        Returns:
+            Final job status
+        """
+        deadline = time.time() + timeout
+        while True:
+            status = self._get_control_client().get_model_invocation_job(jobIdentifier=job_arn)['status']
+            if status in BATCH_TERMINAL_STATUSES:
+                logger.info("Batch inference job %s finished with status: %s", job_arn, status)
+                return status
+            if time.time() >= deadline:
+                logger.warning("Timed out waiting for batch inference job %s (status: %s)", job_arn, status)
+                return status
+            time.sleep(poll_interval)
+    
+    def get_batch_extraction_results(self, job_arn: str, attributes_config: List[Dict], s3_client) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the output of a finished batch inference job
+        
+        Args:
+            job_arn: ARN of the model invocation job
+            attributes_config: List of attributes to extract from config
+            s3_client: S3 client used to download the job output
             
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "temperature": 0.3,
-                "system": system_prompt,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": user_message
-                            }
-                        ]
-                    }
-                ]
-            }
+        Returns:
+            Mapping of record ID to extracted attributes
+        """
+        job = self._get_control_client().get_model_invocation_job(jobIdentifier=job_arn)
+        input_uri = job['inputDataConfig']['s3InputDataConfig']['s3Uri']
+        output_uri = job['outputDataConfig']['s3OutputDataConfig']['s3Uri']
+        
+        # Bedrock writes <output_uri>/<job_id>/<input_file>.out
+        bucket, output_prefix = output_uri[len("s3://"):].split('/', 1)
+        job_id = job_arn.split('/')[-1]
+        output_key = f"{output_prefix.rstrip('/')}/{job_id}/{os.path.basename(input_uri)}.out"
+        
+        body = s3_client.get_object(Bucket=bucket, Key=output_key)['Body'].read().decode('utf-8')
+        
+        results = {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            record = json_loads(line)
+            model_output = record.get('modelOutput')
+            if model_output:
+                try:
+                    results[record['recordId']] = self._parse_extraction_response(model_output)
+                    continue
+                except Exception as e:
+                    logger.error("Failed to parse batch record %s: %s", record.get('recordId'), e)
+            else:
+                logger.error("Batch record %s failed: %s", record.get('recordId'), record.get('error'))
+            results[record['recordId']] = self._get_empty_attributes_response(attributes_config)
+        
+        return results
+    
+    def chatbot_response(self, user_input: str, context_data: Dict[str, Any]) -> str:
+        """
+        Generate chatbot response based on user input and extracted financial data
+        
+        Args:
+            user_input: User's question or observation
+            context_data: Extracted financial data for context
             
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body),
-                contentType='application/json'
-            )
+        Returns:
+            Chatbot response string
+        """
+        try:
+            request_body = self._build_chatbot_request_body(user_input, context_data)
+            response = self._invoke_model(request_body)
             
-            response_body = json.loads(response['body'].read())
+            response_body = json_loads(response['body'].read())
             chatbot_response = response_body['content'][0]['text']
             
             logger.info("Generated chatbot response successfully")
             return chatbot_response
             
         except Exception as e:
-            logger.error(f"Error generating chatbot response: {str(e)}")
+            logger.error("Error generating chatbot response: %s", e)
             return "I apologize, but I'm having trouble processing your request right now. Please try again later."
     
-    def _build_extraction_system_prompt(self, attributes_config: List[Dict]) -> str:
-        """Build system prompt for attribute extraction"""
-        attributes_description = "\n".join([
-            f"- {attr['name']}: {attr['description']} (Type: {attr['data_type']}, Required: {attr['required']})"
-            for attr in attributes_config
-        ])
+    async def achatbot_response(self, user_input: str, context_data: Dict[str, Any]) -> str:
+        """Async variant of chatbot_response; the blocking call runs on the client's executor"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self.chatbot_response, user_input, context_data)
+        )
+    
+    def stream_chatbot_response(self, user_input: str, context_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Stream a chatbot response as text chunks while the model generates it
         
-        return f"""
-        You are a financial document analysis expert. Your task is to extract specific financial attributes from document text.
+        Args:
+            user_input: User's question or observation
+            context_data: Extracted financial data for context
+            
+        Yields:
+            Response text chunks in generation order
+        """
+        request_body = self._build_chatbot_request_body(user_input, context_data)
+        response = self._invoke_model(request_body, stream=True)
         
-        Extract the following attributes:
-        {attributes_description}
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json_loads(chunk['bytes'])
+            if payload.get('type') == 'content_block_delta':
+                text = payload.get('delta', {}).get('text')
+                if text:
+                    yield text
         
-        Return the results in this exact JSON format:
-        {{
-            "extraction_metadata": {{
-                "processing_date": "YYYY-MM-DD",
-                "confidence_score": 0.95,
-                "extraction_method": "bedrock_claude",
-                "confidence_calculation": {{
-                    "text_clarity": 0.95,
-                    "attribute_match": 0.90,
-                    "context_relevance": 0.98,
-                    "data_consistency": 0.92
-                }}
-            }},
-            "extracted_attributes": {{
-                "attribute_name": {{
-                    "value": "extracted_value_or_null",
-                    "confidence": 0.95,
-                    "confidence_breakdown": {{
-                        "text_clarity": 0.95,
-                        "exact_match": 0.90,
-                        "context_match": 0.98,
-                        "format_validity": 0.92
-                    }},
-                    "source_text": "relevant_text_snippet",
-                    "extraction_reasoning": "Brief explanation of why this value was selected"
-                }}
-            }}
-        }}
+        logger.info("Streamed chatbot response successfully")
+    
+    def _build_chatbot_request_body(self, user_input: str, context_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Bedrock request body for a chatbot question from the static template"""
+        # Prepare context information
+        context_summary = self._prepare_context_summary(context_data)
         
-        CONFIDENCE SCORING GUIDELINES:
+        user_message = f"""
+        Context Data:
+        {context_summary}
         
-        For each attribute, calculate confidence based on these factors:
+        User Question/Observation:
+        {user_input}
         
-        1. TEXT_CLARITY (0.0-1.0): How clear and readable is the source text?
-           - 1.0: Perfect, clear text with no ambiguity
-           - 0.8-0.9: Minor formatting issues or slight ambiguity
-           - 0.6-0.7: Some OCR errors or unclear formatting
-           - 0.4-0.5: Significant text quality issues
-           - 0.0-0.3: Very poor text quality or unreadable
+        Please provide a helpful response based on the available financial data.
+        """
         
-        2. EXACT_MATCH (0.0-1.0): How well does the found text match the attribute description?
-           - 1.0: Perfect match with expected attribute name/label
-           - 0.8-0.9: Close match with minor variations in terminology
-           - 0.6-0.7: Reasonable match but requires interpretation
-           - 0.4-0.5: Weak match, significant interpretation needed
-           - 0.0-0.3: Very weak or no clear match
+        # Shallow-copy the shared template so concurrent callers never mutate it
+        return {
+            **CHATBOT_REQUEST_TEMPLATE,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": user_message
+                        }
+                    ]
+                }
+            ]
+        }
+    
+    def _get_control_client(self):
+        """Lazily create the Bedrock control-plane client used for batch jobs"""
+        if self.bedrock_control_client is None:
+            self.bedrock_control_client = self._create_client('bedrock')
+        return self.bedrock_control_client
+    
+    def _create_client(self, service_name: str, region_name: str = None):
+        """Create a Bedrock service client from the shared session, or from env credentials"""
+        from env_config import get_client_config
         
-        3. CONTEXT_MATCH (0.0-1.0): Is the value found in the right context/section?
-           - 1.0: Found in perfect context (e.g., income statement for revenue)
-           - 0.8-0.9: Found in appropriate section with minor context issues
-           - 0.6-0.7: Found in reasonable context but not ideal location
-           - 0.4-0.5: Found in questionable context
-           - 0.0-0.3: Found in wrong context or no clear context
+        region_name = region_name or self.region_name
         
-        4. FORMAT_VALIDITY (0.0-1.0): Is the extracted value in the expected format?
-           - 1.0: Perfect format (e.g., proper number format for currency)
-           - 0.8-0.9: Minor format issues but clearly interpretable
-           - 0.6-0.7: Some format issues requiring normalization
-           - 0.4-0.5: Significant format problems
-           - 0.0-0.3: Invalid or unrecognizable format
+        # Model calls can run well past the default 60s read timeout
+        config = get_client_config(max_pool_connections=int(os.getenv('BEDROCK_POOL', '64')), read_timeout=120)
+        if service_name == 'bedrock-runtime':
+            # _invoke_model retries throttling itself, moving to the next region each time;
+            # botocore retrying underneath would multiply the attempts behind one call
+            from botocore.config import Config
+            config = config.merge(Config(retries={'total_max_attempts': 1, 'mode': 'standard'}))
         
-        OVERALL CONFIDENCE CALCULATION:
-        confidence = (text_clarity * 0.25) + (exact_match * 0.30) + (context_match * 0.25) + (format_validity * 0.20)
+        if self.session is not None:
+            return self.session.client(service_name, region_name=region_name, config=config)
         
-        EXTRACTION GUIDELINES:
-        - For currency values, extract numbers only (no currency symbols)
-        - For dates, use YYYY-MM-DD format
-        - If an attribute cannot be found, set value to null and confidence to 0
-        - Always provide confidence scores between 0 and 1
-        - Include relevant source text snippets for verification
-        - Provide brief reasoning for each extraction
+        return boto3.client(
+            service_name,
+            region_name=region_name,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            aws_session_token=os.getenv('AWS_SESSION_TOKEN'),
+            config=config
+        )
+    
+    def _build_extraction_request_body(self, text: str, attributes_config: List[Dict]) -> Dict[str, Any]:
+        """Build the Claude request body for attribute extraction"""
+        # Prepare the system prompt for attribute extraction
+        system_prompt = self._build_extraction_system_prompt(attributes_config)
+        
+        # Prepare the user message
+        user_message = f"""
+        Please analyze the following financial document text and extract the requested attributes.
+        Return the results in JSON format with the exact attribute names as keys.
+        If an attribute cannot be found, set its value to null and confidence to 0.
+        
+        Financial Document Text:
+        {budgeted_text(text)}
         """
+        
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "temperature": 0.1,
+            "system": system_prompt,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": user_message
+                        }
+                    ]
+                }
+            ]
+        }
+    
+    def _build_multi_extraction_request_body(self, texts: List[str], attributes_config: List[Dict]) -> Dict[str, Any]:
+        """Build one Claude request body covering several delimited documents"""
+        system_prompt = self._build_extraction_system_prompt(attributes_config) + MULTI_DOCUMENT_INSTRUCTIONS
+        documents = "".join(
+            f"\n---DOCUMENT {i}---\n{budgeted_text(text, MULTI_DOCUMENT_MAX_CHARS // CHARS_PER_TOKEN)}"
+            for i, text in enumerate(texts)
+        )
+        
+        user_message = f"""
+        Please analyze each of the following financial documents and extract the requested attributes.
+        If an attribute cannot be found in a document, set its value to null and confidence to 0.
+        
+        Financial Documents:
+        {documents}
+        """
+        
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": MULTI_DOCUMENT_MAX_TOKENS,
+            "temperature": 0.1,
+            "system": system_prompt,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": user_message
+                        }
+                    ]
+                }
+            ]
+        }
+    
+    def _parse_extraction_response(self, response_body: Dict[str, Any]) -> Dict[str, Any]:
+        """Parse extracted attributes out of a Claude response body"""
+        extracted_text = response_body['content'][0]['text']
+        
+        # Only attempt a direct parse when the response is a bare JSON object; prose-wrapped
+        # responses go straight to the brace scan instead of failing one full parse first
+        stripped = extracted_text.strip()
+        if stripped.startswith('{') and stripped.endswith('}'):
+            try:
+                extracted_data = json_loads(stripped)
+                logger.info("Successfully extracted attributes from PDF text")
+                return extracted_data
+            except json.JSONDecodeError:
+                pass
+        
+        # If JSON parsing fails, try to extract JSON from the text
+        return self._extract_json_from_text(extracted_text)
+    
+    def _invoke_model(self, request_body: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
+        """Invoke the model (optionally streaming), retrying throttled requests with exponential backoff"""
+        invoke_kwargs = {
+            'modelId': self.model_id,
+            'body': json_dumps(request_body),
+            'contentType': 'application/json'
+        }
+        if self.performance_config:
+            invoke_kwargs['performanceConfigLatency'] = self.performance_config
+        
+        for attempt in range(self.max_retries):
+            # Spread requests (and retries after throttling) across the configured regions
+            client = self.bedrock_client if len(self.runtime_clients) == 1 else next(self._runtime_cycle)
+            try:
+                with self.invoke_semaphore:
+                    if stream:
+                        return client.invoke_model_with_response_stream(**invoke_kwargs)
+                    return client.invoke_model(**invoke_kwargs)
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code', '')
+                if error_code not in RETRYABLE_ERROR_CODES or attempt == self.max_retries - 1:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("Bedrock request throttled (%s), retrying in %ss", error_code, delay)
+                time.sleep(delay)
+    
+    async def _ainvoke(self, request_body: Dict[str, Any]) -> Dict[str, Any]:
+        """Run _invoke_model on the executor so awaiting callers don't block the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self._invoke_model, request_body)
+        )
+    
+    def _build_extraction_system_prompt(self, attributes_config: List[Dict]) -> str:
+        """Build system prompt for attribute extraction, memoized per attribute set"""
+        key = tuple((attr['name'], attr['description'], attr['data_type'], attr['required']) for attr in attributes_config)
+        prompt = self._prompt_cache.get(key)
+        if prompt is None:
+            attributes_description = "\n".join(
+                f"- {name}: {description} (Type: {data_type}, Required: {required})"
+                for name, description, data_type, required in key
+            )
+            prompt = EXTRACTION_PROMPT_HEAD + attributes_description + EXTRACTION_PROMPT_TAIL
+            self._prompt_cache[key] = prompt
+        return prompt
     
     def _prepare_context_summary(self, context_data: Dict[str, Any]) -> str:
         """Prepare context summary for chatbot"""
@@ -291,13 +729,13 @@ class BedrockClient:
             
             if start_idx != -1 and end_idx != -1:
                 json_text = text[start_idx:end_idx]
-                return json.loads(json_text)
+                return json_loads(json_text)
             else:
                 logger.warning("Could not find JSON in response text")
                 return {"error": "Failed to parse JSON response"}
                 
         except Exception as e:
-            logger.error(f"Failed to extract JSON from text: {str(e)}")
+            logger.error("Failed to extract JSON from text: %s", e)
             return {"error": "Failed to parse response"}
     
     def _get_empty_attributes_response(self, attributes_config: List[Dict]) -> Dict[str, Any]:
@@ -1,19 +1,51 @@
 import logging
-from typing import Dict, Any, List, Optional
-from bedrock_client import BedrockClient
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator
+from bedrock_client import BedrockClient, get_bedrock_client
 import json
 from datetime import datetime
+from dataclasses import dataclass
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Metrics reported in the context summary, in display order
+COMMON_METRICS = (
+    "Total Revenue", "Net Income", "Total Assets", "Total Liabilities",
+    "Shareholders Equity", "Operating Cash Flow", "Gross Profit"
+)
+
+# Attribute names indicating each category of financial data
+REVENUE_INDICATORS = frozenset({"Total Revenue", "Gross Profit", "Revenue"})
+PROFITABILITY_INDICATORS = frozenset({"Net Income", "EBITDA", "Operating Income"})
+BALANCE_SHEET_INDICATORS = frozenset({"Total Assets", "Total Liabilities", "Shareholders Equity"})
+CASH_FLOW_INDICATORS = frozenset({"Operating Cash Flow", "Free Cash Flow", "Cash Flow"})
+
+@dataclass(frozen=True, slots=True)
+class ContextAttribute:
+    """One extracted attribute, normalized from either its dict or bare-value form"""
+    value: Any
+    confidence: Optional[float] = None
+    
+    @classmethod
+    def from_raw(cls, attr_data: Any) -> Optional['ContextAttribute']:
+        if attr_data is None:
+            return None
+        if isinstance(attr_data, dict):
+            return cls(attr_data.get("value"), attr_data.get("confidence"))
+        return cls(attr_data)
+
 class BotInterface:
     """Chatbot interface for user observations and questions about extracted financial data"""
     
     def __init__(self, bedrock_client: BedrockClient = None):
-        self.bedrock_client = bedrock_client or BedrockClient()
-        self.conversation_history = []
-        self.context_data = {}
+        self.bedrock_client = bedrock_client or get_bedrock_client()
         self.max_history_length = 10  # Keep last 10 exchanges
+        self.conversation_history = deque(maxlen=self.max_history_length)
+        self.context_data = {}
+        # Derived summaries, valid while context_data is the same object
+        self._cache_source = None
+        self._context_cache = {}
     
     def set_context_data(self, extracted_data: Dict[str, Any]):
         """
@@ -35,12 +67,13 @@ class BotInterface:
         Returns:
             Dictionary containing response and metadata
         """
+        timestamp = datetime.now().isoformat()
         try:
             # Validate input
             if not user_input or not user_input.strip():
                 return {
                     "response": "Please provide a question or observation about the financial data.",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": timestamp,
                     "error": "Empty input"
                 }
             
@@ -48,7 +81,7 @@ class BotInterface:
             if not self.context_data:
                 return {
                     "response": "I don't have any financial data to analyze yet. Please extract data from PDFs first.",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": timestamp,
                     "error": "No context data"
                 }
             
@@ -57,37 +90,71 @@ class BotInterface:
             
             # Store conversation in history
             conversation_entry = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "user_input": user_input,
                 "bot_response": response
             }
             
+            # The bounded deque drops the oldest exchange once full
             self.conversation_history.append(conversation_entry)
             
-            # Trim history if too long
-            if len(self.conversation_history) > self.max_history_length:
-                self.conversation_history = self.conversation_history[-self.max_history_length:]
-            
             # Prepare response with additional context
             bot_response = {
                 "response": response,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "context_summary": self._get_context_summary(),
                 "suggested_questions": self._get_suggested_questions(),
                 "data_availability": self._check_data_availability()
             }
             
-            logger.info(f"Generated bot response for user input: {user_input[:50]}...")
+            logger.info("Generated bot response for user input: %.50s...", user_input)
             return bot_response
             
         except Exception as e:
-            logger.error(f"Error handling user input: {str(e)}")
+            logger.error("Error handling user input: %s", e)
             return {
                 "response": "I apologize, but I encountered an error while processing your request. Please try again.",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e)
             }
     
+    def stream_user_input(self, user_input: str) -> Iterator[str]:
+        """
+        Process user input and yield the response text as it is generated
+        
+        Args:
+            user_input: User's question or observation
+            
+        Yields:
+            Response text chunks
+        """
+        if not user_input or not user_input.strip():
+            yield "Please provide a question or observation about the financial data."
+            return
+        
+        if not self.context_data:
+            yield "I don't have any financial data to analyze yet. Please extract data from PDFs first."
+            return
+        
+        chunks = []
+        try:
+            for chunk in self.bedrock_client.stream_chatbot_response(user_input, self.context_data):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error("Error streaming response for user input: %s", e)
+            yield "I apologize, but I encountered an error while processing your request. Please try again."
+            return
+        
+        # Store conversation in history
+        self.conversation_history.append({
+            "timestamp": datetime.now().isoformat(),
+            "user_input": user_input,
+            "bot_response": "".join(chunks)
+        })
+        
+        logger.info("Streamed bot response for user input: %.50s...", user_input)
+    
     def get_conversation_history(self) -> List[Dict[str, Any]]:
         """
         Get the conversation history
@@ -95,14 +162,45 @@ class BotInterface:
         Returns:
             List of conversation entries
         """
-        return self.conversation_history.copy()
+        return list(self.conversation_history)
     
     def clear_conversation_history(self):
         """Clear the conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         logger.info("Cleared conversation history")
     
+    def _cached_for_context(self, name: str, compute):
+        """Return a value derived from context_data, recomputing only after the context is replaced"""
+        if self._cache_source is not self.context_data:
+            self._cache_source = self.context_data
+            self._context_cache = {}
+        if name not in self._context_cache:
+            self._context_cache[name] = compute()
+        return self._context_cache[name]
+    
     def _get_context_summary(self) -> Dict[str, Any]:
+        """Summary of available context data, computed once per context"""
+        return self._cached_for_context("summary", self._compute_context_summary)
+    
+    def _check_data_availability(self) -> Dict[str, Any]:
+        """Data availability for the current context, computed once per context"""
+        return self._cached_for_context("availability", self._compute_data_availability)
+    
+    def _context_records(self) -> List[Dict[str, Optional[ContextAttribute]]]:
+        """Per-PDF extracted attributes parsed once per context into fixed-layout objects"""
+        return self._cached_for_context("records", self._parse_context_records)
+    
+    def _parse_context_records(self) -> List[Dict[str, Optional[ContextAttribute]]]:
+        consolidated_data = self.context_data.get("consolidated_data", []) if self.context_data else []
+        if not isinstance(consolidated_data, list):
+            consolidated_data = [consolidated_data] if consolidated_data else []
+        
+        return [
+            {name: ContextAttribute.from_raw(attr_data) for name, attr_data in item["extracted_attributes"].items()}
+            for item in consolidated_data if "extracted_attributes" in item
+        ]
+    
+    def _compute_context_summary(self) -> Dict[str, Any]:
         """
         Generate a summary of available context data
         
@@ -129,53 +227,33 @@ class BotInterface:
                     summary["pdf_count"] = 1
             
             # Check for common financial metrics
-            common_metrics = [
-                "Total Revenue", "Net Income", "Total Assets", "Total Liabilities",
-                "Shareholders Equity", "Operating Cash Flow", "Gross Profit"
-            ]
-            
-            available_metrics = []
-            if "consolidated_data" in self.context_data:
-                data = self.context_data["consolidated_data"]
-                if isinstance(data, list) and data:
-                    sample_data = data[0]
-                    if "extracted_attributes" in sample_data:
-                        for metric in common_metrics:
-                            if metric in sample_data["extracted_attributes"]:
-                                attr_data = sample_data["extracted_attributes"][metric]
-                                if isinstance(attr_data, dict) and attr_data.get("value") is not None:
-                                    available_metrics.append(metric)
-                                elif attr_data is not None:
-                                    available_metrics.append(metric)
-            
-            summary["key_metrics_available"] = available_metrics
+            records = self._context_records()
+            summary["key_metrics_available"] = (
+                [metric for metric in COMMON_METRICS if records[0].get(metric) is not None] if records else []
+            )
             
             # Try to determine date range
             years = []
-            if "consolidated_data" in self.context_data:
-                data = self.context_data["consolidated_data"]
-                if isinstance(data, list):
-                    for item in data:
-                        if "extracted_attributes" in item:
-                            year_data = item["extracted_attributes"].get("Report Year")
-                            if isinstance(year_data, dict):
-                                year = year_data.get("value")
-                            else:
-                                year = year_data
-                            
-                            if year and str(year).isdigit():
-                                years.append(int(year))
+            for record in records:
+                year_attr = record.get("Report Year")
+                year = year_attr.value if year_attr else None
+                if year and str(year).isdigit():
+                    years.append(int(year))
             
             if years:
                 summary["date_range"] = f"{min(years)} - {max(years)}" if len(set(years)) > 1 else str(years[0])
             
         except Exception as e:
-            logger.warning(f"Error generating context summary: {str(e)}")
+            logger.warning("Error generating context summary: %s", e)
             summary["error"] = "Could not analyze context data"
         
         return summary
     
     def _get_suggested_questions(self) -> List[str]:
+        """Suggested questions for the current context, computed once per context"""
+        return list(self._cached_for_context("suggestions", self._compute_suggested_questions))
+    
+    def _compute_suggested_questions(self) -> List[str]:
         """
         Generate suggested questions based on available data
         
@@ -221,7 +299,7 @@ class BotInterface:
         # Limit to 5 suggestions
         return suggestions[:5]
     
-    def _check_data_availability(self) -> Dict[str, Any]:
+    def _compute_data_availability(self) -> Dict[str, Any]:
         """
         Check what types of data are available for analysis
         
@@ -252,33 +330,27 @@ class BotInterface:
             availability["has_multi_period_data"] = len(consolidated_data) > 1
             
             # Analyze available metrics
-            all_attributes = set()
-            confidence_scores = []
+            records = self._context_records()
+            all_attributes = {name for record in records for name in record}
             
-            for item in consolidated_data:
-                if "extracted_attributes" in item:
-                    attributes = item["extracted_attributes"]
-                    all_attributes.update(attributes.keys())
-                    
-                    # Collect confidence scores
-                    for attr_data in attributes.values():
-                        if isinstance(attr_data, dict) and "confidence" in attr_data:
-                            confidence_scores.append(attr_data["confidence"])
+            # Collect confidence scores into one float array
+            confidence_scores = np.fromiter(
+                (attr.confidence for record in records for attr in record.values()
+                 if attr is not None and attr.confidence is not None),
+                dtype=np.float64
+            )
             
             # Check data categories
-            revenue_indicators = ["Total Revenue", "Gross Profit", "Revenue"]
-            profitability_indicators = ["Net Income", "EBITDA", "Operating Income"]
-            balance_sheet_indicators = ["Total Assets", "Total Liabilities", "Shareholders Equity"]
-            cash_flow_indicators = ["Operating Cash Flow", "Free Cash Flow", "Cash Flow"]
-            
-            availability["has_revenue_data"] = any(indicator in all_attributes for indicator in revenue_indicators)
-            availability["has_profitability_data"] = any(indicator in all_attributes for indicator in profitability_indicators)
-            availability["has_balance_sheet_data"] = any(indicator in all_attributes for indicator in balance_sheet_indicators)
-            availability["has_cash_flow_data"] = any(indicator in all_attributes for indicator in cash_flow_indicators)
+            availability["has_revenue_data"] = bool(REVENUE_INDICATORS & all_attributes)
+            availability["has_profitability_data"] = bool(PROFITABILITY_INDICATORS & all_attributes)
+            availability["has_balance_sheet_data"] = bool(BALANCE_SHEET_INDICATORS & all_attributes)
+            availability["has_cash_flow_data"] = bool(CASH_FLOW_INDICATORS & all_attributes)
             
             # Assess data quality
-            if confidence_scores:
-                avg_confidence = sum(confidence_scores) / len(confidence_scores)
+            if confidence_scores.size:
+                avg_confidence = float(confidence_scores.mean())
+                p10, p50, p90 = np.quantile(confidence_scores, [0.1, 0.5, 0.9])
+                availability["confidence_percentiles"] = {"p10": float(p10), "p50": float(p50), "p90": float(p90)}
                 if avg_confidence >= 0.8:
                     availability["data_quality"] = "high"
                 elif avg_confidence >= 0.6:
@@ -287,7 +359,7 @@ class BotInterface:
                     availability["data_quality"] = "low"
             
         except Exception as e:
-            logger.warning(f"Error checking data availability: {str(e)}")
+            logger.warning("Error checking data availability: %s", e)
             availability["error"] = str(e)
         
         return availability
@@ -323,7 +395,7 @@ class BotInterface:
             }
             
         except Exception as e:
-            logger.error(f"Error generating financial insights: {str(e)}")
+            logger.error("Error generating financial insights: %s", e)
             return {"error": f"Failed to generate insights: {str(e)}"}
     
     def export_conversation(self) -> Dict[str, Any]:
@@ -337,5 +409,5 @@ class BotInterface:
             "export_timestamp": datetime.now().isoformat(),
             "conversation_count": len(self.conversation_history),
             "context_summary": self._get_context_summary(),
-            "conversations": self.conversation_history
+            "conversations": list(self.conversation_history)
         }
@@ -1,52 +1,108 @@
 """
 Environment configuration module to ensure proper loading of environment variables
+
+Nothing is loaded at import; get_s3_config() and get_aws_session() load the
+environment on first use.
 """
 import os
-from dotenv import load_dotenv
+import functools
+import threading
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+from dotenv import dotenv_values
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Defaults applied when the environment doesn't provide a value
+DEFAULT_REGION = 'us-east-1'
+DEFAULT_MODEL_ID = 'anthropic.claude-3-sonnet-20240229-v1:0'
+DEFAULT_INPUT_FOLDER = 'inputfolder'
+DEFAULT_OUTPUT_FOLDER = 'outputfolder'
+DEFAULT_S3_MAX_POOL = 50
+
+# Environment variables read by load_environment
+ENV_KEYS = (
+    'AWS_REGION', 'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'BEDROCK_MODEL_ID',
+    'S3_BUCKET_NAME', 'S3_INPUT_FOLDER', 'S3_OUTPUT_FOLDER', 'S3_INPUT_BUCKET', 'S3_OUTPUT_BUCKET',
+    'S3_MAX_POOL'
+)
+
+# Values used for variables that are unset
+ENV_FALLBACKS = {
+    'S3_INPUT_FOLDER': DEFAULT_INPUT_FOLDER,
+    'S3_OUTPUT_FOLDER': DEFAULT_OUTPUT_FOLDER,
+    'S3_MAX_POOL': str(DEFAULT_S3_MAX_POOL)
+}
+
+def _mask(value: Optional[str]) -> str:
+    """Report whether a secret is present without logging it"""
+    return 'Set' if value else 'Not Set'
+
+# .env values this module has written to os.environ, so a reload can tell them apart
+# from variables set outside .env
+_dotenv_applied = {}
+
+def _apply_dotenv():
+    """Copy .env into os.environ, replacing values an earlier load took from .env but not variables set elsewhere"""
+    values = {key: value for key, value in dotenv_values().items() if value is not None}
+    for key, value in values.items():
+        if key not in os.environ or os.environ[key] == _dotenv_applied.get(key):
+            os.environ[key] = value
+            _dotenv_applied[key] = value
+    
+    # Settings deleted from .env since the last load are dropped too
+    for key in [key for key in _dotenv_applied if key not in values]:
+        if os.environ.get(key) == _dotenv_applied.pop(key):
+            del os.environ[key]
+
+@functools.lru_cache(maxsize=1)
 def load_environment():
-    """Load environment variables from .env file and validate required variables"""
-    # Load from .env file
-    load_dotenv()
+    """
+    Load environment variables from .env file and validate required variables
+    
+    The result is cached for the process; call load_environment.cache_clear() to re-read
+    the environment after it changes. Edited .env values replace the ones loaded before,
+    while variables set outside .env keep taking precedence.
+    """
+    _apply_dotenv()
     
-    # Set default values if not provided
-    if not os.getenv('AWS_REGION'):
-        os.environ['AWS_REGION'] = 'us-east-1'
-        logger.info("AWS_REGION not found in environment, using default: us-east-1")
+    # Read every setting in one pass over the environment
+    env = {key: os.environ.get(key, ENV_FALLBACKS.get(key)) for key in ENV_KEYS}
     
-    if not os.getenv('BEDROCK_MODEL_ID'):
-        os.environ['BEDROCK_MODEL_ID'] = 'anthropic.claude-3-sonnet-20240229-v1:0'
+    # Set default values if not provided (kept in the returned settings, not written to os.environ)
+    if not env['AWS_REGION']:
+        env['AWS_REGION'] = DEFAULT_REGION
+        logger.info("AWS_REGION not found in environment, using default: %s", DEFAULT_REGION)
+    
+    if not env['BEDROCK_MODEL_ID']:
+        env['BEDROCK_MODEL_ID'] = DEFAULT_MODEL_ID
         logger.info("BEDROCK_MODEL_ID not found in environment, using default model")
     
     # Handle S3 configuration - support both single bucket with folders and separate buckets
-    s3_bucket_name = os.getenv('S3_BUCKET_NAME')
-    s3_input_folder = os.getenv('S3_INPUT_FOLDER', 'inputfolder')
-    s3_output_folder = os.getenv('S3_OUTPUT_FOLDER', 'outputfolder')
+    s3_bucket_name = env['S3_BUCKET_NAME']
+    s3_input_folder = env['S3_INPUT_FOLDER']
+    s3_output_folder = env['S3_OUTPUT_FOLDER']
     
     # Legacy support for separate buckets
-    s3_input_bucket = os.getenv('S3_INPUT_BUCKET')
-    s3_output_bucket = os.getenv('S3_OUTPUT_BUCKET')
+    s3_input_bucket = env['S3_INPUT_BUCKET']
+    s3_output_bucket = env['S3_OUTPUT_BUCKET']
     
     # Determine configuration mode
     if s3_bucket_name:
         # Single bucket with folders mode
         s3_input_path = s3_bucket_name
         s3_output_path = s3_bucket_name
-        logger.info(f"Using single bucket mode: {s3_bucket_name}")
-        logger.info(f"Input folder: {s3_input_folder}")
-        logger.info(f"Output folder: {s3_output_folder}")
+        logger.info("Using single bucket mode: %s", s3_bucket_name)
+        logger.debug("Input folder: %s, output folder: %s", s3_input_folder, s3_output_folder)
     elif s3_input_bucket and s3_output_bucket:
         # Separate buckets mode (legacy)
         s3_input_path = s3_input_bucket
         s3_output_path = s3_output_bucket
         s3_input_folder = ""
         s3_output_folder = ""
-        logger.info(f"Using separate buckets mode")
-        logger.info(f"Input bucket: {s3_input_bucket}")
-        logger.info(f"Output bucket: {s3_output_bucket}")
+        logger.info("Using separate buckets mode")
+        logger.debug("Input bucket: %s, output bucket: %s", s3_input_bucket, s3_output_bucket)
     else:
         s3_input_path = None
         s3_output_path = None
@@ -55,15 +111,17 @@ def load_environment():
         logger.warning("No S3 configuration found")
     
     # Log current environment variables (for debugging)
-    logger.info(f"AWS_REGION: {os.getenv('AWS_REGION')}")
-    logger.info(f"AWS_ACCESS_KEY_ID: {'Set' if os.getenv('AWS_ACCESS_KEY_ID') else 'Not Set'}")
-    logger.info(f"AWS_SECRET_ACCESS_KEY: {'Set' if os.getenv('AWS_SECRET_ACCESS_KEY') else 'Not Set'}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("AWS_REGION: %s", env['AWS_REGION'])
+        logger.debug("AWS_ACCESS_KEY_ID: %s", _mask(env['AWS_ACCESS_KEY_ID']))
+        logger.debug("AWS_SECRET_ACCESS_KEY: %s", _mask(env['AWS_SECRET_ACCESS_KEY']))
     
-    return {
-        'aws_region': os.getenv('AWS_REGION'),
-        'aws_access_key_id': os.getenv('AWS_ACCESS_KEY_ID'),
-        'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY'),
-        'aws_session_token': os.getenv('AWS_SESSION_TOKEN'),
+    # Read-only view so callers can't mutate the cached settings
+    return MappingProxyType({
+        'aws_region': env['AWS_REGION'],
+        'aws_access_key_id': env['AWS_ACCESS_KEY_ID'],
+        'aws_secret_access_key': env['AWS_SECRET_ACCESS_KEY'],
+        'aws_session_token': env['AWS_SESSION_TOKEN'],
         's3_bucket_name': s3_bucket_name,
         's3_input_folder': s3_input_folder,
         's3_output_folder': s3_output_folder,
@@ -71,39 +129,112 @@ def load_environment():
         's3_output_path': s3_output_path,
         's3_input_bucket': s3_input_bucket,  # Legacy
         's3_output_bucket': s3_output_bucket,  # Legacy
-        'bedrock_model_id': os.getenv('BEDROCK_MODEL_ID')
-    }
+        's3_max_pool_connections': int(env['S3_MAX_POOL']),
+        'bedrock_model_id': env['BEDROCK_MODEL_ID']
+    })
+
+class S3Config(NamedTuple):
+    """Resolved S3 bucket and folder settings"""
+    bucket_name: Optional[str]
+    input_folder: str
+    output_folder: str
+    input_bucket: Optional[str]  # Legacy
+    output_bucket: Optional[str]  # Legacy
+    use_single_bucket: bool
 
-def get_s3_config():
-    """Get S3 configuration with bucket and folder information"""
+@functools.lru_cache(maxsize=1)
+def get_s3_config() -> S3Config:
+    """Get S3 configuration with bucket and folder information, resolved once per environment load"""
     env_vars = load_environment()
     
-    return {
-        'bucket_name': env_vars['s3_bucket_name'],
-        'input_folder': env_vars['s3_input_folder'],
-        'output_folder': env_vars['s3_output_folder'],
-        'input_bucket': env_vars['s3_input_bucket'],  # Legacy
-        'output_bucket': env_vars['s3_output_bucket'],  # Legacy
-        'use_single_bucket': bool(env_vars['s3_bucket_name'])
-    }
+    return S3Config(
+        bucket_name=env_vars['s3_bucket_name'],
+        input_folder=env_vars['s3_input_folder'],
+        output_folder=env_vars['s3_output_folder'],
+        input_bucket=env_vars['s3_input_bucket'],
+        output_bucket=env_vars['s3_output_bucket'],
+        use_single_bucket=bool(env_vars['s3_bucket_name'])
+    )
+
+# boto3 is imported on first AWS use rather than when this module loads
+_boto3 = None
+
+def _get_boto3():
+    """Import boto3 once, on first use"""
+    global _boto3
+    if _boto3 is None:
+        import boto3
+        _boto3 = boto3
+    return _boto3
+
+# Process-wide session, created on the first get_aws_session() call
+_session = None
+_session_lock = threading.Lock()
 
 def get_aws_session():
-    """Create and return a properly configured AWS session"""
-    env_vars = load_environment()
+    """Return the process-wide AWS session, creating it from the environment on first use"""
+    global _session
+    if _session is not None:
+        return _session
     
-    try:
-        import boto3
-        session = boto3.Session(
-            aws_access_key_id=env_vars['aws_access_key_id'],
-            aws_secret_access_key=env_vars['aws_secret_access_key'],
-            aws_session_token=env_vars['aws_session_token'],
-            region_name=env_vars['aws_region']
-        )
-        logger.info(f"AWS session created successfully for region: {env_vars['aws_region']}")
-        return session
-    except Exception as e:
-        logger.error(f"Failed to create AWS session: {str(e)}")
-        raise
-
-# Initialize environment on import
-load_environment()
+    # boto3 session construction isn't thread-safe; double-checked locking builds it once
+    with _session_lock:
+        if _session is None:
+            env_vars = load_environment()
+            try:
+                _session = _get_boto3().Session(
+                    aws_access_key_id=env_vars['aws_access_key_id'],
+                    aws_secret_access_key=env_vars['aws_secret_access_key'],
+                    aws_session_token=env_vars['aws_session_token'],
+                    region_name=env_vars['aws_region']
+                )
+                logger.info("AWS session created successfully for region: %s", env_vars['aws_region'])
+            except Exception as e:
+                logger.error("Failed to create AWS session: %s", e)
+                raise
+    return _session
+
+def reset_aws_clients():
+    """
+    Drop the process-wide session and the shared S3 clients built from it
+    
+    Call after load_environment.cache_clear() so the next get_aws_session() and
+    get_s3_client() calls pick up changed credentials or region.
+    """
+    global _session
+    with _session_lock:
+        _session = None
+    get_s3_client.cache_clear()
+
+def get_client_config(max_pool_connections: int = 32, read_timeout: int = 60):
+    """Shared botocore client config: a keep-alive connection pool sized for threaded callers and adaptive retries"""
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=10,
+        read_timeout=read_timeout,
+        retries={'max_attempts': 5, 'mode': 'adaptive'}
+    )
+
+def get_s3_client_config(max_pool_connections: int = 32, read_timeout: int = 60):
+    """S3 client config: the shared settings plus SigV4 with virtual-hosted, regional endpoints so no redirect is needed"""
+    from botocore.config import Config
+    return get_client_config(max_pool_connections, read_timeout).merge(Config(
+        signature_version='s3v4',
+        s3={'addressing_style': 'virtual', 'us_east_1_regional_endpoint': 'regional'}
+    ))
+
+@functools.lru_cache(maxsize=4)
+def get_s3_client(session, region_name: str, max_pool_connections: int):
+    """
+    S3 client shared by every handler using the same session, region and pool size
+    
+    boto3 clients are thread-safe, so PDFProcessor and OutputHandler instances reuse
+    one client (and its connection pool) instead of each building their own.
+    """
+    return session.client(
+        's3',
+        region_name=region_name,
+        config=get_s3_client_config(max_pool_connections=max_pool_connections)
+    )
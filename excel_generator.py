@@ -1,56 +1,104 @@
 import pandas as pd
-import xlsxwriter
+import numpy as np
 from io import BytesIO
 import logging
-from typing import List, Dict, Any, Optional
+import re
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import json
 
 logger = logging.getLogger(__name__)
 
+EXCEL_ENGINE_KWARGS = {'options': {'constant_memory': True, 'strings_to_numbers': False}}
+REPORT_PREP_WORKERS = 4
+
+# Figures summed / averaged per period for the YoY and quarterly sheets
+PERIOD_SUM_COLUMNS = ['Total Revenue', 'Net Income']
+PERIOD_MEAN_COLUMNS = ['Total Assets', 'Total Liabilities']
+
+# Attributes whose values are figures; the model often returns them as text
+# such as "$12,345", so they are converted to numbers before writing
+NUMERIC_ATTRS = frozenset({
+    'Total Revenue', 'Net Income', 'Total Assets', 'Total Liabilities',
+    'Shareholders Equity', 'Operating Cash Flow', 'Gross Profit', 'EBITDA',
+    'Current Assets', 'Current Liabilities', 'Long-term Debt'
+})
+# Report Year is read as a whole number (e.g. "FY2023" -> 2023) rather than a figure
+YEAR_PATTERN = r'(\d{4})'
+NUMBER_NOISE_PATTERN = r'[$,\s]'
+# What remains of a figure once the noise is stripped, e.g. "-1234.5" or "1.2bn";
+# accounting negatives such as "(1,234)" are unwrapped before matching
+FIGURE_PATTERN = re.compile(r'(-?\d+(?:\.\d+)?)(thousand|million|billion|k|mn|m|bn|b)?')
+FIGURE_SCALES = {
+    'thousand': 1e3, 'k': 1e3,
+    'million': 1e6, 'mn': 1e6, 'm': 1e6,
+    'billion': 1e9, 'bn': 1e9, 'b': 1e9
+}
+
+# Per-attribute confidence breakdown components, in report column order
+CONFIDENCE_BREAKDOWN_KEYS = ('text_clarity', 'exact_match', 'context_match', 'format_validity')
+
 class ExcelReportGenerator:
     """Generate comprehensive Excel reports from extracted PDF data"""
     
     def __init__(self):
         self.workbook = None
         self.worksheet_formats = {}
+        self._run_timestamp = None
     
-    def generate_consolidated_excel_report(self, json_data_list: List[Dict[str, Any]]) -> bytes:
+    def generate_consolidated_excel_report(self, json_data_list: List[Dict[str, Any]], output=None) -> Optional[bytes]:
         """
         Generate comprehensive Excel report with multiple sheets
         
         Args:
             json_data_list: List of extracted data from all PDFs
+            output: Optional writable binary stream to write the workbook into;
+                it does not need to be seekable
             
         Returns:
-            Excel file as bytes
+            Excel file as bytes, or None when written to output
         """
         try:
-            output = BytesIO()
+            stream = output if output is not None else BytesIO()
+            
+            # One processing date for every sheet of this report
+            self._run_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            # Sheet data is prepared concurrently; the workbook itself is not
+            # thread-safe, so the sheets are then written one at a time
+            with ThreadPoolExecutor(max_workers=REPORT_PREP_WORKERS) as executor:
+                consolidated_future = executor.submit(self._prepare_consolidated_data, json_data_list)
+                individual_future = executor.submit(self._prepare_individual_rows, json_data_list)
+                quality_future = executor.submit(self._prepare_quality_metrics, json_data_list)
+                
+                consolidated_data = consolidated_future.result()
+                period_future = executor.submit(self._prepare_period_data, consolidated_data)
+                
+                individual_rows = individual_future.result()
+                quality_metrics = quality_future.result()
+                yearly_data, quarterly_data = period_future.result()
+            
+            # constant_memory flushes each row as soon as the next one starts,
+            # so every sheet builder below must write its rows top to bottom
+            with pd.ExcelWriter(stream, engine='xlsxwriter', engine_kwargs=EXCEL_ENGINE_KWARGS) as writer:
                 self.workbook = writer.book
                 self._setup_formats()
                 
-                # Prepare consolidated data
-                consolidated_data = self._prepare_consolidated_data(json_data_list)
-                
                 # Generate all sheets
                 self._create_summary_dashboard(consolidated_data, writer)
                 self._create_consolidated_data_sheet(consolidated_data, writer)
-                self._create_yoy_analysis_sheet(consolidated_data, writer)
-                self._create_monthly_breakdown_sheet(consolidated_data, writer)
-                self._create_individual_pdf_sheets(json_data_list, writer)
-                self._create_data_quality_report(json_data_list, writer)
+                self._create_yoy_analysis_sheet(yearly_data, writer)
+                self._create_monthly_breakdown_sheet(consolidated_data, quarterly_data, writer)
+                self._create_individual_pdf_sheets(individual_rows, writer)
+                self._create_data_quality_report(quality_metrics, writer)
                 
                 # Apply final formatting
                 self._apply_workbook_formatting(writer)
             
-            output.seek(0)
-            excel_bytes = output.getvalue()
-            
             logger.info(f"Generated Excel report with {len(json_data_list)} PDF data entries")
-            return excel_bytes
+            return stream.getvalue() if output is None else None
             
         except Exception as e:
             logger.error(f"Error generating Excel report: {str(e)}")
@@ -116,38 +164,112 @@ class ExcelReportGenerator:
                 'border': 1,
                 'font_name': 'Calibri',
                 'font_size': 10
+            }),
+            # Low confidence scores: highlight fill on the percentage format,
+            # registered once here and shared by every sheet that needs it
+            'percentage_highlight': self.workbook.add_format({
+                'bg_color': '#FFE699',
+                'border': 1,
+                'align': 'right',
+                'num_format': '0.00%',
+                'font_name': 'Calibri',
+                'font_size': 10
             })
         }
     
     def _prepare_consolidated_data(self, json_data_list: List[Dict[str, Any]]) -> pd.DataFrame:
         """Prepare consolidated data from all PDFs"""
-        consolidated_rows = []
+        pdfs = [pdf_data for pdf_data in json_data_list if 'extracted_attributes' in pdf_data]
+        pdf_count = len(pdfs)
+        
+        # Build the frame column by column: one list per column, filled in a
+        # single pass, instead of a dict per row for pandas to re-infer
+        columns = {
+            'PDF_Name': [pdf_data.get('filename', 'Unknown') for pdf_data in pdfs],
+            'Processing_Date': [pdf_data.get('extraction_metadata', {}).get('processing_date', '') for pdf_data in pdfs],
+            'Overall_Confidence': [pdf_data.get('extraction_metadata', {}).get('confidence_score', 0) for pdf_data in pdfs]
+        }
         
-        for pdf_data in json_data_list:
-            if 'extracted_attributes' not in pdf_data:
-                continue
+        # attr_name -> (value list, confidence list); the _Confidence column
+        # name is formatted once per attribute rather than once per PDF
+        attr_columns = {}
+        for idx, pdf_data in enumerate(pdfs):
+            for attr_name, attr_data in pdf_data['extracted_attributes'].items():
+                attr_lists = attr_columns.get(attr_name)
+                if attr_lists is None:
+                    # Value and confidence columns stay adjacent, in first-seen order
+                    attr_lists = attr_columns[attr_name] = ([None] * pdf_count, [None] * pdf_count)
+                    columns[attr_name], columns[f"{attr_name}_Confidence"] = attr_lists
                 
-            base_info = {
-                'PDF_Name': pdf_data.get('filename', 'Unknown'),
-                'Processing_Date': pdf_data.get('extraction_metadata', {}).get('processing_date', ''),
-                'Overall_Confidence': pdf_data.get('extraction_metadata', {}).get('confidence_score', 0)
-            }
-            
-            # Extract attributes
-            attributes = pdf_data['extracted_attributes']
-            row_data = base_info.copy()
-            
-            for attr_name, attr_data in attributes.items():
+                values, confidences = attr_lists
                 if isinstance(attr_data, dict):
-                    row_data[attr_name] = attr_data.get('value')
-                    row_data[f"{attr_name}_Confidence"] = attr_data.get('confidence', 0)
+                    values[idx] = self._cell_value(attr_data.get('value'))
+                    confidences[idx] = attr_data.get('confidence', 0)
                 else:
-                    row_data[attr_name] = attr_data
-                    row_data[f"{attr_name}_Confidence"] = 0
-            
-            consolidated_rows.append(row_data)
+                    values[idx] = self._cell_value(attr_data)
+                    confidences[idx] = 0
+        
+        df = pd.DataFrame(columns)
         
-        return pd.DataFrame(consolidated_rows)
+        # Convert figure and confidence columns in bulk so xlsxwriter writes
+        # them as numbers the column formats apply to, not shared strings
+        numeric_cols = [col for col in df.columns if col in NUMERIC_ATTRS]
+        if numeric_cols:
+            df[numeric_cols] = df[numeric_cols].apply(self._to_figures)
+        
+        # Nullable integers keep years out of float form ("2023.0") when some are missing
+        if 'Report Year' in df.columns:
+            years = df['Report Year'].astype(str).str.extract(YEAR_PATTERN, expand=False)
+            df['Report Year'] = pd.to_numeric(years, errors='coerce').astype('Int64')
+        
+        confidence_cols = [col for col in df.columns if col.endswith('_Confidence')]
+        if confidence_cols:
+            df[confidence_cols] = df[confidence_cols].apply(pd.to_numeric, errors='coerce')
+        
+        return df
+    
+    @staticmethod
+    def _cell_value(value: Any) -> Any:
+        """Flatten list and dict values (e.g. segment breakdowns) to JSON text; xlsxwriter can't write them"""
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value, default=str)
+        return value
+    
+    def _to_figures(self, column: pd.Series) -> pd.Series:
+        """
+        Convert a column of extracted figures to numbers
+        
+        Values that can't be read as a figure are kept as extracted rather than
+        blanked, so the column stays numeric only when every value parsed.
+        """
+        parsed = column.map(self._parse_figure)
+        numeric = pd.to_numeric(parsed, errors='coerce')
+        unparsed = numeric.isna() & parsed.notna()
+        if not unparsed.any():
+            return numeric
+        
+        logger.warning(f"Kept {unparsed.sum()} unparseable '{column.name}' value(s) as text")
+        return parsed.where(unparsed, numeric)
+    
+    @staticmethod
+    def _parse_figure(value: Any) -> Any:
+        """Parse a figure such as "$12,345", "(1,234)" or "1.2 million"; anything else is returned unchanged"""
+        if not isinstance(value, str):
+            return value
+        
+        text = re.sub(NUMBER_NOISE_PATTERN, '', value).lower()
+        if not text:
+            return None
+        
+        negative = text.startswith('(') and text.endswith(')')
+        if negative:
+            text = text[1:-1]
+        match = FIGURE_PATTERN.fullmatch(text)
+        if not match:
+            return value
+        
+        number = float(match.group(1)) * FIGURE_SCALES.get(match.group(2), 1)
+        return -number if negative else number
     
     def _create_summary_dashboard(self, consolidated_data: pd.DataFrame, writer):
         """Create summary dashboard sheet"""
@@ -156,11 +278,16 @@ class ExcelReportGenerator:
         # Title
         worksheet.merge_range('A1:F1', 'Financial Data Extraction Summary', self.worksheet_formats['header'])
         
+        if consolidated_data.empty:
+            worksheet.write(3, 0, 'No extracted PDF data available for summary', self.worksheet_formats['data'])
+            worksheet.set_column('A:F', 20)
+            return
+        
         # Summary statistics
         row = 3
         summary_data = [
             ['Total PDFs Processed', len(consolidated_data)],
-            ['Processing Date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ['Processing Date', self._run_timestamp],
             ['Average Confidence Score', f"{consolidated_data['Overall_Confidence'].mean():.2%}" if not consolidated_data.empty else "N/A"]
         ]
         
@@ -184,29 +311,30 @@ class ExcelReportGenerator:
             worksheet.write(row, 0, 'Key Financial Metrics Summary', self.worksheet_formats['header'])
             row += 1
             
-            financial_columns = ['Total Revenue', 'Net Income', 'Total Assets', 'Total Liabilities']
+            financial_columns = [col for col in ['Total Revenue', 'Net Income', 'Total Assets', 'Total Liabilities']
+                                 if col in consolidated_data.columns]
             metrics_data = []
             
-            for col in financial_columns:
-                if col in consolidated_data.columns:
-                    values = pd.to_numeric(consolidated_data[col], errors='coerce').dropna()
-                    if not values.empty:
+            if financial_columns:
+                # Columns are numeric apart from any figures kept as text (see
+                # _prepare_consolidated_data), so one agg covers every metric; NaN cells are skipped
+                stats = consolidated_data[financial_columns].apply(pd.to_numeric, errors='coerce').agg(['count', 'sum', 'mean', 'min', 'max']).T
+                for col, count, total, mean, minimum, maximum in stats.itertuples(name=None):
+                    if count:
                         metrics_data.append([
                             col,
-                            f"${values.sum():,.0f}",
-                            f"${values.mean():,.0f}",
-                            f"${values.min():,.0f}",
-                            f"${values.max():,.0f}"
+                            f"${total:,.0f}",
+                            f"${mean:,.0f}",
+                            f"${minimum:,.0f}",
+                            f"${maximum:,.0f}"
                         ])
             
             if metrics_data:
                 headers = ['Metric', 'Total', 'Average', 'Minimum', 'Maximum']
-                for i, header in enumerate(headers):
-                    worksheet.write(row, i, header, self.worksheet_formats['subheader'])
+                worksheet.write_row(row, 0, headers, self.worksheet_formats['subheader'])
                 
                 for i, metric_row in enumerate(metrics_data):
-                    for j, value in enumerate(metric_row):
-                        worksheet.write(row + 1 + i, j, value, self.worksheet_formats['data'])
+                    worksheet.write_row(row + 1 + i, 0, metric_row, self.worksheet_formats['data'])
         
         # Auto-fit columns
         worksheet.set_column('A:F', 20)
@@ -216,29 +344,29 @@ class ExcelReportGenerator:
         if consolidated_data.empty:
             return
         
-        # Write to Excel with formatting
-        consolidated_data.to_excel(writer, sheet_name='Consolidated Data', index=False, startrow=1)
+        worksheet = writer.book.add_worksheet('Consolidated Data')
+        columns = list(consolidated_data.columns)
         
-        worksheet = writer.sheets['Consolidated Data']
-        
-        # Add title
-        worksheet.merge_range(0, 0, 0, len(consolidated_data.columns)-1, 
+        # Title and headers go in before the data rows; in constant_memory mode
+        # rows cannot be revisited once a later row has been written
+        worksheet.merge_range(0, 0, 0, len(columns)-1, 
                             'Consolidated Financial Data', self.worksheet_formats['header'])
-        
-        # Format headers
-        for col_num, column in enumerate(consolidated_data.columns):
-            worksheet.write(1, col_num, column, self.worksheet_formats['subheader'])
-        
-        # Format data based on column type
-        for col_num, column in enumerate(consolidated_data.columns):
-            if 'Revenue' in column or 'Income' in column or 'Assets' in column or 'Liabilities' in column:
-                worksheet.set_column(col_num, col_num, 15, self.worksheet_formats['currency'])
-            elif 'Confidence' in column:
-                worksheet.set_column(col_num, col_num, 12, self.worksheet_formats['percentage'])
-            elif 'Date' in column:
-                worksheet.set_column(col_num, col_num, 12, self.worksheet_formats['date'])
-            else:
-                worksheet.set_column(col_num, col_num, 15, self.worksheet_formats['data'])
+        worksheet.write_row(1, 0, columns, self.worksheet_formats['subheader'])
+        
+        # Format data based on column type, one set_column per run of
+        # adjacent columns that share a width and format
+        column_styles = [self._consolidated_column_style(column) for column in columns]
+        col_num = 0
+        for (width, format_name), run in itertools.groupby(column_styles):
+            run_length = len(list(run))
+            worksheet.set_column(col_num, col_num + run_length - 1, width, self.worksheet_formats[format_name])
+            col_num += run_length
+        
+        # Data cells take their format from the column formats above, which
+        # constant_memory only applies to rows written after set_column
+        rows = consolidated_data.astype(object).where(consolidated_data.notna(), None)
+        for row_num, values in enumerate(rows.itertuples(index=False, name=None), 2):
+            worksheet.write_row(row_num, 0, values)
         
         # Add filters
         worksheet.autofilter(1, 0, len(consolidated_data), len(consolidated_data.columns)-1)
@@ -246,9 +374,71 @@ class ExcelReportGenerator:
         # Freeze panes
         worksheet.freeze_panes(2, 1)
     
-    def _create_yoy_analysis_sheet(self, consolidated_data: pd.DataFrame, writer):
-        """Create year-over-year analysis sheet"""
+    @staticmethod
+    def _consolidated_column_style(column: str) -> tuple:
+        """Return the (width, format name) for a consolidated data column"""
+        if 'Revenue' in column or 'Income' in column or 'Assets' in column or 'Liabilities' in column:
+            return 15, 'currency'
+        elif 'Confidence' in column:
+            return 12, 'percentage'
+        elif 'Date' in column:
+            return 12, 'date'
+        return 15, 'data'
+    
+    def _prepare_period_data(self, consolidated_data: pd.DataFrame) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """
+        Aggregate consolidated data by year and by quarter in one groupby
+        
+        Sums and non-null counts are taken per (year, quarter) once, and the
+        yearly figures are rolled up from them, so averages stay weighted by
+        the number of reports rather than becoming a mean of quarter means.
+        
+        Args:
+            consolidated_data: Output of _prepare_consolidated_data
+            
+        Returns:
+            (yearly_data, quarterly_data); either is None when the consolidated
+            data has no year or quarter column respectively
+        """
         if consolidated_data.empty or 'Report Year' not in consolidated_data.columns:
+            return None, None
+        
+        has_quarters = 'Report Quarter' in consolidated_data.columns
+        keys = ['Report Year', 'Report Quarter'] if has_quarters else ['Report Year']
+        figures = consolidated_data[keys + PERIOD_SUM_COLUMNS + PERIOD_MEAN_COLUMNS]
+        figures = figures[figures['Report Year'].notna()]
+        # Figures kept as text by _prepare_consolidated_data are left out of the totals
+        value_columns = PERIOD_SUM_COLUMNS + PERIOD_MEAN_COLUMNS
+        figures = figures.assign(**{col: pd.to_numeric(figures[col], errors='coerce') for col in value_columns})
+        
+        # Rows without a quarter still count towards their year
+        grouped = figures.groupby(keys, dropna=False)
+        period_sums = grouped[PERIOD_SUM_COLUMNS + PERIOD_MEAN_COLUMNS].sum()
+        period_counts = grouped[PERIOD_MEAN_COLUMNS].count()
+        
+        if has_quarters:
+            yearly_sums = period_sums.groupby(level='Report Year').sum()
+            yearly_counts = period_counts.groupby(level='Report Year').sum()
+        else:
+            yearly_sums, yearly_counts = period_sums, period_counts
+        
+        yearly_data = pd.concat(
+            [yearly_sums[PERIOD_SUM_COLUMNS], yearly_sums[PERIOD_MEAN_COLUMNS] / yearly_counts],
+            axis=1).fillna(0)
+        
+        quarterly_data = None
+        if has_quarters:
+            quarter_mask = period_sums.index.get_level_values('Report Quarter').notna()
+            quarterly_data = pd.concat(
+                [period_sums.loc[quarter_mask, PERIOD_SUM_COLUMNS],
+                 period_sums.loc[quarter_mask, ['Total Assets']] / period_counts.loc[quarter_mask, ['Total Assets']]],
+                axis=1).fillna(0)
+        
+        return yearly_data, quarterly_data
+    
+    def _create_yoy_analysis_sheet(self, yearly_data: Optional[pd.DataFrame], writer):
+        """Create year-over-year analysis sheet"""
+        if yearly_data is None:
             return
         
         worksheet = writer.book.add_worksheet('Year-over-Year Analysis')
@@ -256,14 +446,6 @@ class ExcelReportGenerator:
         # Title
         worksheet.merge_range('A1:F1', 'Year-over-Year Financial Analysis', self.worksheet_formats['header'])
         
-        # Group data by year
-        yearly_data = consolidated_data.groupby('Report Year').agg({
-            'Total Revenue': 'sum',
-            'Net Income': 'sum',
-            'Total Assets': 'mean',
-            'Total Liabilities': 'mean'
-        }).fillna(0)
-        
         if len(yearly_data) < 2:
             worksheet.write(3, 0, 'Insufficient data for year-over-year analysis', self.worksheet_formats['data'])
             return
@@ -273,35 +455,34 @@ class ExcelReportGenerator:
         
         # Write yearly data
         row = 3
-        worksheet.write(row, 0, 'Year', self.worksheet_formats['subheader'])
-        for col_num, column in enumerate(yearly_data.columns, 1):
-            worksheet.write(row, col_num, column, self.worksheet_formats['subheader'])
+        worksheet.write_row(row, 0, ['Year', *yearly_data.columns], self.worksheet_formats['subheader'])
         
-        for year_idx, (year, data) in enumerate(yearly_data.iterrows()):
-            worksheet.write(row + 1 + year_idx, 0, int(year), self.worksheet_formats['data'])
-            for col_num, value in enumerate(data, 1):
-                worksheet.write(row + 1 + year_idx, col_num, value, self.worksheet_formats['currency'])
+        yearly_runs = self._column_format_runs(
+            [self.worksheet_formats['data']] + [self.worksheet_formats['currency']] * len(yearly_data.columns))
+        # itertuples hands back plain tuples; iterrows would build a Series per row
+        for year_idx, (year, *data) in enumerate(yearly_data.itertuples(name=None)):
+            self._write_row_runs(worksheet, row + 1 + year_idx, [int(year), *data], yearly_runs)
         
         # Write YoY changes
         row += len(yearly_data) + 3
         worksheet.write(row, 0, 'Year-over-Year Growth (%)', self.worksheet_formats['header'])
         row += 1
         
-        worksheet.write(row, 0, 'Year', self.worksheet_formats['subheader'])
-        for col_num, column in enumerate(yoy_changes.columns, 1):
-            worksheet.write(row, col_num, f"{column} Growth", self.worksheet_formats['subheader'])
+        growth_headers = ['Year'] + [f"{column} Growth" for column in yoy_changes.columns]
+        worksheet.write_row(row, 0, growth_headers, self.worksheet_formats['subheader'])
         
-        for year_idx, (year, changes) in enumerate(yoy_changes.iterrows()):
+        growth_runs = self._column_format_runs(
+            [self.worksheet_formats['data']] + [self.worksheet_formats['percentage']] * len(yoy_changes.columns))
+        for year_idx, (year, *changes) in enumerate(yoy_changes.itertuples(name=None)):
             if year_idx == 0:  # Skip first year (no previous year to compare)
                 continue
-            worksheet.write(row + year_idx, 0, int(year), self.worksheet_formats['data'])
-            for col_num, change in enumerate(changes, 1):
-                worksheet.write(row + year_idx, col_num, change, self.worksheet_formats['percentage'])
+            self._write_row_runs(worksheet, row + year_idx, [int(year), *changes], growth_runs)
         
         # Auto-fit columns
         worksheet.set_column('A:F', 18)
     
-    def _create_monthly_breakdown_sheet(self, consolidated_data: pd.DataFrame, writer):
+    def _create_monthly_breakdown_sheet(self, consolidated_data: pd.DataFrame,
+                                        quarterly_data: Optional[pd.DataFrame], writer):
         """Create monthly breakdown sheet"""
         if consolidated_data.empty:
             return
@@ -312,82 +493,153 @@ class ExcelReportGenerator:
         worksheet.merge_range('A1:F1', 'Monthly Financial Breakdown', self.worksheet_formats['header'])
         
         # Group by quarter if available
-        if 'Report Quarter' in consolidated_data.columns:
-            quarterly_data = consolidated_data.groupby(['Report Year', 'Report Quarter']).agg({
-                'Total Revenue': 'sum',
-                'Net Income': 'sum',
-                'Total Assets': 'mean'
-            }).fillna(0)
-            
+        if quarterly_data is not None:
             row = 3
             headers = ['Year', 'Quarter', 'Total Revenue', 'Net Income', 'Total Assets']
-            for col_num, header in enumerate(headers):
-                worksheet.write(row, col_num, header, self.worksheet_formats['subheader'])
+            worksheet.write_row(row, 0, headers, self.worksheet_formats['subheader'])
             
-            for idx, ((year, quarter), data) in enumerate(quarterly_data.iterrows()):
-                worksheet.write(row + 1 + idx, 0, int(year), self.worksheet_formats['data'])
-                worksheet.write(row + 1 + idx, 1, quarter, self.worksheet_formats['data'])
-                for col_num, value in enumerate(data, 2):
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['currency'])
+            quarterly_runs = self._column_format_runs(
+                [self.worksheet_formats['data']] * 2 + [self.worksheet_formats['currency']] * len(quarterly_data.columns))
+            for idx, ((year, quarter), *data) in enumerate(quarterly_data.itertuples(name=None)):
+                self._write_row_runs(worksheet, row + 1 + idx, [int(year), quarter, *data], quarterly_runs)
         else:
             worksheet.write(3, 0, 'No quarterly data available for breakdown', self.worksheet_formats['data'])
         
         # Auto-fit columns
         worksheet.set_column('A:F', 15)
     
-    def _create_individual_pdf_sheets(self, json_data_list: List[Dict[str, Any]], writer):
+    def _prepare_individual_rows(self, json_data_list: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Build the per-PDF rows for the individual PDF details sheet"""
+        return [
+            [
+                pdf_data.get('filename', 'Unknown'),
+                pdf_data.get('extraction_metadata', {}).get('processing_date', ''),
+                pdf_data.get('page_count', 0),
+                pdf_data.get('extraction_method', ''),
+                pdf_data.get('processing_time', 0),
+                pdf_data.get('extraction_metadata', {}).get('confidence_score', 0),
+                'Yes' if pdf_data.get('has_text', False) else 'No',
+                '; '.join(pdf_data.get('errors', []))
+            ]
+            for pdf_data in json_data_list
+        ]
+    
+    def _create_individual_pdf_sheets(self, individual_rows: List[List[Any]], writer):
         """Create individual PDF details sheet"""
         worksheet = writer.book.add_worksheet('Individual PDF Details')
         
         # Title
         worksheet.merge_range('A1:H1', 'Individual PDF Processing Details', self.worksheet_formats['header'])
         
+        if not individual_rows:
+            worksheet.write(3, 0, 'No PDF data available', self.worksheet_formats['data'])
+            worksheet.set_column('A:H', 15)
+            return
+        
         # Headers
         headers = ['PDF Name', 'Processing Date', 'Page Count', 'Extraction Method', 
                   'Processing Time (s)', 'Confidence Score', 'Has Text', 'Errors']
         
         row = 3
-        for col_num, header in enumerate(headers):
-            worksheet.write(row, col_num, header, self.worksheet_formats['subheader'])
+        worksheet.write_row(row, 0, headers, self.worksheet_formats['subheader'])
+        
+        # Processing time and confidence score have their own formats
+        data_format = self.worksheet_formats['data']
+        runs = self._column_format_runs(
+            [data_format] * 4 + [self.worksheet_formats['number'], self.worksheet_formats['percentage']] + [data_format] * 2)
         
         # Data
-        for idx, pdf_data in enumerate(json_data_list):
-            data_row = [
-                pdf_data.get('filename', 'Unknown'),
-                pdf_data.get('extraction_metadata', {}).get('processing_date', ''),
-                pdf_data.get('page_count', 0),
-                pdf_data.get('extraction_method', ''),
-                pdf_data.get('processing_time', 0),
-                pdf_data.get('extraction_metadata', {}).get('confidence_score', 0),
-                'Yes' if pdf_data.get('has_text', False) else 'No',
-                '; '.join(pdf_data.get('errors', []))
-            ]
-            
-            for col_num, value in enumerate(data_row):
-                if col_num == 5:  # Confidence score
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['percentage'])
-                elif col_num == 4:  # Processing time
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['number'])
-                else:
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['data'])
+        for idx, data_row in enumerate(individual_rows):
+            self._write_row_runs(worksheet, row + 1 + idx, data_row, runs)
         
         # Auto-fit columns
         worksheet.set_column('A:H', 15)
     
-    def _create_data_quality_report(self, json_data_list: List[Dict[str, Any]], writer):
+    def _prepare_quality_metrics(self, json_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Compute the summary, per-PDF and per-attribute figures for the data quality sheet"""
+        # Gather every metric in one pass: summary counters, the per-PDF
+        # detail rows and running per-attribute confidence totals
+        total_pdfs = len(json_data_list)
+        successful_extractions = 0
+        confidence_sum = 0
+        detail_rows = []
+        attribute_stats = {}
+        
+        for pdf_data in json_data_list:
+            confidence = pdf_data.get('extraction_metadata', {}).get('confidence_score', 0)
+            confidence_calc = pdf_data.get('extraction_metadata', {}).get('confidence_calculation', {})
+            
+            confidence_sum += confidence
+            if confidence > 0.5:
+                successful_extractions += 1
+            
+            issues = []
+            if confidence < 0.5:
+                issues.append('Low confidence')
+            if pdf_data.get('errors'):
+                issues.append('Processing errors')
+            if not pdf_data.get('has_text', False):
+                issues.append('No text detected')
+            
+            detail_rows.append([
+                pdf_data.get('filename', 'Unknown'),
+                confidence,
+                confidence_calc.get('text_clarity', 0),
+                confidence_calc.get('attribute_match', 0),
+                confidence_calc.get('context_relevance', 0),
+                confidence_calc.get('data_consistency', 0),
+                pdf_data.get('extraction_method', ''),
+                '; '.join(issues) if issues else 'None'
+            ])
+            
+            for attr_name, attr_data in pdf_data.get('extracted_attributes', {}).items():
+                stats = attribute_stats.get(attr_name)
+                if stats is None:
+                    stats = attribute_stats[attr_name] = {
+                        'count': 0, 'sum': 0, 'min': None, 'max': None,
+                        'breakdown_count': 0, 'breakdown_sums': [0] * len(CONFIDENCE_BREAKDOWN_KEYS)
+                    }
+                
+                if isinstance(attr_data, dict):
+                    attr_confidence = attr_data.get('confidence', 0)
+                    stats['count'] += 1
+                    stats['sum'] += attr_confidence
+                    if stats['min'] is None or attr_confidence < stats['min']:
+                        stats['min'] = attr_confidence
+                    if stats['max'] is None or attr_confidence > stats['max']:
+                        stats['max'] = attr_confidence
+                    
+                    confidence_breakdown = attr_data.get('confidence_breakdown', {})
+                    if confidence_breakdown:
+                        stats['breakdown_count'] += 1
+                        breakdown_sums = stats['breakdown_sums']
+                        for i, key in enumerate(CONFIDENCE_BREAKDOWN_KEYS):
+                            breakdown_sums[i] += confidence_breakdown.get(key, 0)
+        
+        return {
+            'total_pdfs': total_pdfs,
+            'successful_extractions': successful_extractions,
+            'avg_confidence': confidence_sum / total_pdfs if total_pdfs > 0 else 0,
+            'detail_rows': detail_rows,
+            'attribute_stats': attribute_stats
+        }
+    
+    def _create_data_quality_report(self, quality_metrics: Dict[str, Any], writer):
         """Create data quality report sheet"""
         worksheet = writer.book.add_worksheet('Data Quality Report')
         
         # Title
         worksheet.merge_range('A1:H1', 'Data Quality Assessment & Confidence Analysis', self.worksheet_formats['header'])
         
-        # Calculate quality metrics
-        total_pdfs = len(json_data_list)
-        successful_extractions = sum(1 for pdf in json_data_list 
-                                   if pdf.get('extraction_metadata', {}).get('confidence_score', 0) > 0.5)
+        if not quality_metrics['total_pdfs']:
+            worksheet.write(3, 0, 'No PDF data available for quality assessment', self.worksheet_formats['data'])
+            worksheet.set_column('A:H', 18)
+            return
         
-        avg_confidence = sum(pdf.get('extraction_metadata', {}).get('confidence_score', 0) 
-                           for pdf in json_data_list) / total_pdfs if total_pdfs > 0 else 0
+        total_pdfs = quality_metrics['total_pdfs']
+        successful_extractions = quality_metrics['successful_extractions']
+        avg_confidence = quality_metrics['avg_confidence']
+        detail_rows = quality_metrics['detail_rows']
         
         # Quality summary
         row = 3
@@ -396,7 +648,7 @@ class ExcelReportGenerator:
             ['Successful Extractions', successful_extractions],
             ['Success Rate', f"{(successful_extractions/total_pdfs)*100:.1f}%" if total_pdfs > 0 else "0%"],
             ['Average Confidence Score', f"{avg_confidence:.2%}"],
-            ['Processing Date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+            ['Processing Date', self._run_timestamp]
         ]
         
         for i, (label, value) in enumerate(quality_data):
@@ -418,10 +670,8 @@ class ExcelReportGenerator:
             ['Formula:', '', 'confidence = (text_clarity × 0.25) + (exact_match × 0.30) + (context_match × 0.25) + (format_validity × 0.20)']
         ]
         
-        for i, (component, weight, description) in enumerate(confidence_explanation):
-            worksheet.write(row + i, 0, component, self.worksheet_formats['subheader'] if i == 0 else self.worksheet_formats['data'])
-            worksheet.write(row + i, 1, weight, self.worksheet_formats['subheader'] if i == 0 else self.worksheet_formats['data'])
-            worksheet.write(row + i, 2, description, self.worksheet_formats['subheader'] if i == 0 else self.worksheet_formats['data'])
+        for i, explanation_row in enumerate(confidence_explanation):
+            worksheet.write_row(row + i, 0, explanation_row, self.worksheet_formats['subheader'] if i == 0 else self.worksheet_formats['data'])
         
         # Detailed quality metrics per PDF
         row += len(confidence_explanation) + 2
@@ -429,106 +679,91 @@ class ExcelReportGenerator:
         row += 1
         
         detail_headers = ['PDF Name', 'Overall Confidence', 'Text Clarity', 'Exact Match', 'Context Match', 'Format Validity', 'Extraction Method', 'Issues']
-        for col_num, header in enumerate(detail_headers):
-            worksheet.write(row, col_num, header, self.worksheet_formats['subheader'])
+        worksheet.write_row(row, 0, detail_headers, self.worksheet_formats['subheader'])
         
-        for idx, pdf_data in enumerate(json_data_list):
-            confidence = pdf_data.get('extraction_metadata', {}).get('confidence_score', 0)
-            confidence_calc = pdf_data.get('extraction_metadata', {}).get('confidence_calculation', {})
-            
-            issues = []
-            if confidence < 0.5:
-                issues.append('Low confidence')
-            if pdf_data.get('errors'):
-                issues.append('Processing errors')
-            if not pdf_data.get('has_text', False):
-                issues.append('No text detected')
-            
-            detail_row = [
-                pdf_data.get('filename', 'Unknown'),
-                confidence,
-                confidence_calc.get('text_clarity', 0),
-                confidence_calc.get('attribute_match', 0),
-                confidence_calc.get('context_relevance', 0),
-                confidence_calc.get('data_consistency', 0),
-                pdf_data.get('extraction_method', ''),
-                '; '.join(issues) if issues else 'None'
-            ]
-            
-            for col_num, value in enumerate(detail_row):
-                if col_num in [1, 2, 3, 4, 5]:  # Confidence scores
-                    cell_format = self.worksheet_formats['highlight'] if (isinstance(value, (int, float)) and value < 0.5) else self.worksheet_formats['percentage']
-                    worksheet.write(row + 1 + idx, col_num, value, cell_format)
-                else:
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['data'])
+        data_format = self.worksheet_formats['data']
+        detail_low = self._low_confidence_mask([detail_row[1:6] for detail_row in detail_rows])
+        for idx, detail_row in enumerate(detail_rows):
+            worksheet.write(row + 1 + idx, 0, detail_row[0], data_format)
+            self._write_confidence_scores(worksheet, row + 1 + idx, 1, detail_row[1:6], detail_low[idx])
+            worksheet.write_row(row + 1 + idx, 6, detail_row[6:], data_format)
         
         # Attribute-level confidence analysis
-        row += len(json_data_list) + 3
+        row += len(detail_rows) + 3
         worksheet.write(row, 0, 'Attribute-Level Confidence Analysis', self.worksheet_formats['header'])
         row += 1
         
-        # Collect all attributes and their confidence scores
-        attribute_confidence = {}
-        for pdf_data in json_data_list:
-            extracted_attrs = pdf_data.get('extracted_attributes', {})
-            for attr_name, attr_data in extracted_attrs.items():
-                if attr_name not in attribute_confidence:
-                    attribute_confidence[attr_name] = []
-                
-                if isinstance(attr_data, dict):
-                    confidence = attr_data.get('confidence', 0)
-                    confidence_breakdown = attr_data.get('confidence_breakdown', {})
-                    attribute_confidence[attr_name].append({
-                        'confidence': confidence,
-                        'breakdown': confidence_breakdown
-                    })
-        
         # Create attribute confidence summary
         attr_headers = ['Attribute', 'Avg Confidence', 'Min Confidence', 'Max Confidence', 'Avg Text Clarity', 'Avg Exact Match', 'Avg Context Match', 'Avg Format Validity']
-        for col_num, header in enumerate(attr_headers):
-            worksheet.write(row, col_num, header, self.worksheet_formats['subheader'])
+        worksheet.write_row(row, 0, attr_headers, self.worksheet_formats['subheader'])
         
-        for idx, (attr_name, confidence_data) in enumerate(attribute_confidence.items()):
-            if not confidence_data:
+        attr_rows = []
+        for idx, (attr_name, stats) in enumerate(quality_metrics['attribute_stats'].items()):
+            if not stats['count']:
                 continue
-                
-            confidences = [item['confidence'] for item in confidence_data]
-            avg_confidence = sum(confidences) / len(confidences)
-            min_confidence = min(confidences)
-            max_confidence = max(confidences)
-            
-            # Calculate average breakdown scores
-            text_clarity_scores = [item['breakdown'].get('text_clarity', 0) for item in confidence_data if item['breakdown']]
-            exact_match_scores = [item['breakdown'].get('exact_match', 0) for item in confidence_data if item['breakdown']]
-            context_match_scores = [item['breakdown'].get('context_match', 0) for item in confidence_data if item['breakdown']]
-            format_validity_scores = [item['breakdown'].get('format_validity', 0) for item in confidence_data if item['breakdown']]
             
-            avg_text_clarity = sum(text_clarity_scores) / len(text_clarity_scores) if text_clarity_scores else 0
-            avg_exact_match = sum(exact_match_scores) / len(exact_match_scores) if exact_match_scores else 0
-            avg_context_match = sum(context_match_scores) / len(context_match_scores) if context_match_scores else 0
-            avg_format_validity = sum(format_validity_scores) / len(format_validity_scores) if format_validity_scores else 0
+            breakdown_count = stats['breakdown_count']
+            avg_breakdowns = [total / breakdown_count if breakdown_count else 0 for total in stats['breakdown_sums']]
             
-            attr_row = [
+            attr_rows.append((idx, [
                 attr_name,
-                avg_confidence,
-                min_confidence,
-                max_confidence,
-                avg_text_clarity,
-                avg_exact_match,
-                avg_context_match,
-                avg_format_validity
-            ]
-            
-            for col_num, value in enumerate(attr_row):
-                if col_num == 0:  # Attribute name
-                    worksheet.write(row + 1 + idx, col_num, value, self.worksheet_formats['data'])
-                else:  # Confidence scores
-                    cell_format = self.worksheet_formats['highlight'] if (isinstance(value, (int, float)) and value < 0.5) else self.worksheet_formats['percentage']
-                    worksheet.write(row + 1 + idx, col_num, value, cell_format)
+                stats['sum'] / stats['count'],
+                stats['min'],
+                stats['max'],
+                *avg_breakdowns
+            ]))
+        
+        attr_low = self._low_confidence_mask([attr_row[1:] for _, attr_row in attr_rows])
+        for (idx, attr_row), low in zip(attr_rows, attr_low):
+            worksheet.write(row + 1 + idx, 0, attr_row[0], data_format)
+            self._write_confidence_scores(worksheet, row + 1 + idx, 1, attr_row[1:], low)
         
         # Auto-fit columns
         worksheet.set_column('A:H', 18)
     
+    @staticmethod
+    def _low_confidence_mask(score_rows: List[List[Any]]) -> np.ndarray:
+        """Return a boolean array marking the scores below 0.5 in a block of rows"""
+        try:
+            scores = np.array(score_rows, dtype=float)
+        except (TypeError, ValueError):
+            # Non-numeric values in the block: only real numbers can be low
+            return np.array([[isinstance(value, (int, float)) and value < 0.5 for value in scores_row]
+                             for scores_row in score_rows], dtype=bool)
+        return scores < 0.5
+    
+    def _write_confidence_scores(self, worksheet, row: int, first_col: int, scores: List[Any], low: np.ndarray):
+        """Write a run of confidence scores, highlighting those below 0.5
+        
+        The run goes out in one write_row call; only the cells flagged in
+        low (see _low_confidence_mask) are rewritten with the highlight format.
+        """
+        worksheet.write_row(row, first_col, scores, self.worksheet_formats['percentage'])
+        highlight_format = self.worksheet_formats['percentage_highlight']
+        for offset in np.flatnonzero(low):
+            worksheet.write(row, first_col + offset, scores[offset], highlight_format)
+    
+    @staticmethod
+    def _column_format_runs(column_formats: List[Any]) -> List[tuple]:
+        """Group a per-column format list into (first_col, end_col, format) runs
+        
+        Resolved once per sheet so each row is written with one write_row per
+        run, without picking a format per cell.
+        """
+        runs = []
+        first_col = 0
+        for cell_format, group in itertools.groupby(column_formats):
+            end_col = first_col + len(list(group))
+            runs.append((first_col, end_col, cell_format))
+            first_col = end_col
+        return runs
+    
+    @staticmethod
+    def _write_row_runs(worksheet, row: int, values: List[Any], runs: List[tuple]):
+        """Write one row using runs from _column_format_runs"""
+        for first_col, end_col, cell_format in runs:
+            worksheet.write_row(row, first_col, values[first_col:end_col], cell_format)
+    
     def _apply_workbook_formatting(self, writer):
         """Apply final workbook-level formatting"""
         # Set default font for all sheets
@@ -1,38 +1,229 @@
 import boto3
+import gzip
+import hashlib
+import io
 import json
 import logging
 from typing import List, Dict, Any, Optional
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 from botocore.exceptions import ClientError
 from excel_generator import ExcelReportGenerator
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson serializes straight to bytes several times faster; fall back to stdlib json when absent
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Excel reports are streamed to S3 in parts of this size (S3 minimum is 5 MB)
+EXCEL_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+EXCEL_UPLOAD_WORKERS = 4
+
+# Concurrent delete_objects requests while cleaning up old outputs
+CLEANUP_DELETE_WORKERS = 16
+
+# Seconds a prefix listing is reused by list_previous_outputs before S3 is listed again
+LIST_CACHE_TTL_SECONDS = 30
+
+# Individual JSON outputs are written compact unless PRETTY_JSON_OUTPUT is set
+PRETTY_JSON_OUTPUT = os.getenv('PRETTY_JSON_OUTPUT', 'false').lower() == 'true'
+
+# Individual JSON outputs are stored gzipped (Content-Encoding: gzip) at this level
+JSON_GZIP_LEVEL = 6
+
+# Individual JSON keys are named by a content digest and written with If-None-Match so
+# unchanged re-runs skip the upload; TIMESTAMPED_JSON_KEYS=true restores per-run keys
+TIMESTAMPED_JSON_KEYS = os.getenv('TIMESTAMPED_JSON_KEYS', 'false').lower() == 'true'
+JSON_DIGEST_LENGTH = 16
+DUPLICATE_WRITE_ERROR_CODES = {'PreconditionFailed', 'ConditionalRequestConflict'}
+
+def _json_default(value: Any) -> Any:
+    """Convert values the JSON encoders don't handle natively; anything unrecognised is written with str()"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    # numpy scalars and arrays (only reached on the stdlib path; orjson serializes them itself)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+def _dump_json_bytes(data: Any) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes, compact unless PRETTY_JSON_OUTPUT is set
+    
+    Args:
+        data: JSON-compatible object; other types are converted by _json_default
+        
+    Returns:
+        Encoded JSON document
+    """
+    if orjson is not None:
+        # numpy scalars and arrays are written as JSON numbers instead of falling back to str()
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if PRETTY_JSON_OUTPUT:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_json_default, option=option)
+    if PRETTY_JSON_OUTPUT:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=_json_default).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_json_default).encode('utf-8')
+
+def _content_digest(json_output: Dict[str, Any]) -> str:
+    """
+    Hex digest of an individual JSON output, ignoring per-run timing fields
+    
+    Args:
+        json_output: Output document built by save_individual_json
+        
+    Returns:
+        First JSON_DIGEST_LENGTH hex characters of the SHA-256 digest
+    """
+    metadata = {
+        key: value for key, value in json_output.get('metadata', {}).items()
+        if key not in ('processing_timestamp', 'processing_time_seconds')
+    }
+    stable = {**json_output, 'metadata': metadata}
+    return hashlib.sha256(_dump_json_bytes(stable)).hexdigest()[:JSON_DIGEST_LENGTH]
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable stream that uploads to S3 while it is written
+    
+    Bytes are buffered into part_size parts and each full part is sent with
+    upload_part on a small thread pool, so at most max_workers parts are
+    held in memory at once. Output smaller than one part is sent with a
+    single put_object instead. Call complete() when writing succeeded and
+    abort() otherwise; close() on its own uploads nothing.
+    """
+    
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int = EXCEL_UPLOAD_PART_SIZE,
+                 max_workers: int = EXCEL_UPLOAD_WORKERS, **object_args):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.object_args = object_args  # ContentType, Metadata, ...
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._part_futures = []
+        self._executor = None
+    
+    def writable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+    
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.object_args)
+            self._upload_id = response['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        
+        # Wait for the oldest part when the pool is full so memory stays bounded
+        in_flight = [future for future in self._part_futures if not future.done()]
+        if len(in_flight) >= self.max_workers:
+            in_flight[0].result()
+        
+        self._part_futures.append(self._executor.submit(
+            self.s3_client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=len(self._part_futures) + 1,
+            Body=body
+        ))
+    
+    def complete(self):
+        """Upload whatever is buffered and finish the object"""
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), **self.object_args)
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                parts = [{'PartNumber': part_number, 'ETag': future.result()['ETag']}
+                         for part_number, future in enumerate(self._part_futures, 1)]
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            self._buffer.clear()
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.close()
+    
+    def abort(self):
+        """Drop the buffered bytes and any parts already uploaded"""
+        self._buffer.clear()
+        if self._executor is not None:
+            # Let in-flight parts finish first so none land after the abort
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+            except Exception as e:
+                logger.error(f"Failed to abort multipart upload for {self.key}: {str(e)}")
+        self.close()
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        super().close()
+
 class OutputHandler:
     """Handle saving outputs to S3 and generating download links"""
     
-    def __init__(self, region_name: str = None):
-        from env_config import get_s3_config, get_aws_session
+    def __init__(self, region_name: str = None, session=None):
+        from env_config import load_environment, get_s3_config, get_aws_session, get_s3_client
         
-        self.region_name = region_name or os.getenv('AWS_REGION', 'us-east-1')
+        # Settings come from the cached environment snapshot rather than os.environ per instance
+        env_vars = load_environment()
+        self.region_name = region_name or env_vars['aws_region']
         self.s3_config = get_s3_config()
         
         # Determine output bucket and folder
-        if self.s3_config['use_single_bucket']:
-            self.output_bucket = self.s3_config['bucket_name']
-            self.output_folder = self.s3_config['output_folder']
+        if self.s3_config.use_single_bucket:
+            self.output_bucket = self.s3_config.bucket_name
+            self.output_folder = self.s3_config.output_folder
         else:
-            self.output_bucket = self.s3_config['output_bucket']
+            self.output_bucket = self.s3_config.output_bucket
             self.output_folder = ""
         
         if not self.output_bucket:
             raise ValueError("No S3 output bucket configured")
         
         try:
-            session = get_aws_session()
-            self.s3_client = session.client('s3')
+            session = session or get_aws_session()
+            self.s3_client = get_s3_client(session, self.region_name, env_vars['s3_max_pool_connections'])
             logger.info(f"S3 client initialized for output bucket: {self.output_bucket}")
             logger.info(f"Output folder: {self.output_folder}")
         except Exception as e:
@@ -40,6 +231,8 @@ class OutputHandler:
             raise
         
         self.excel_generator = ExcelReportGenerator()
+        # prefix -> (monotonic time listed, objects); writes and cleanup invalidate it
+        self._list_cache = {}
     
     def save_individual_json(self, pdf_data: Dict[str, Any], pdf_filename: str) -> str:
         """
@@ -53,22 +246,16 @@ class OutputHandler:
             S3 key of saved JSON file
         """
         try:
-            # Generate JSON filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # One UTC clock read so the body and metadata agree
+            now = datetime.now(timezone.utc)
+            processing_timestamp = now.isoformat(timespec='seconds')
             base_name = os.path.splitext(pdf_filename)[0]
-            json_filename = f"{base_name}_{timestamp}.json"
-            
-            # Construct S3 key based on configuration
-            if self.output_folder:
-                s3_key = f"{self.output_folder}/individual_jsons/{json_filename}"
-            else:
-                s3_key = f"Output/individual_jsons/{json_filename}"
             
             # Prepare JSON data with metadata
             json_output = {
                 "metadata": {
                     "original_filename": pdf_filename,
-                    "processing_timestamp": datetime.now().isoformat(),
+                    "processing_timestamp": processing_timestamp,
                     "extraction_method": pdf_data.get('extraction_method', 'unknown'),
                     "processing_time_seconds": pdf_data.get('processing_time', 0),
                     "confidence_score": pdf_data.get('extraction_metadata', {}).get('confidence_score', 0)
@@ -82,22 +269,61 @@ class OutputHandler:
                 }
             }
             
-            # Convert to JSON string
-            json_content = json.dumps(json_output, indent=2, default=str)
+            # Name by content so re-processing an unchanged PDF maps to the same key
+            if TIMESTAMPED_JSON_KEYS:
+                json_filename = f"{base_name}_{now.strftime('%Y%m%d_%H%M%S')}.json"
+            else:
+                json_filename = f"{base_name}_{_content_digest(json_output)}.json"
             
-            # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.output_bucket,
-                Key=s3_key,
-                Body=json_content.encode('utf-8'),
-                ContentType='application/json',
-                Metadata={
+            # Construct S3 key based on configuration
+            if self.output_folder:
+                s3_key = f"{self.output_folder}/individual_jsons/{json_filename}"
+            else:
+                s3_key = f"Output/individual_jsons/{json_filename}"
+            
+            # Convert to JSON bytes
+            json_content = _dump_json_bytes(json_output)
+            
+            put_args = {} if TIMESTAMPED_JSON_KEYS else {'IfNoneMatch': '*'}
+            object_args = {
+                'ContentType': 'application/json',
+                'ContentEncoding': 'gzip',
+                'Metadata': {
                     'original-filename': pdf_filename,
-                    'processing-timestamp': datetime.now().isoformat(),
+                    'processing-timestamp': processing_timestamp,
                     'content-type': 'extraction-results'
                 }
-            )
+            }
             
+            # Upload to S3 gzipped; presigned downloads are decoded transparently by browsers
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.output_bucket,
+                    Key=s3_key,
+                    Body=gzip.compress(json_content, compresslevel=JSON_GZIP_LEVEL),
+                    **object_args,
+                    **put_args
+                )
+            except ClientError as e:
+                # An object with identical content already exists (or is being written) under this key
+                error_code = e.response.get('Error', {}).get('Code')
+                if put_args and error_code in DUPLICATE_WRITE_ERROR_CODES:
+                    if error_code == 'PreconditionFailed':
+                        # Copy the object onto itself with this run's metadata so its LastModified
+                        # moves forward and cleanup_old_outputs doesn't treat it as stale
+                        self.s3_client.copy_object(
+                            Bucket=self.output_bucket,
+                            Key=s3_key,
+                            CopySource={'Bucket': self.output_bucket, 'Key': s3_key},
+                            MetadataDirective='REPLACE',
+                            **object_args
+                        )
+                        self._invalidate_listing(s3_key)
+                    logger.info(f"Individual JSON unchanged, skipped upload: {s3_key}")
+                    return s3_key
+                raise
+            
+            self._invalidate_listing(s3_key)
             logger.info(f"Saved individual JSON: {s3_key}")
             return s3_key
             
@@ -119,8 +345,9 @@ class OutputHandler:
             S3 key of saved Excel file
         """
         try:
-            # Generate Excel filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # Generate Excel filename (UTC, like every timestamp this handler writes)
+            now = datetime.now(timezone.utc)
+            timestamp = now.strftime('%Y%m%d_%H%M%S')
             excel_filename = f"consolidated_financial_report_{timestamp}.xlsx"
             
             # Construct S3 key based on configuration
@@ -129,23 +356,28 @@ class OutputHandler:
             else:
                 s3_key = f"Output/consolidated_reports/{excel_filename}"
             
-            # Generate Excel report
-            excel_bytes = self.excel_generator.generate_consolidated_excel_report(all_pdf_data)
-            
-            # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.output_bucket,
-                Key=s3_key,
-                Body=excel_bytes,
+            # Generate the Excel report straight into a multipart upload, so
+            # parts go out while the workbook is still being written
+            writer = S3MultipartWriter(
+                self.s3_client,
+                self.output_bucket,
+                s3_key,
                 ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
                 Metadata={
                     'report-type': 'consolidated-financial-report',
-                    'processing-timestamp': datetime.now().isoformat(),
+                    'processing-timestamp': now.isoformat(timespec='seconds'),
                     'pdf-count': str(len(all_pdf_data)),
                     'content-type': 'excel-report'
                 }
             )
+            try:
+                self.excel_generator.generate_consolidated_excel_report(all_pdf_data, output=writer)
+            except Exception:
+                writer.abort()
+                raise
+            writer.complete()
             
+            self._invalidate_listing(s3_key)
             logger.info(f"Saved consolidated Excel report: {s3_key}")
             return s3_key
             
@@ -153,19 +385,20 @@ class OutputHandler:
             logger.error(f"Error saving Excel report: {str(e)}")
             raise Exception("Failed to save consolidated Excel report")
     
-    def process_and_save_all_outputs(self, pdf_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def process_and_save_all_outputs(self, pdf_results: List[Dict[str, Any]], max_workers: int = 8) -> Dict[str, Any]:
         """
         Process and save all outputs (individual JSONs and consolidated Excel)
         
         Args:
             pdf_results: List of PDF processing results
+            max_workers: Number of individual JSON files uploaded concurrently
             
         Returns:
             Dictionary containing all saved file information and download links
         """
         try:
             output_summary = {
-                "processing_timestamp": datetime.now().isoformat(),
+                "processing_timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
                 "total_pdfs_processed": len(pdf_results),
                 "individual_jsons": [],
                 "consolidated_excel": None,
@@ -178,40 +411,29 @@ class OutputHandler:
                 "s3_config": {
                     "bucket": self.output_bucket,
                     "folder": self.output_folder,
-                    "use_single_bucket": self.s3_config['use_single_bucket']
+                    "use_single_bucket": self.s3_config.use_single_bucket
                 }
             }
             
-            # Save individual JSON files
+            # Save individual JSON files (upload and sign each one in a worker)
             successful_extractions = 0
             total_confidence = 0
             
-            for pdf_result in pdf_results:
-                try:
-                    json_key = self.save_individual_json(pdf_result, pdf_result.get('filename', 'unknown.pdf'))
-                    
-                    json_info = {
-                        "filename": pdf_result.get('filename'),
-                        "s3_key": json_key,
-                        "confidence_score": pdf_result.get('extraction_metadata', {}).get('confidence_score', 0),
-                        "processing_time": pdf_result.get('processing_time', 0)
-                    }
-                    
-                    output_summary["individual_jsons"].append(json_info)
-                    
+            # The Excel report is generated and streamed on its own worker while the
+            # JSON uploads are in flight, so its CPU time overlaps their network waits
+            with ThreadPoolExecutor(max_workers=max(1, max_workers) + 1) as executor:
+                excel_future = executor.submit(self.save_consolidated_excel, pdf_results)
+                json_infos = list(executor.map(self._save_and_sign_json, pdf_results))
+            
+            for json_info in json_infos:
+                output_summary["individual_jsons"].append(json_info)
+                
+                if json_info.get("s3_key"):
                     # Update statistics
-                    confidence = pdf_result.get('extraction_metadata', {}).get('confidence_score', 0)
+                    confidence = json_info["confidence_score"]
                     if confidence > 0.5:
                         successful_extractions += 1
                     total_confidence += confidence
-                    
-                except Exception as e:
-                    logger.error(f"Failed to save JSON for {pdf_result.get('filename')}: {str(e)}")
-                    output_summary["individual_jsons"].append({
-                        "filename": pdf_result.get('filename'),
-                        "s3_key": None,
-                        "error": str(e)
-                    })
             
             # Update processing summary
             output_summary["processing_summary"].update({
@@ -220,9 +442,9 @@ class OutputHandler:
                 "average_confidence": total_confidence / len(pdf_results) if pdf_results else 0
             })
             
-            # Save consolidated Excel report
+            # Collect the consolidated Excel report
             try:
-                excel_key = self.save_consolidated_excel(pdf_results)
+                excel_key = excel_future.result()
                 output_summary["consolidated_excel"] = {
                     "s3_key": excel_key,
                     "filename": os.path.basename(excel_key)
@@ -244,6 +466,44 @@ class OutputHandler:
             logger.error(f"Error in process_and_save_all_outputs: {str(e)}")
             raise
     
+    def _save_and_sign_json(self, pdf_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload one PDF's JSON and presign its download URL in a single worker trip"""
+        try:
+            json_key = self.save_individual_json(pdf_result, pdf_result.get('filename', 'unknown.pdf'))
+            
+            json_info = {
+                "filename": pdf_result.get('filename'),
+                "s3_key": json_key,
+                "confidence_score": pdf_result.get('extraction_metadata', {}).get('confidence_score', 0),
+                "processing_time": pdf_result.get('processing_time', 0)
+            }
+            
+            try:
+                json_info["download_url"] = self._generate_presigned_url(json_key)
+            except Exception as e:
+                logger.error(f"Failed to generate download link for {json_info['filename']}: {str(e)}")
+            
+            return json_info
+            
+        except Exception as e:
+            logger.error(f"Failed to save JSON for {pdf_result.get('filename')}: {str(e)}")
+            return {
+                "filename": pdf_result.get('filename'),
+                "s3_key": None,
+                "error": str(e)
+            }
+    
+    def _generate_presigned_url(self, s3_key: str) -> str:
+        """Generate a 24 hour presigned download URL for an output object"""
+        return self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.output_bucket,
+                'Key': s3_key
+            },
+            ExpiresIn=86400  # 24 hours
+        )
+    
     def generate_download_links(self, output_summary: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate presigned URLs for downloading files
@@ -265,14 +525,8 @@ class OutputHandler:
             for json_info in output_summary.get("individual_jsons", []):
                 if json_info.get("s3_key"):
                     try:
-                        presigned_url = self.s3_client.generate_presigned_url(
-                            'get_object',
-                            Params={
-                                'Bucket': self.output_bucket,
-                                'Key': json_info["s3_key"]
-                            },
-                            ExpiresIn=86400  # 24 hours
-                        )
+                        # Reuse the URL signed alongside the upload when available
+                        presigned_url = json_info.get("download_url") or self._generate_presigned_url(json_info["s3_key"])
                         
                         download_links["individual_jsons"].append({
                             "filename": json_info["filename"],
@@ -287,14 +541,7 @@ class OutputHandler:
             excel_info = output_summary.get("consolidated_excel")
             if excel_info and excel_info.get("s3_key"):
                 try:
-                    presigned_url = self.s3_client.generate_presigned_url(
-                        'get_object',
-                        Params={
-                            'Bucket': self.output_bucket,
-                            'Key': excel_info["s3_key"]
-                        },
-                        ExpiresIn=86400  # 24 hours
-                    )
+                    presigned_url = self._generate_presigned_url(excel_info["s3_key"])
                     
                     download_links["consolidated_excel"] = {
                         "filename": excel_info["filename"],
@@ -334,41 +581,29 @@ class OutputHandler:
             
             # List individual JSON files
             try:
-                response = self.s3_client.list_objects_v2(
-                    Bucket=self.output_bucket,
-                    Prefix=json_prefix
-                )
-                
-                if 'Contents' in response:
-                    for obj in response['Contents']:
-                        if obj['Key'].endswith('.json'):
-                            previous_outputs["individual_jsons"].append({
-                                "key": obj['Key'],
-                                "filename": os.path.basename(obj['Key']),
-                                "size": obj['Size'],
-                                "last_modified": obj['LastModified'],
-                                "size_kb": round(obj['Size'] / 1024, 2)
-                            })
+                for obj in self._list_objects_cached(json_prefix):
+                    if obj['Key'].endswith('.json'):
+                        previous_outputs["individual_jsons"].append({
+                            "key": obj['Key'],
+                            "filename": os.path.basename(obj['Key']),
+                            "size": obj['Size'],
+                            "last_modified": obj['LastModified'],
+                            "size_kb": round(obj['Size'] / 1024, 2)
+                        })
             except Exception as e:
                 logger.warning(f"Could not list individual JSONs: {str(e)}")
             
             # List consolidated reports
             try:
-                response = self.s3_client.list_objects_v2(
-                    Bucket=self.output_bucket,
-                    Prefix=excel_prefix
-                )
-                
-                if 'Contents' in response:
-                    for obj in response['Contents']:
-                        if obj['Key'].endswith('.xlsx'):
-                            previous_outputs["consolidated_reports"].append({
-                                "key": obj['Key'],
-                                "filename": os.path.basename(obj['Key']),
-                                "size": obj['Size'],
-                                "last_modified": obj['LastModified'],
-                                "size_mb": round(obj['Size'] / (1024 * 1024), 2)
-                            })
+                for obj in self._list_objects_cached(excel_prefix):
+                    if obj['Key'].endswith('.xlsx'):
+                        previous_outputs["consolidated_reports"].append({
+                            "key": obj['Key'],
+                            "filename": os.path.basename(obj['Key']),
+                            "size": obj['Size'],
+                            "last_modified": obj['LastModified'],
+                            "size_mb": round(obj['Size'] / (1024 * 1024), 2)
+                        })
             except Exception as e:
                 logger.warning(f"Could not list consolidated reports: {str(e)}")
             
@@ -382,6 +617,26 @@ class OutputHandler:
             logger.error(f"Error listing previous outputs: {str(e)}")
             return {"individual_jsons": [], "consolidated_reports": []}
     
+    def _list_objects_cached(self, prefix: str) -> List[Dict[str, Any]]:
+        """List every object under prefix, reusing a listing younger than LIST_CACHE_TTL_SECONDS"""
+        cached = self._list_cache.get(prefix)
+        if cached and time.monotonic() - cached[0] < LIST_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.output_bucket,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': 1000}
+        )
+        objects = [obj for page in pages for obj in page.get('Contents', [])]
+        self._list_cache[prefix] = (time.monotonic(), objects)
+        return objects
+    
+    def _invalidate_listing(self, s3_key: str):
+        """Drop the cached listing of the prefix s3_key was written under"""
+        self._list_cache.pop(f"{os.path.dirname(s3_key)}/", None)
+    
     def cleanup_old_outputs(self, days_to_keep: int = 30) -> Dict[str, int]:
         """
         Clean up old output files from S3
@@ -393,9 +648,8 @@ class OutputHandler:
             Dictionary with cleanup statistics
         """
         try:
-            from datetime import timedelta
-            
-            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+            # S3 reports LastModified as an aware UTC datetime, so compare against one
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
             cleanup_stats = {
                 "files_deleted": 0,
                 "space_freed_mb": 0,
@@ -408,33 +662,46 @@ class OutputHandler:
             else:
                 prefix = "Output/"
             
-            # List all output files
-            response = self.s3_client.list_objects_v2(
+            # List all output files page by page; a page holds at most 1000
+            # keys, which is also the delete_objects limit per request
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
                 Bucket=self.output_bucket,
-                Prefix=prefix
+                Prefix=prefix,
+                PaginationConfig={'PageSize': 1000}
             )
             
-            if 'Contents' in response:
-                files_to_delete = []
-                
-                for obj in response['Contents']:
-                    if obj['LastModified'].replace(tzinfo=None) < cutoff_date:
-                        files_to_delete.append({'Key': obj['Key']})
-                        cleanup_stats["space_freed_mb"] += obj['Size'] / (1024 * 1024)
+            # Each page's deletes run in the background while the next page is listed
+            with ThreadPoolExecutor(max_workers=CLEANUP_DELETE_WORKERS) as executor:
+                delete_futures = []
+                for page in pages:
+                    files_to_delete = []
+                    
+                    for obj in page.get('Contents', []):
+                        if obj['LastModified'] < cutoff_date:
+                            files_to_delete.append({'Key': obj['Key']})
+                            cleanup_stats["space_freed_mb"] += obj['Size'] / (1024 * 1024)
+                    
+                    if files_to_delete:
+                        # Quiet mode only reports the keys that failed
+                        future = executor.submit(
+                            self.s3_client.delete_objects,
+                            Bucket=self.output_bucket,
+                            Delete={'Objects': files_to_delete, 'Quiet': True}
+                        )
+                        delete_futures.append((future, len(files_to_delete)))
                 
-                # Delete old files in batches
-                if files_to_delete:
-                    for i in range(0, len(files_to_delete), 1000):  # S3 delete limit is 1000
-                        batch = files_to_delete[i:i+1000]
-                        try:
-                            self.s3_client.delete_objects(
-                                Bucket=self.output_bucket,
-                                Delete={'Objects': batch}
-                            )
-                            cleanup_stats["files_deleted"] += len(batch)
-                        except Exception as e:
-                            logger.error(f"Error deleting batch: {str(e)}")
-                            cleanup_stats["errors"] += len(batch)
+                for future, batch_size in delete_futures:
+                    try:
+                        failed = len(future.result().get('Errors', []))
+                        cleanup_stats["files_deleted"] += batch_size - failed
+                        cleanup_stats["errors"] += failed
+                    except Exception as e:
+                        logger.error(f"Error deleting batch: {str(e)}")
+                        cleanup_stats["errors"] += batch_size
+            
+            # Deleted keys may sit under any cached prefix
+            self._list_cache.clear()
             
             logger.info(f"Cleanup completed: {cleanup_stats['files_deleted']} files deleted, "
                        f"{cleanup_stats['space_freed_mb']:.2f}MB freed")
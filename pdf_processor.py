@@ -1,95 +1,226 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 import fitz  # PyMuPDF
 import pdfplumber
+import pypdfium2 as pdfium
+import numpy as np
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageFilter
 import io
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Union
 import os
+import heapq
 from botocore.exceptions import ClientError
 import tempfile
+import contextlib
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import multiprocessing
+import threading
+from collections import OrderedDict
+from operator import itemgetter
 import time
 from dotenv import load_dotenv
 
+# tesserocr keeps the tesseract engine loaded in-process; without it OCR runs through the
+# pytesseract command-line wrapper
+try:
+    from tesserocr import PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Concurrent S3 downloads in process_multiple_pdfs, independent of the extraction workers
+PDF_DOWNLOAD_WORKERS = 16
+
+# PDF_EXTRACTION_PROCESSES=true runs the extraction stage of process_multiple_pdfs in worker
+# processes instead of threads, so GIL-holding parsers can use every core
+EXTRACTION_PROCESSES = os.getenv('PDF_EXTRACTION_PROCESSES', 'false').lower() == 'true'
+
+# Page render scale for OCR: aim for ~300 DPI without upsampling beyond embedded scans, within these bounds
+OCR_TARGET_DPI = 300
+OCR_MIN_SCALE = 1.5
+OCR_MAX_SCALE = 3.0
+OCR_MAX_DIMENSION = 2500
+
+# Adaptive threshold applied to page images before OCR: window size in pixels and offset below the local mean
+OCR_THRESHOLD_BLOCK = 31
+OCR_THRESHOLD_OFFSET = 10
+
+# Extraction results of unchanged S3 objects kept in memory for re-processing
+EXTRACTION_CACHE_SIZE = 64
+
+# process_multiple_pdfs gives up on the remaining PDFs when none finishes for this long
+PDF_TIMEOUT_SECONDS = 300
+
+# PDFs above the threshold are downloaded as concurrent ranged GETs of this chunk size
+PDF_DOWNLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+
+def _binarize_for_ocr(image: Image.Image) -> Image.Image:
+    """
+    Grayscale and adaptively threshold a page image before OCR
+    
+    Each pixel is compared with the mean of the OCR_THRESHOLD_BLOCK square around it
+    (minus OCR_THRESHOLD_OFFSET), which evens out shading and scan noise so tesseract
+    spends less time on its own binarization and fewer words fail the confidence filter.
+    """
+    gray = image.convert('L')
+    
+    # PIL's box blur gives the local means in C on 8-bit data; the only full-page
+    # numpy buffers are the int16 threshold and the output mask
+    threshold = np.asarray(gray.filter(ImageFilter.BoxBlur(OCR_THRESHOLD_BLOCK // 2)), dtype=np.int16)
+    threshold -= OCR_THRESHOLD_OFFSET
+    
+    return Image.fromarray(np.multiply(np.asarray(gray) > threshold, 255, dtype=np.uint8), mode='L')
+
+def _pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """Wrap a single-channel grayscale pixmap's samples as a PIL image without converting them"""
+    return Image.frombuffer("L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride, 1)
+
+# PDFProcessor of an extraction worker process, created on its first task
+_worker_processor = None
+
+def _extract_in_worker(pdf_bytes: bytes, filename: str, strategy: str) -> Dict[str, Any]:
+    """Run extract_text_from_pdf in an extraction worker process"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = PDFProcessor()
+    return _worker_processor.extract_text_from_pdf(pdf_bytes, filename, strategy)
+
+def _prefetch(iterable):
+    """Yield items from iterable while a background thread already fetches the next one"""
+    iterator = iter(iterable)
+    done = object()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, iterator, done)
+        while True:
+            item = future.result()
+            if item is done:
+                return
+            future = executor.submit(next, iterator, done)
+            yield item
+
 class PDFProcessor:
     """Handle PDF processing including S3 operations, text extraction, and OCR"""
     
-    def __init__(self, region_name: str = None):
-        from env_config import get_s3_config, get_aws_session
+    def __init__(self, region_name: str = None, session=None, list_cache_ttl: float = 0):
+        from env_config import load_environment, get_s3_config, get_aws_session, get_s3_client
         
-        self.region_name = region_name or os.getenv('AWS_REGION', 'us-east-1')
+        # Settings come from the cached environment snapshot rather than os.environ per instance
+        env_vars = load_environment()
+        self.region_name = region_name or env_vars['aws_region']
         self.max_file_size = 100 * 1024 * 1024  # 100MB
+        # Text layer coverage below min_text_coverage * min_chars_per_page per page triggers OCR
+        self.min_chars_per_page = 200
+        self.min_text_coverage = 0.2
         self.s3_config = get_s3_config()
+        # Extraction results keyed by (bucket, key, ETag, strategy), least recently used first
+        self._extraction_cache = OrderedDict()
+        self._extraction_cache_lock = threading.Lock()
+        # PDF listings keyed by (bucket, prefix, max_items), as (monotonic time, PDF list); off
+        # unless list_cache_ttl is set, for callers that don't cache listings themselves (the app does)
+        self.list_cache_ttl = list_cache_ttl
+        self._list_cache = {}
+        # One tesserocr engine per worker thread (the API isn't thread-safe), created on first OCR
+        self._ocr_local = threading.local()
         
         try:
-            session = get_aws_session()
-            self.s3_client = session.client('s3')
+            session = session or get_aws_session()
+            self.s3_client = get_s3_client(session, self.region_name, env_vars['s3_max_pool_connections'])
             logger.info(f"S3 client initialized for region: {self.region_name}")
             logger.info(f"S3 config: {self.s3_config}")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {str(e)}")
             raise
     
-    def list_pdfs_from_s3(self, bucket_name: str = None) -> List[Dict[str, Any]]:
+    def clear_list_cache(self):
+        """Forget cached PDF listings, e.g. after the input location changes"""
+        self._list_cache.clear()
+    
+    def list_pdfs_from_s3(self, bucket_name: str = None, max_items: int = 5000) -> List[Dict[str, Any]]:
         """
-        List all PDF files in the S3 input location
+        List all PDF files in the S3 input location, reusing a listing younger than list_cache_ttl seconds
         
         Args:
             bucket_name: Name of the S3 bucket (optional, uses config if not provided)
+            max_items: Keep only the newest this many PDFs (by last modified)
             
         Returns:
             List of dictionaries containing PDF file information
         """
         try:
             # Determine bucket and prefix based on configuration
-            if self.s3_config['use_single_bucket']:
-                bucket = self.s3_config['bucket_name']
-                prefix = f"{self.s3_config['input_folder']}/"
+            if self.s3_config.use_single_bucket:
+                bucket = self.s3_config.bucket_name
+                prefix = f"{self.s3_config.input_folder}/"
             else:
-                bucket = bucket_name or self.s3_config['input_bucket']
+                bucket = bucket_name or self.s3_config.input_bucket
                 prefix = ""
             
             if not bucket:
                 raise Exception("No S3 bucket configured for input")
             
+            cache_key = (bucket, prefix, max_items)
+            cached = self._list_cache.get(cache_key)
+            if cached and time.monotonic() - cached[0] < self.list_cache_ttl:
+                return list(cached[1])
+            
             logger.info(f"Listing PDFs from bucket: {bucket}, prefix: {prefix}")
             
-            response = self.s3_client.list_objects_v2(
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
                 Bucket=bucket,
-                Prefix=prefix
+                Prefix=prefix,
+                PaginationConfig={'PageSize': 1000}
             )
             
-            if 'Contents' not in response:
-                logger.info(f"No files found in bucket: {bucket} with prefix: {prefix}")
-                return []
-            
             pdf_files = []
-            for obj in response['Contents']:
-                key = obj['Key']
-                if key.lower().endswith('.pdf') and key != prefix:  # Exclude the folder itself
-                    # Extract filename from key (remove prefix)
-                    filename = key.replace(prefix, '') if prefix else os.path.basename(key)
-                    
-                    pdf_info = {
-                        'key': key,
-                        'filename': filename,
+            truncated = False
+            for page in _prefetch(pages):
+                # Case-insensitive suffix check on the last four characters only, excluding the
+                # folder itself; the filename is the key without the prefix
+                pdf_files.extend(
+                    {
+                        'key': obj['Key'],
+                        'filename': obj['Key'][len(prefix):] if prefix else os.path.basename(obj['Key']),
                         'size': obj['Size'],
                         'last_modified': obj['LastModified'],
                         'size_mb': round(obj['Size'] / (1024 * 1024), 2),
+                        'etag': obj.get('ETag'),
                         'bucket': bucket
                     }
-                    pdf_files.append(pdf_info)
+                    for obj in page.get('Contents', ())
+                    if obj['Key'][-4:].lower() == '.pdf' and obj['Key'] != prefix
+                )
+                
+                # Keys come back in key order, so every page is read; trimming to the newest
+                # max_items as it goes keeps no more than one extra page of entries in memory
+                if len(pdf_files) > max_items:
+                    pdf_files = heapq.nlargest(max_items, pdf_files, key=itemgetter('last_modified'))
+                    truncated = True
+            
+            if truncated:
+                logger.warning(f"Kept the newest {max_items} PDF files in {bucket}/{prefix}")
+            if not pdf_files:
+                logger.info(f"No files found in bucket: {bucket} with prefix: {prefix}")
+            else:
+                logger.info(f"Found {len(pdf_files)} PDF files in {bucket}/{prefix}")
             
-            logger.info(f"Found {len(pdf_files)} PDF files in {bucket}/{prefix}")
-            return sorted(pdf_files, key=lambda x: x['last_modified'], reverse=True)
+            pdf_files.sort(key=itemgetter('last_modified'), reverse=True)
+            if self.list_cache_ttl > 0:
+                self._list_cache[cache_key] = (time.monotonic(), pdf_files)
+            return list(pdf_files)
             
         except ClientError as e:
             logger.error(f"Error listing PDFs from S3: {str(e)}")
@@ -98,31 +229,68 @@ class PDFProcessor:
             logger.error(f"Unexpected error listing PDFs: {str(e)}")
             raise
     
-    def download_pdf(self, bucket_name: str, key: str) -> bytes:
+    def download_pdf(self, bucket_name: str, key: str, known_size: Optional[int] = None) -> bytes:
         """
         Download PDF file from S3
         
         Args:
             bucket_name: Name of the S3 bucket
             key: S3 object key
+            known_size: Object size already known from a listing, checked before requesting the object
             
         Returns:
             PDF file content as bytes
         """
+        return self._download_pdf(bucket_name, key, known_size=known_size)[1]
+    
+    def _download_pdf(self, bucket_name: str, key: str, strategy: Optional[str] = None,
+                      known_size: Optional[int] = None,
+                      etag: Optional[str] = None) -> Tuple[Optional[tuple], Optional[bytes], Optional[Dict[str, Any]]]:
+        """
+        Download a PDF, unless an extraction of the same object version is already cached
+        
+        Args:
+            bucket_name: Name of the S3 bucket
+            key: S3 object key
+            strategy: Extraction strategy to look up in the cache; None always downloads
+            known_size: Object size from list_pdfs_from_s3, checked before any request is made;
+                without it the size and ETag come from a HEAD request
+            etag: Object ETag from list_pdfs_from_s3, used as the cache key along with known_size
+            
+        Returns:
+            Tuple of (cache key, PDF bytes, cached extraction); exactly one of the last two is set
+        """
         try:
-            # Check file size first
-            response = self.s3_client.head_object(Bucket=bucket_name, Key=key)
-            file_size = response['ContentLength']
+            # Check file size first; the ETag identifies the object version. A listing already
+            # carries both, otherwise a HEAD does without opening a body that may go unread
+            if known_size is None:
+                head = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+                file_size = head['ContentLength']
+                etag = head.get('ETag')
+            else:
+                file_size = known_size
             
             if file_size > self.max_file_size:
                 raise Exception(f"File too large: {file_size / (1024*1024):.2f}MB (max: {self.max_file_size / (1024*1024)}MB)")
             
-            # Download the file
-            response = self.s3_client.get_object(Bucket=bucket_name, Key=key)
-            pdf_content = response['Body'].read()
+            cache_key = None
+            if strategy is not None and etag:
+                cache_key = (bucket_name, key, etag, strategy)
+                cached = self._get_cached_extraction(cache_key)
+                if cached is not None:
+                    logger.info(f"Using cached extraction for unchanged PDF: {key}")
+                    return cache_key, None, cached
+            
+            # Download the file; large files as parallel byte ranges through the transfer manager
+            if file_size >= PDF_DOWNLOAD_TRANSFER_CONFIG.multipart_threshold:
+                buffer = io.BytesIO()
+                self.s3_client.download_fileobj(bucket_name, key, buffer, Config=PDF_DOWNLOAD_TRANSFER_CONFIG)
+                pdf_content = buffer.getvalue()
+            else:
+                pdf_content = self.s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read()
             
             logger.info(f"Downloaded PDF: {key} ({file_size / (1024*1024):.2f}MB)")
-            return pdf_content
+            return cache_key, pdf_content, None
             
         except ClientError as e:
             logger.error(f"Error downloading PDF from S3: {str(e)}")
@@ -131,13 +299,32 @@ class PDFProcessor:
             logger.error(f"Unexpected error downloading PDF: {str(e)}")
             raise
     
-    def extract_text_from_pdf(self, pdf_bytes: bytes, filename: str = "unknown.pdf") -> Dict[str, Any]:
+    def _get_cached_extraction(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        """Copy of a cached extraction result, refreshed as most recently used"""
+        with self._extraction_cache_lock:
+            cached = self._extraction_cache.get(cache_key)
+            if cached is None:
+                return None
+            self._extraction_cache.move_to_end(cache_key)
+            return dict(cached)
+    
+    def _cache_extraction(self, cache_key: tuple, result: Dict[str, Any]):
+        """Remember an extraction result, evicting the least recently used beyond EXTRACTION_CACHE_SIZE"""
+        with self._extraction_cache_lock:
+            self._extraction_cache[cache_key] = dict(result)
+            self._extraction_cache.move_to_end(cache_key)
+            while len(self._extraction_cache) > EXTRACTION_CACHE_SIZE:
+                self._extraction_cache.popitem(last=False)
+    
+    def extract_text_from_pdf(self, pdf_bytes: bytes, filename: str = "unknown.pdf", strategy: str = "auto") -> Dict[str, Any]:
         """
         Extract text from PDF using multiple methods
         
         Args:
             pdf_bytes: PDF file content as bytes
             filename: Original filename for logging
+            strategy: 'auto' uses the text layer and falls back to OCR only when its coverage is low,
+                'text' never runs OCR, 'ocr' always runs OCR
             
         Returns:
             Dictionary containing extracted text and metadata
@@ -155,44 +342,89 @@ class PDFProcessor:
             'errors': []
         }
         
+        pdf = None
+        # PyMuPDF handle, opened only if a fallback needs it and then shared by the PyMuPDF text
+        # pass and OCR; False once opening has failed
+        fitz_doc = None
+        
+        def open_fitz() -> Optional[fitz.Document]:
+            nonlocal fitz_doc
+            if fitz_doc is None:
+                try:
+                    fitz_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                except Exception as e:
+                    logger.warning(f"PyMuPDF could not open PDF: {str(e)}")
+                    fitz_doc = False
+            return fitz_doc or None
+        
+        # Per-page PyMuPDF text, read in one pass and shared by the PyMuPDF text extractor and OCR
+        page_texts = None
+        
+        def fitz_page_texts() -> Optional[List[str]]:
+            nonlocal page_texts
+            if page_texts is None:
+                page_texts = self._extract_page_texts(open_fitz())
+            return page_texts
+        
         try:
-            # First, try with pdfplumber (best for text-based PDFs)
-            text_content = self._extract_with_pdfplumber(pdf_bytes)
-            
-            if text_content and len(text_content.strip()) > 100:
-                result.update({
-                    'text': text_content,
-                    'extraction_method': 'pdfplumber',
-                    'has_text': True,
-                    'confidence_score': 0.95
-                })
-                logger.info(f"Successfully extracted text using pdfplumber: {filename}")
-            else:
-                # If pdfplumber fails, try PyMuPDF
-                text_content = self._extract_with_pymupdf(pdf_bytes)
-                
-                if text_content and len(text_content.strip()) > 100:
-                    result.update({
-                        'text': text_content,
-                        'extraction_method': 'pymupdf',
-                        'has_text': True,
-                        'confidence_score': 0.90
-                    })
-                    logger.info(f"Successfully extracted text using PyMuPDF: {filename}")
-                else:
-                    # If both fail, try OCR
-                    ocr_result = self._extract_with_ocr(pdf_bytes)
-                    result.update(ocr_result)
-                    logger.info(f"Used OCR for text extraction: {filename}")
-            
-            # Get page count
+            # Open once with PDFium; the same handle gives the page count (needed to judge
+            # text-layer coverage) and the fast text extraction
             try:
-                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                result['page_count'] = len(doc)
-                doc.close()
+                pdf = pdfium.PdfDocument(pdf_bytes)
+                result['page_count'] = len(pdf)
             except Exception as e:
                 logger.warning(f"Could not get page count: {str(e)}")
             
+            if strategy == 'ocr':
+                ocr_result = self._extract_with_ocr(open_fitz())
+                result.update(ocr_result)
+                logger.info(f"Used OCR for text extraction: {filename}")
+            else:
+                # Fastest extractor first; pdfplumber's layout analysis is the last resort
+                # before OCR (e.g. table-heavy layouts the others return little text for)
+                extractors = (
+                    ('pdfium', 0.95, lambda: self._extract_with_pdfium(pdf) if pdf is not None else ""),
+                    ('pymupdf', 0.90, lambda: self._extract_with_pymupdf(fitz_page_texts())),
+                    ('pdfplumber', 0.85, lambda: self._extract_with_pdfplumber(pdf_bytes))
+                )
+                candidates = []
+                for method, confidence, extract in extractors:
+                    # Once the PDFium pass comes up short, a couple of sampled pages tell a scanned PDF
+                    # apart before the slower extractors run over the whole file; OCR still keeps
+                    # the text of any pages that have it. Text PDFs are parsed by PDFium alone
+                    if len(candidates) == 1 and strategy == 'auto' and self._classify_pdf(open_fitz()) == 'scanned':
+                        ocr_result = self._extract_with_ocr(open_fitz())
+                        result.update(ocr_result)
+                        logger.info(f"Sampled pages have no text, used OCR for text extraction: {filename}")
+                        break
+                    text_content = extract()
+                    if self._has_text_layer(text_content, result['page_count']):
+                        result.update({
+                            'text': text_content,
+                            'extraction_method': method,
+                            'has_text': True,
+                            'confidence_score': confidence
+                        })
+                        logger.info(f"Successfully extracted text using {method}: {filename}")
+                        break
+                    candidates.append((method, text_content))
+                else:
+                    if strategy == 'text':
+                        # Caller opted out of OCR; keep the most complete text layer found
+                        method, best_text = max(candidates, key=lambda candidate: len(candidate[1].strip()))
+                        result.update({
+                            'text': best_text,
+                            'extraction_method': method,
+                            'has_text': bool(best_text.strip()),
+                            'confidence_score': 0.5
+                        })
+                        logger.info(f"Text layer coverage low, OCR skipped by strategy: {filename}")
+                    else:
+                        # Text layer coverage too low, treat as scanned and try OCR
+                        ocr_result = self._extract_with_ocr(open_fitz(), fitz_page_texts())
+                        result.update(ocr_result)
+                        logger.info(f"Used OCR for text extraction: {filename}")
+            
             result['processing_time'] = round(time.time() - start_time, 2)
             
             if not result['text'] or len(result['text'].strip()) < 50:
@@ -209,6 +441,61 @@ class PDFProcessor:
                 'confidence_score': 0.0
             })
             return result
+        finally:
+            if pdf is not None:
+                pdf.close()
+            if fitz_doc:
+                fitz_doc.close()
+    
+    def _classify_pdf(self, doc: Optional[fitz.Document]) -> Optional[str]:
+        """
+        Classify a PDF by sampling the text layer of its first and middle pages
+        
+        Returns:
+            'text' if both samples have text, 'scanned' if neither does, 'mixed' otherwise,
+            or None if the document couldn't be opened or sampled
+        """
+        if doc is None:
+            return None
+        
+        try:
+            page_count = len(doc)
+            if page_count == 0:
+                return None
+            has_text = [
+                len(doc.load_page(page_num).get_text("text").strip()) > 50
+                for page_num in sorted({0, page_count // 2})
+            ]
+        except Exception as e:
+            logger.warning(f"Could not sample PDF text layer: {str(e)}")
+            return None
+        
+        if all(has_text):
+            return 'text'
+        return 'mixed' if any(has_text) else 'scanned'
+    
+    def _has_text_layer(self, text: str, page_count: int) -> bool:
+        """Born-digital detection: does the extracted text cover enough of the document's pages?"""
+        if not text:
+            return False
+        coverage = len(text.strip()) / (max(1, page_count) * self.min_chars_per_page)
+        return coverage >= self.min_text_coverage
+    
+    def _extract_with_pdfium(self, pdf: "pdfium.PdfDocument") -> str:
+        """Extract text using PDFium from an already opened document"""
+        try:
+            text_parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                if page_text.strip():
+                    text_parts.append(page_text)
+            return '\n'.join(text_parts)
+        except Exception as e:
+            logger.warning(f"PDFium extraction failed: {str(e)}")
+            return ""
     
     def _extract_with_pdfplumber(self, pdf_bytes: bytes) -> str:
         """Extract text using pdfplumber"""
@@ -224,24 +511,30 @@ class PDFProcessor:
             logger.warning(f"pdfplumber extraction failed: {str(e)}")
             return ""
     
-    def _extract_with_pymupdf(self, pdf_bytes: bytes) -> str:
-        """Extract text using PyMuPDF"""
+    def _extract_page_texts(self, doc: Optional[fitz.Document]) -> Optional[List[str]]:
+        """Read the PyMuPDF text of every page of an already opened document (None if it couldn't be opened or read)"""
+        if doc is None:
+            return None
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text_parts = []
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                if text.strip():
-                    text_parts.append(text)
-            doc.close()
-            return '\n'.join(text_parts)
+            return [page.get_text() for page in doc]
         except Exception as e:
             logger.warning(f"PyMuPDF extraction failed: {str(e)}")
+            return None
+    
+    def _extract_with_pymupdf(self, page_texts: Optional[List[str]]) -> str:
+        """Extract text using PyMuPDF from per-page text read by _extract_page_texts"""
+        if page_texts is None:
             return ""
+        return '\n'.join(text for text in page_texts if text.strip())
     
-    def _extract_with_ocr(self, pdf_bytes: bytes) -> Dict[str, Any]:
-        """Extract text using OCR for scanned PDFs"""
+    def _extract_with_ocr(self, doc: Optional[fitz.Document], page_texts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Extract text using OCR for scanned PDFs from an already opened document (None if it couldn't be opened)
+        
+        Args:
+            doc: Opened PyMuPDF document
+            page_texts: Per-page text already read from doc by _extract_page_texts; read here if not given
+        """
         ocr_result = {
             'text': '',
             'extraction_method': 'ocr',
@@ -251,47 +544,43 @@ class PDFProcessor:
             'errors': []
         }
         
+        if doc is None:
+            ocr_result['errors'].append("OCR failed: PDF could not be opened")
+            return ocr_result
+        
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text_parts = []
-            total_confidence = 0
-            page_count = 0
+            # Pages whose embedded text meets the per-page coverage threshold keep it instead of
+            # being rendered and recognized; a stray page number or header on a scanned page doesn't.
+            # OCR is limited to the first 10 pages without enough text for performance
+            min_page_chars = self.min_chars_per_page * self.min_text_coverage
+            embedded_texts = {}
+            ocr_pages = []
+            for page_num in range(len(doc)):
+                if page_texts is None:
+                    page = doc.load_page(page_num)
+                    page_text = page.get_text("text").strip()
+                else:
+                    page = None
+                    page_text = page_texts[page_num].strip()
+                if len(page_text) >= min_page_chars:
+                    embedded_texts[page_num] = page_text
+                elif len(ocr_pages) < 10:
+                    ocr_pages.append((page_num, page or doc.load_page(page_num)))
+            
+            pixmaps = (self._render_page_for_ocr(page) for _, page in ocr_pages)
+            if PyTessBaseAPI is not None:
+                recognized = self._ocr_pages_in_process(pixmaps)
+            else:
+                recognized = self._ocr_pages_batch(pixmaps)
             
-            for page_num in range(min(len(doc), 10)):  # Limit to first 10 pages for performance
-                page = doc.load_page(page_num)
-                
-                # Convert page to image
-                mat = fitz.Matrix(2.0, 2.0)  # Increase resolution
-                pix = page.get_pixmap(matrix=mat)
-                img_data = pix.tobytes("png")
-                
-                # Perform OCR
-                image = Image.open(io.BytesIO(img_data))
-                
-                # Get OCR data with confidence scores
-                ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-                
-                # Extract text and calculate confidence
-                page_text_parts = []
-                confidences = []
-                
-                for i, word in enumerate(ocr_data['text']):
-                    if word.strip():
-                        confidence = int(ocr_data['conf'][i])
-                        if confidence > 30:  # Only include words with reasonable confidence
-                            page_text_parts.append(word)
-                            confidences.append(confidence)
-                
-                if page_text_parts:
-                    page_text = ' '.join(page_text_parts)
-                    text_parts.append(page_text)
-                    
-                    if confidences:
-                        page_confidence = sum(confidences) / len(confidences)
-                        total_confidence += page_confidence
-                        page_count += 1
+            # Extract text and calculate confidence; embedded text is scored like the PyMuPDF text layer it came from
+            page_results = {page_num: (text, 90) for page_num, text in embedded_texts.items()}
+            for position, (page_words, confidences) in recognized.items():
+                page_results[ocr_pages[position][0]] = (' '.join(page_words), sum(confidences) / len(confidences))
             
-            doc.close()
+            text_parts = [page_results[page_num][0] for page_num in sorted(page_results)]
+            total_confidence = sum(confidence for _, confidence in page_results.values())
+            page_count = len(page_results)
             
             if text_parts:
                 ocr_result.update({
@@ -309,84 +598,243 @@ class PDFProcessor:
             ocr_result['errors'].append(f"OCR failed: {str(e)}")
             return ocr_result
     
-    def process_multiple_pdfs(self, bucket_name: str, pdf_keys: List[str]) -> List[Dict[str, Any]]:
+    def _render_page_for_ocr(self, page: fitz.Page) -> fitz.Pixmap:
+        """Render a page in grayscale at the scale from _ocr_render_scale"""
+        scale = self._ocr_render_scale(page)
+        return page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+    
+    def _ocr_render_scale(self, page: fitz.Page) -> float:
+        """
+        Pick the render scale for OCR of a page
+        
+        Targets OCR_TARGET_DPI, or the resolution of the page's sharpest embedded image when
+        that is lower (rendering a 200 DPI scan at 300 DPI only adds pixels), clamped to
+        [OCR_MIN_SCALE, OCR_MAX_SCALE] and to OCR_MAX_DIMENSION pixels on the longest side.
+        """
+        image_dpis = [
+            info['width'] * 72 / (info['bbox'][2] - info['bbox'][0])
+            for info in page.get_image_info()
+            if info['bbox'][2] > info['bbox'][0]
+        ]
+        source_dpi = min(max(image_dpis, default=OCR_TARGET_DPI), OCR_TARGET_DPI)
+        scale = min(max(source_dpi / 72, OCR_MIN_SCALE), OCR_MAX_SCALE)
+        return min(scale, OCR_MAX_DIMENSION / max(page.rect.width, page.rect.height))
+    
+    def _ocr_pages_in_process(self, pixmaps) -> Dict[int, Tuple[List[str], List[int]]]:
+        """OCR rendered pages with this thread's tesserocr engine; returns confident words and their confidences by page position"""
+        api = getattr(self._ocr_local, 'api', None)
+        if api is None:
+            api = self._ocr_local.api = PyTessBaseAPI()
+        
+        pages = {}
+        for position, pix in enumerate(pixmaps):
+            api.SetImage(_binarize_for_ocr(_pixmap_to_image(pix)))
+            page_words, confidences = [], []
+            for word, confidence in api.MapWordConfidences():
+                if word.strip() and confidence > 30:  # Only include words with reasonable confidence
+                    page_words.append(word)
+                    confidences.append(confidence)
+            if page_words:
+                pages[position] = (page_words, confidences)
+        return pages
+    
+    def _ocr_pages_batch(self, pixmaps) -> Dict[int, Tuple[List[str], List[int]]]:
+        """OCR rendered pages in a single tesseract run; returns confident words and their confidences by page position"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Images listed one per line, so one process and model load covers every page;
+            # uncompressed PGM skips the PNG deflate/inflate round trip
+            image_paths = []
+            for page_num, pix in enumerate(pixmaps):
+                image_path = os.path.join(tmp_dir, f"page_{page_num}.pgm")
+                _binarize_for_ocr(_pixmap_to_image(pix)).save(image_path)
+                image_paths.append(image_path)
+            if not image_paths:
+                return {}
+            
+            list_path = os.path.join(tmp_dir, "pages.txt")
+            with open(list_path, 'w') as list_file:
+                list_file.write('\n'.join(image_paths) + '\n')
+            
+            # Get OCR data with confidence scores; page_num identifies the source image
+            ocr_data = pytesseract.image_to_data(list_path, output_type=pytesseract.Output.DICT)
+        
+        # Mask non-empty words with reasonable confidence over the whole run at once
+        words = np.array(ocr_data['text'], dtype=str)
+        confidences = np.array(ocr_data['conf'], dtype=float).astype(np.int32)
+        page_nums = np.array(ocr_data['page_num'], dtype=np.int32)
+        mask = (confidences > 30) & (np.char.str_len(np.char.strip(words)) > 0)
+        
+        # Group confident words by page; tesseract numbers the listed images from 1
+        return {
+            int(page) - 1: (words[page_mask].tolist(), confidences[page_mask].tolist())
+            for page, page_mask in ((page, mask & (page_nums == page)) for page in np.unique(page_nums[mask]))
+        }
+    
+    def process_multiple_pdfs(self, bucket_name: str, pdf_keys: List[Union[str, Dict[str, Any]]], max_workers: Optional[int] = None,
+                              progress_callback: Optional[Callable[[int, int], None]] = None,
+                              strategy: str = "auto") -> List[Dict[str, Any]]:
         """
         Process multiple PDFs concurrently
         
         Args:
             bucket_name: S3 bucket name
-            pdf_keys: List of S3 object keys
+            pdf_keys: List of S3 object keys, or of PDF info dicts from list_pdfs_from_s3 whose
+                size and ETag are checked before the object is requested
+            max_workers: Maximum number of PDFs whose text is extracted in parallel (downloads run
+                separately); defaults to the CPU count, or half of it for worker processes
+            progress_callback: Optional callable invoked as (completed, total) from the calling thread
+            strategy: Text extraction strategy passed to extract_text_from_pdf
             
         Returns:
             List of processing results
         """
-        results = []
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
         
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            # Submit all download and processing tasks
-            future_to_key = {}
-            
-            for key in pdf_keys:
-                future = executor.submit(self._process_single_pdf, bucket_name, key)
-                future_to_key[future] = key
+        if EXTRACTION_PROCESSES:
+            # PyMuPDF and pdfplumber hold the GIL while parsing, so processes scale across cores;
+            # tesseract threads each page with OpenMP, so leave it a couple of cores per process
+            os.environ.setdefault('OMP_NUM_THREADS', '2')
+            max_workers = max_workers or max((os.cpu_count() or 1) // 2, 1)
+            extract_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            extract = _extract_in_worker
+        else:
+            max_workers = max_workers or os.cpu_count() or 1
+            extract_pool = ThreadPoolExecutor(max_workers=max_workers)
+            extract = self.extract_text_from_pdf
+        pdf_infos = [{'key': pdf} if isinstance(pdf, str) else pdf for pdf in pdf_keys]
+        pdf_keys = [pdf_info['key'] for pdf_info in pdf_infos]
+        results = [None] * len(pdf_keys)
+        completed = 0
+        
+        # Downloaded PDFs not yet extracted are held in memory; bound them so fast
+        # downloads can't run arbitrarily far ahead of extraction
+        in_memory = threading.BoundedSemaphore(PDF_DOWNLOAD_WORKERS + max_workers)
+        # Set once the batch has timed out; permits held by abandoned extractions are never
+        # returned, so downloads still waiting for one must give up rather than block forever
+        abandoned = threading.Event()
+        
+        def download(pdf_info: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[bytes], Optional[Dict[str, Any]]]:
+            while not in_memory.acquire(timeout=0.1):
+                if abandoned.is_set():
+                    raise TimeoutError(f"Abandoned after {PDF_TIMEOUT_SECONDS}s timeout")
+            if abandoned.is_set():
+                in_memory.release()
+                raise TimeoutError(f"Abandoned after {PDF_TIMEOUT_SECONDS}s timeout")
+            try:
+                downloaded = self._download_pdf(bucket_name, pdf_info['key'], strategy,
+                                                pdf_info.get('size'), pdf_info.get('etag'))
+            except Exception:
+                in_memory.release()
+                raise
+            if downloaded[1] is None:
+                in_memory.release()  # Cache hit, nothing held for extraction
+            return downloaded
+        
+        # Network-bound downloads and CPU-bound extraction get separate pools, so neither
+        # stage waits on the other; each finished download is handed to the extract pool.
+        # Pending futures map to (extracting, index, cache key of an extraction)
+        with ThreadPoolExecutor(max_workers=PDF_DOWNLOAD_WORKERS) as download_pool, extract_pool:
+            pending = {download_pool.submit(download, pdf_info): (False, idx, None) for idx, pdf_info in enumerate(pdf_infos)}
             
             # Collect results as they complete
-            for future in future_to_key:
-                key = future_to_key[future]
-                try:
-                    result = future.result(timeout=300)  # 5 minute timeout per PDF
-                    results.append(result)
-                    logger.info(f"Completed processing: {key}")
-                except Exception as e:
-                    logger.error(f"Failed to process {key}: {str(e)}")
-                    results.append({
-                        'filename': os.path.basename(key),
-                        'key': key,
-                        'text': '',
-                        'error': str(e),
-                        'processing_time': 0,
-                        'confidence_score': 0.0
-                    })
+            while pending:
+                done, _ = wait(pending, timeout=PDF_TIMEOUT_SECONDS, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Nothing finished within the timeout; give up on whatever is left
+                    abandoned.set()
+                    for future, (_, idx, _) in pending.items():
+                        future.cancel()
+                        results[idx] = self._failed_result(pdf_keys[idx], f"Timed out after {PDF_TIMEOUT_SECONDS}s")
+                    logger.error(f"Timed out waiting for {len(pending)} PDFs")
+                    completed += len(pending)
+                    pending = {}
+                    if progress_callback:
+                        progress_callback(completed, len(pdf_keys))
+                
+                for future in done:
+                    extracted, idx, cache_key = pending.pop(future)
+                    key = pdf_keys[idx]
+                    if extracted:
+                        in_memory.release()
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to process {key}: {str(e)}")
+                        value = self._failed_result(key, str(e))
+                    else:
+                        if extracted:
+                            value['key'] = key
+                            # Only clean extractions are reused; errors may be transient (e.g. OCR unavailable)
+                            if cache_key is not None and not value.get('errors'):
+                                self._cache_extraction(cache_key, value)
+                        else:
+                            cache_key, pdf_bytes, cached = value
+                            if cached is None:
+                                future = extract_pool.submit(extract, pdf_bytes, os.path.basename(key), strategy)
+                                pending[future] = (True, idx, cache_key)
+                                continue
+                            value = cached
+                        logger.info(f"Completed processing: {key}")
+                    
+                    results[idx] = value
+                    completed += 1
+                    if progress_callback:
+                        progress_callback(completed, len(pdf_keys))
         
         return results
     
-    def _process_single_pdf(self, bucket_name: str, key: str) -> Dict[str, Any]:
-        """Process a single PDF file"""
-        try:
-            # Download PDF
-            pdf_bytes = self.download_pdf(bucket_name, key)
-            
-            # Extract text
-            extraction_result = self.extract_text_from_pdf(pdf_bytes, os.path.basename(key))
-            extraction_result['key'] = key
-            
-            return extraction_result
-            
-        except Exception as e:
-            logger.error(f"Error processing PDF {key}: {str(e)}")
-            return {
-                'filename': os.path.basename(key),
-                'key': key,
-                'text': '',
-                'error': str(e),
-                'processing_time': 0,
-                'confidence_score': 0.0
-            }
+    async def aprocess_multiple_pdfs(self, bucket_name: str, pdf_keys: List[Union[str, Dict[str, Any]]],
+                                     max_workers: Optional[int] = None,
+                                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                                     strategy: str = "auto") -> List[Dict[str, Any]]:
+        """
+        Async variant of process_multiple_pdfs for callers running an event loop
+        
+        The pipeline, and so progress_callback, runs on the loop's default executor; its
+        download and extraction pools are the same as for synchronous callers.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.process_multiple_pdfs, bucket_name, pdf_keys, max_workers,
+                                    progress_callback, strategy)
+        )
+    
+    def _failed_result(self, key: str, error: str) -> Dict[str, Any]:
+        """Result recorded for a PDF that could not be downloaded or processed"""
+        return {
+            'filename': os.path.basename(key),
+            'key': key,
+            'text': '',
+            'error': error,
+            'processing_time': 0,
+            'confidence_score': 0.0
+        }
     
-    def validate_pdf(self, pdf_bytes: bytes) -> Tuple[bool, str]:
+    def validate_pdf(self, pdf_bytes: bytes, deep: bool = False) -> Tuple[bool, str]:
         """
         Validate if the file is a proper PDF
         
         Args:
             pdf_bytes: PDF file content
+            deep: After the %PDF- header and %%EOF trailer checks, also open the document
+                and require at least one page
             
         Returns:
             Tuple of (is_valid, error_message)
         """
+        # Header may follow a little leading junk, and incremental updates or
+        # trailing whitespace can push the final %%EOF back from the end
+        if b'%PDF-' not in pdf_bytes[:1024]:
+            return False, "Invalid PDF file: missing %PDF- header"
+        if b'%%EOF' not in pdf_bytes[-2048:]:
+            return False, "Invalid PDF file: missing %%EOF trailer"
+        if not deep:
+            return True, ""
+        
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            page_count = len(doc)
-            doc.close()
+            # Closed even if reading the page count fails, freeing MuPDF's parsed state at once
+            with contextlib.closing(fitz.open(stream=pdf_bytes, filetype="pdf")) as doc:
+                page_count = len(doc)
             
             if page_count == 0:
                 return False, "PDF has no pages"
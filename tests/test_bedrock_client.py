@@ -1,7 +1,8 @@
 import pytest
 import json
-from unittest.mock import Mock, patch, MagicMock
-from bedrock_client import BedrockClient
+import asyncio
+from unittest.mock import Mock, patch, MagicMock, ANY
+from bedrock_client import BedrockClient, budgeted_text
 from botocore.exceptions import ClientError
 
 class TestBedrockClient:
@@ -141,6 +142,142 @@ class TestBedrockClient:
         assert result['extraction_metadata']['confidence_score'] == 0.0
         assert 'error' in result['extraction_metadata']
     
+    def test_extract_attributes_retries_throttling(self, bedrock_client, sample_attributes_config, sample_financial_text):
+        """Test that throttled requests are retried with backoff"""
+        mock_response = {
+            'body': Mock()
+        }
+        mock_response['body'].read.return_value = json.dumps({
+            'content': [{'text': '{"extracted_attributes": {}}'}]
+        }).encode('utf-8')
+        
+        bedrock_client.bedrock_client.invoke_model.side_effect = [
+            ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'InvokeModel'),
+            mock_response
+        ]
+        
+        with patch('bedrock_client.time.sleep') as mock_sleep:
+            result = bedrock_client.extract_attributes(sample_financial_text, sample_attributes_config)
+        
+        assert result == {"extracted_attributes": {}}
+        assert bedrock_client.bedrock_client.invoke_model.call_count == 2
+        mock_sleep.assert_called_once_with(1)
+    
+    def test_get_batch_extraction_results(self, bedrock_client, sample_attributes_config):
+        """Test merging batch inference output back by record ID"""
+        job_arn = 'arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/abc123'
+        bedrock_client.bedrock_control_client = Mock()
+        bedrock_client.bedrock_control_client.get_model_invocation_job.return_value = {
+            'inputDataConfig': {'s3InputDataConfig': {'s3Uri': 's3://test-bucket/Output/batch_inference/job/input.jsonl'}},
+            'outputDataConfig': {'s3OutputDataConfig': {'s3Uri': 's3://test-bucket/Output/batch_inference/job/output/'}}
+        }
+        
+        output_lines = [
+            json.dumps({'recordId': 'REC00000000', 'modelOutput': {
+                'content': [{'text': '{"extracted_attributes": {"Net Income": {"value": "200000"}}}'}]
+            }}),
+            json.dumps({'recordId': 'REC00000001', 'error': {'errorMessage': 'Model error'}})
+        ]
+        s3_client = Mock()
+        s3_client.get_object.return_value = {'Body': Mock()}
+        s3_client.get_object.return_value['Body'].read.return_value = '\n'.join(output_lines).encode('utf-8')
+        
+        results = bedrock_client.get_batch_extraction_results(job_arn, sample_attributes_config, s3_client)
+        
+        s3_client.get_object.assert_called_once_with(
+            Bucket='test-bucket', Key='Output/batch_inference/job/output/abc123/input.jsonl.out'
+        )
+        assert results['REC00000000']['extracted_attributes']['Net Income']['value'] == '200000'
+        assert results['REC00000001']['extraction_metadata']['confidence_score'] == 0.0
+    
+    def test_wait_for_batch_job_zero_timeout_checks_once(self, bedrock_client):
+        """Test that a zero timeout returns the current status of a running job without sleeping"""
+        bedrock_client.bedrock_control_client = Mock()
+        bedrock_client.bedrock_control_client.get_model_invocation_job.return_value = {'status': 'InProgress'}
+        
+        with patch('bedrock_client.time.sleep') as mock_sleep:
+            status = bedrock_client.wait_for_batch_job('arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/abc123', timeout=0)
+        
+        assert status == 'InProgress'
+        bedrock_client.bedrock_control_client.get_model_invocation_job.assert_called_once()
+        mock_sleep.assert_not_called()
+    
+    def test_extract_attributes_latency_optimized(self, bedrock_client, sample_attributes_config, sample_financial_text):
+        """Test that the latency performance config is passed to invoke_model"""
+        bedrock_client.performance_config = 'optimized'
+        mock_response = {
+            'body': Mock()
+        }
+        mock_response['body'].read.return_value = json.dumps({
+            'content': [{'text': '{"extracted_attributes": {}}'}]
+        }).encode('utf-8')
+        
+        bedrock_client.bedrock_client.invoke_model.return_value = mock_response
+        
+        bedrock_client.extract_attributes(sample_financial_text, sample_attributes_config)
+        
+        call_args = bedrock_client.bedrock_client.invoke_model.call_args
+        assert call_args[1]['performanceConfigLatency'] == 'optimized'
+    
+    def test_extract_attributes_batched_merges_sections(self, bedrock_client):
+        """Test that each section is extracted from its own chunk and the results merged"""
+        results = {
+            "INCOME STATEMENT Revenue 100": {"extraction_metadata": {"confidence_score": 0.9}, "extracted_attributes": {"Total Revenue": {"value": 100}}},
+            "ACME Corp": {"extraction_metadata": {"confidence_score": 0.7}, "extracted_attributes": {"Company Name": {"value": "ACME"}}}
+        }
+        
+        with patch.object(bedrock_client, 'extract_attributes', side_effect=lambda text, attrs: results[text]) as mock_extract:
+            result = bedrock_client.extract_attributes_batched(
+                {"Income Statement": "INCOME STATEMENT Revenue 100", "general": "ACME Corp"},
+                {"Income Statement": [{"name": "Total Revenue"}], "general": [{"name": "Company Name"}]}
+            )
+        
+        assert mock_extract.call_count == 2
+        assert set(result["extracted_attributes"]) == {"Total Revenue", "Company Name"}
+        assert result["extraction_metadata"]["confidence_score"] == pytest.approx(0.8)
+    
+    def test_extract_attributes_multi_splits_by_index(self, bedrock_client, sample_attributes_config):
+        """Test that a combined response is split by document index, extracting missing ones individually"""
+        combined = {"documents": [
+            {"index": 1, "extraction_metadata": {"confidence_score": 0.9}, "extracted_attributes": {"Company Name": {"value": "Beta"}}}
+        ]}
+        mock_response = {
+            'body': Mock()
+        }
+        mock_response['body'].read.return_value = json.dumps({
+            'content': [{'text': json.dumps(combined)}]
+        }).encode('utf-8')
+        bedrock_client.bedrock_client.invoke_model.return_value = mock_response
+        fallback = {"extraction_metadata": {}, "extracted_attributes": {"Company Name": {"value": "Alpha"}}}
+        
+        with patch.object(bedrock_client, 'extract_attributes', return_value=fallback) as mock_extract:
+            results = bedrock_client.extract_attributes_multi(["Alpha Inc report", "Beta LLC report"], sample_attributes_config)
+        
+        body = json.loads(bedrock_client.bedrock_client.invoke_model.call_args[1]['body'])
+        assert "---DOCUMENT 1---" in body['messages'][0]['content'][0]['text']
+        assert results[0] == fallback
+        assert results[1]["extracted_attributes"]["Company Name"]["value"] == "Beta"
+        mock_extract.assert_called_once_with("Alpha Inc report", sample_attributes_config)
+    
+    def test_ainvoke_propagates_errors(self, bedrock_client):
+        """Test that errors raised by invoke_model surface from the awaited wrapper"""
+        bedrock_client.bedrock_client.invoke_model.side_effect = ClientError(
+            {'Error': {'Code': 'ValidationException', 'Message': 'Bad request'}}, 'InvokeModel'
+        )
+        
+        with pytest.raises(ClientError):
+            asyncio.run(bedrock_client._ainvoke({"messages": []}))
+    
+    def test_aextract_attributes(self, bedrock_client, sample_attributes_config, sample_financial_text):
+        """Test that the async extraction returns the sync extraction result"""
+        expected = {"extraction_metadata": {}, "extracted_attributes": {"Company Name": {"value": "ACME"}}}
+        
+        with patch.object(bedrock_client, 'extract_attributes', return_value=expected) as mock_extract:
+            result = asyncio.run(bedrock_client.aextract_attributes(sample_financial_text, sample_attributes_config))
+        
+        assert result == expected
+        mock_extract.assert_called_once_with(sample_financial_text, sample_attributes_config)
+    
     def test_chatbot_response_success(self, bedrock_client):
         """Test successful chatbot response generation"""
         user_input = "What is the total revenue?"
@@ -176,6 +313,21 @@ class TestBedrockClient:
         assert request_body['temperature'] == 0.3
         assert request_body['max_tokens'] == 1000
     
+    def test_stream_chatbot_response(self, bedrock_client):
+        """Test that streamed text deltas are yielded in order"""
+        events = [
+            {'chunk': {'bytes': json.dumps({'type': 'message_start'}).encode('utf-8')}},
+            {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'Revenue '}}).encode('utf-8')}},
+            {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'grew.'}}).encode('utf-8')}},
+            {'chunk': {'bytes': json.dumps({'type': 'message_stop'}).encode('utf-8')}}
+        ]
+        bedrock_client.bedrock_client.invoke_model_with_response_stream.return_value = {'body': iter(events)}
+        
+        chunks = list(bedrock_client.stream_chatbot_response("How did revenue change?", {"consolidated_data": []}))
+        
+        assert chunks == ['Revenue ', 'grew.']
+        bedrock_client.bedrock_client.invoke_model.assert_not_called()
+    
     def test_chatbot_response_error(self, bedrock_client):
         """Test chatbot response with error"""
         user_input = "What is the revenue?"
@@ -196,6 +348,11 @@ class TestBedrockClient:
         assert "Report Year" in prompt
         assert "JSON format" in prompt
         assert "confidence" in prompt.lower()
+        
+        # Memoized per attribute set: an equal config reuses the same prompt string
+        config_copy = [dict(attr) for attr in sample_attributes_config]
+        assert bedrock_client._build_extraction_system_prompt(config_copy) is prompt
+        assert bedrock_client._build_extraction_system_prompt(sample_attributes_config[:1]) is not prompt
     
     def test_prepare_context_summary(self, bedrock_client):
         """Test context summary preparation"""
@@ -287,9 +444,26 @@ class TestBedrockClient:
                 region_name='us-west-2',
                 aws_access_key_id=None,
                 aws_secret_access_key=None,
-                aws_session_token=None
+                aws_session_token=None,
+                config=ANY
             )
     
+    def test_invocations_round_robin_across_regions(self, sample_attributes_config, sample_financial_text):
+        """Test that model calls alternate between the primary and additional regions"""
+        with patch('boto3.client') as mock_boto_client:
+            mock_boto_client.side_effect = lambda service, region_name, **kwargs: MagicMock(region=region_name)
+            client = BedrockClient(region_name='us-west-2', regions=['us-west-2', 'eu-central-1'])
+        
+        for runtime_client in client.runtime_clients:
+            runtime_client.invoke_model.return_value = {'body': Mock(read=Mock(return_value=b'{"content": [{"text": "{}"}]}'))}
+        
+        for _ in range(3):
+            client.extract_attributes(sample_financial_text, sample_attributes_config)
+        
+        assert [c.region for c in client.runtime_clients] == ['us-west-2', 'eu-central-1']
+        assert client.runtime_clients[0].invoke_model.call_count == 2
+        assert client.runtime_clients[1].invoke_model.call_count == 1
+    
     def test_initialization_failure(self):
         """Test BedrockClient initialization failure"""
         with patch('boto3.client') as mock_boto_client:
@@ -300,6 +474,16 @@ class TestBedrockClient:
             
             assert "AWS credentials not found" in str(exc_info.value)
     
+    def test_budgeted_text_cuts_at_line_break(self):
+        """Test that over-budget text is cut at a line break near the limit"""
+        text = ("Revenue 1,234,567\n" * 100)
+        
+        budgeted = budgeted_text(text, max_tokens=100)
+        
+        assert len(budgeted) <= 400
+        assert budgeted.endswith("1,234,567")
+        assert budgeted_text("short text", max_tokens=100) == "short text"
+    
     def test_long_text_truncation(self, bedrock_client, sample_attributes_config):
         """Test that long text is properly truncated"""
         # Create a very long text (more than 8000 characters)
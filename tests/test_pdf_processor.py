@@ -1,7 +1,10 @@
 import pytest
+import asyncio
 import io
+import threading
+import time
 from unittest.mock import Mock, patch, MagicMock
-from pdf_processor import PDFProcessor
+from pdf_processor import PDFProcessor, PDF_DOWNLOAD_TRANSFER_CONFIG
 import boto3
 from botocore.exceptions import ClientError
 
@@ -15,6 +18,13 @@ class TestPDFProcessor:
             processor.s3_client = Mock()
             return processor
     
+    @pytest.fixture
+    def mock_fitz(self):
+        """Patch PyMuPDF; fitz.open returns a one-page document unless a test overrides it"""
+        with patch('pdf_processor.fitz') as mock_fitz:
+            mock_fitz.open.return_value.__len__.return_value = 1
+            yield mock_fitz
+    
     @pytest.fixture
     def sample_pdf_list(self):
         """Sample PDF list response from S3"""
@@ -58,7 +68,8 @@ class TestPDFProcessor:
             ]
         }
         
-        pdf_processor.s3_client.list_objects_v2.return_value = mock_response
+        mock_paginator = pdf_processor.s3_client.get_paginator.return_value
+        mock_paginator.paginate.return_value = [mock_response]
         
         result = pdf_processor.list_pdfs_from_s3('test-bucket')
         
@@ -70,11 +81,83 @@ class TestPDFProcessor:
         assert result[1]['filename'] == 'Q1_2023.pdf'
         
         # Verify S3 client was called correctly
-        pdf_processor.s3_client.list_objects_v2.assert_called_once_with(Bucket='test-bucket')
+        pdf_processor.s3_client.get_paginator.assert_called_once_with('list_objects_v2')
+        mock_paginator.paginate.assert_called_once_with(
+            Bucket='test-bucket', Prefix='', PaginationConfig={'PageSize': 1000}
+        )
+    
+    def test_list_pdfs_uses_paginator(self, pdf_processor):
+        """Test that every page is streamed from the paginator with the input folder as Prefix"""
+        pdf_processor.s3_config = Mock(use_single_bucket=True, bucket_name='test-bucket', input_folder='financial_statements')
+        pages = [
+            {'Contents': [{'Key': f'financial_statements/{p}_{i}.{"pdf" if i % 5 else "csv"}', 'Size': 1024,
+                           'LastModified': f'2023-01-{p + 1:02d}'} for i in range(count)]}
+            for p, count in enumerate((1000, 1000, 500))
+        ]
+        mock_paginate = pdf_processor.s3_client.get_paginator.return_value.paginate
+        mock_paginate.return_value = iter(pages)
+        
+        result = pdf_processor.list_pdfs_from_s3()
+        
+        assert len(result) == 2000
+        assert all(pdf['filename'].endswith('.pdf') and '/' not in pdf['filename'] for pdf in result)
+        mock_paginate.assert_called_once_with(
+            Bucket='test-bucket', Prefix='financial_statements/', PaginationConfig={'PageSize': 1000}
+        )
+    
+    def test_list_pdfs_from_s3_keeps_newest_max_items(self, pdf_processor):
+        """Test that max_items keeps the newest PDFs across all pages, not the first ones in key order"""
+        pages = [
+            {'Contents': [{'Key': f'page{p}_{i}.pdf', 'Size': 1024, 'LastModified': f'2023-01-{3 * p + i + 1:02d}'}
+                          for i in range(3)]}
+            for p in range(3)
+        ]
+        pdf_processor.s3_client.get_paginator.return_value.paginate.return_value = iter(pages)
+        
+        result = pdf_processor.list_pdfs_from_s3('test-bucket', max_items=4)
+        
+        assert [pdf['key'] for pdf in result] == ['page2_2.pdf', 'page2_1.pdf', 'page2_0.pdf', 'page1_2.pdf']
+    
+    def test_list_pdfs_case_insensitive(self, pdf_processor):
+        """Test that the .pdf suffix check ignores case"""
+        pdf_processor.s3_client.get_paginator.return_value.paginate.return_value = [{'Contents': [
+            {'Key': key, 'Size': 1024, 'LastModified': '2023-01-15'}
+            for key in ('reports/ANNUAL.PDF', 'reports/q1.Pdf', 'reports/q2.pdf', 'reports/pdf', 'reports/q3.pdf.txt')
+        ]}]
+        
+        result = pdf_processor.list_pdfs_from_s3('test-bucket')
+        
+        assert sorted(pdf['filename'] for pdf in result) == ['ANNUAL.PDF', 'q1.Pdf', 'q2.pdf']
+    
+    def test_list_pdfs_caches_within_ttl(self, pdf_processor):
+        """Test that with list_cache_ttl set, back-to-back listings reuse the first one until the TTL expires"""
+        mock_paginate = pdf_processor.s3_client.get_paginator.return_value.paginate
+        mock_paginate.side_effect = lambda **kwargs: iter([
+            {'Contents': [{'Key': 'Q1_2023.pdf', 'Size': 1024, 'LastModified': '2023-01-15'}]}
+        ])
+        
+        # Listings aren't cached by default
+        pdf_processor.list_pdfs_from_s3('test-bucket')
+        pdf_processor.list_pdfs_from_s3('test-bucket')
+        assert mock_paginate.call_count == 2
+        mock_paginate.reset_mock()
+        
+        pdf_processor.list_cache_ttl = 30
+        with patch('pdf_processor.time.monotonic', return_value=1000.0) as mock_monotonic:
+            first = pdf_processor.list_pdfs_from_s3('test-bucket')
+            second = pdf_processor.list_pdfs_from_s3('test-bucket')
+            assert mock_paginate.call_count == 1
+            
+            mock_monotonic.return_value = 1031.0
+            third = pdf_processor.list_pdfs_from_s3('test-bucket')
+            assert mock_paginate.call_count == 2
+        
+        assert first == second == third
+        assert first is not second
     
     def test_list_pdfs_from_s3_empty_bucket(self, pdf_processor):
         """Test listing PDFs from empty bucket"""
-        pdf_processor.s3_client.list_objects_v2.return_value = {}
+        pdf_processor.s3_client.get_paginator.return_value.paginate.return_value = [{}]
         
         result = pdf_processor.list_pdfs_from_s3('empty-bucket')
         
@@ -82,7 +165,7 @@ class TestPDFProcessor:
     
     def test_list_pdfs_from_s3_client_error(self, pdf_processor):
         """Test S3 client error handling"""
-        pdf_processor.s3_client.list_objects_v2.side_effect = ClientError(
+        pdf_processor.s3_client.get_paginator.return_value.paginate.side_effect = ClientError(
             {'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket does not exist'}},
             'ListObjectsV2'
         )
@@ -96,45 +179,69 @@ class TestPDFProcessor:
         """Test successful PDF download"""
         mock_pdf_content = b'%PDF-1.4 fake pdf content'
         
-        # Mock head_object response
-        pdf_processor.s3_client.head_object.return_value = {
-            'ContentLength': len(mock_pdf_content)
-        }
-        
-        # Mock get_object response
+        # Mock head_object response; its ContentLength is checked before the object is requested
+        pdf_processor.s3_client.head_object.return_value = {'ContentLength': len(mock_pdf_content)}
         mock_body = Mock()
         mock_body.read.return_value = mock_pdf_content
-        pdf_processor.s3_client.get_object.return_value = {
-            'Body': mock_body
-        }
+        pdf_processor.s3_client.get_object.return_value = {'Body': mock_body, 'ContentLength': len(mock_pdf_content)}
         
         result = pdf_processor.download_pdf('test-bucket', 'test.pdf')
         
         assert result == mock_pdf_content
-        pdf_processor.s3_client.head_object.assert_called_once_with(
-            Bucket='test-bucket', Key='test.pdf'
-        )
+        pdf_processor.s3_client.head_object.assert_called_once_with(Bucket='test-bucket', Key='test.pdf')
         pdf_processor.s3_client.get_object.assert_called_once_with(
             Bucket='test-bucket', Key='test.pdf'
         )
     
+    def test_download_pdf_with_known_size(self, pdf_processor):
+        """Test that a size known from the listing is checked before requesting the object"""
+        mock_pdf_content = b'%PDF-1.4 fake pdf content'
+        pdf_processor.s3_client.get_object.return_value = {'Body': io.BytesIO(mock_pdf_content)}
+        
+        result = pdf_processor.download_pdf('test-bucket', 'test.pdf', known_size=len(mock_pdf_content))
+        
+        assert result == mock_pdf_content
+        pdf_processor.s3_client.get_object.reset_mock()
+        
+        with pytest.raises(Exception) as exc_info:
+            pdf_processor.download_pdf('test-bucket', 'large.pdf', known_size=200 * 1024 * 1024)
+        assert "File too large" in str(exc_info.value)
+        pdf_processor.s3_client.get_object.assert_not_called()
+        pdf_processor.s3_client.head_object.assert_not_called()
+    
+    def test_download_large_pdf_uses_ranged_transfer(self, pdf_processor):
+        """Test that PDFs of unknown size above the multipart threshold are sized by HEAD and fetched through download_fileobj"""
+        mock_pdf_content = b'%PDF-1.4 ' + b'0' * 64
+        pdf_processor.s3_client.head_object.return_value = {'ContentLength': 20 * 1024 * 1024}  # 20MB
+        pdf_processor.s3_client.download_fileobj.side_effect = (
+            lambda bucket, key, fileobj, Config: fileobj.write(mock_pdf_content)
+        )
+        
+        result = pdf_processor.download_pdf('test-bucket', 'big.pdf', known_size=None)
+        
+        assert result == mock_pdf_content
+        pdf_processor.s3_client.head_object.assert_called_once_with(Bucket='test-bucket', Key='big.pdf')
+        pdf_processor.s3_client.get_object.assert_not_called()
+        pdf_processor.s3_client.download_fileobj.assert_called_once()
+        assert pdf_processor.s3_client.download_fileobj.call_args[0][:2] == ('test-bucket', 'big.pdf')
+        assert pdf_processor.s3_client.download_fileobj.call_args[1]['Config'] is PDF_DOWNLOAD_TRANSFER_CONFIG
+    
     def test_download_pdf_file_too_large(self, pdf_processor):
         """Test download failure for oversized file"""
         large_file_size = 200 * 1024 * 1024  # 200MB
         
-        pdf_processor.s3_client.head_object.return_value = {
-            'ContentLength': large_file_size
-        }
+        pdf_processor.s3_client.head_object.return_value = {'ContentLength': large_file_size}
         
         with pytest.raises(Exception) as exc_info:
             pdf_processor.download_pdf('test-bucket', 'large.pdf')
         
         assert "File too large" in str(exc_info.value)
+        pdf_processor.s3_client.get_object.assert_not_called()
     
     def test_download_pdf_client_error(self, pdf_processor):
         """Test download with S3 client error"""
         pdf_processor.s3_client.head_object.side_effect = ClientError(
-            {'Error': {'Code': 'NoSuchKey', 'Message': 'Key does not exist'}},
+            {'Error': {'Code': '404', 'Message': 'Not Found'}},
             'HeadObject'
         )
         
@@ -143,108 +250,248 @@ class TestPDFProcessor:
         
         assert "Failed to download PDF" in str(exc_info.value)
     
-    def test_extract_text_with_pdfplumber_success(self, pdf_processor):
-        """Test successful text extraction with pdfplumber"""
+    def test_extract_text_with_pdfium_success(self, pdf_processor):
+        """Test successful text extraction with PDFium"""
         mock_pdf_content = b'%PDF-1.4 fake pdf content'
-        mock_text = "Sample financial statement text with revenue data"
+        mock_text = "Sample financial statement text with revenue and expense data"
         
         # Mock the internal methods directly
-        with patch.object(pdf_processor, '_extract_with_pdfplumber', return_value=mock_text):
-            with patch('pdf_processor.fitz') as mock_fitz:
-                mock_doc = Mock()
-                mock_doc.__len__ = Mock(return_value=1)
-                mock_fitz.open.return_value = mock_doc
+        with patch.object(pdf_processor, '_extract_with_pdfium', return_value=mock_text):
+            with patch('pdf_processor.pdfium') as mock_pdfium:
+                mock_doc = MagicMock()
+                mock_doc.__len__.return_value = 1
+                mock_pdfium.PdfDocument.return_value = mock_doc
                 
                 result = pdf_processor.extract_text_from_pdf(mock_pdf_content, 'test.pdf')
         
         assert result['text'] == mock_text
-        assert result['extraction_method'] == 'pdfplumber'
+        assert result['extraction_method'] == 'pdfium'
         assert result['has_text'] is True
         assert result['confidence_score'] == 0.95
         assert result['filename'] == 'test.pdf'
+        mock_doc.close.assert_called_once()
     
-    def test_extract_text_fallback_to_pymupdf(self, pdf_processor):
-        """Test fallback to PyMuPDF when pdfplumber fails"""
-        mock_pdf_content = b'%PDF-1.4 fake pdf content'
-        mock_text = "Financial data extracted with PyMuPDF"
-        
-        # Mock pdfplumber failure and PyMuPDF success
-        with patch.object(pdf_processor, '_extract_with_pdfplumber', return_value=""):
-            with patch.object(pdf_processor, '_extract_with_pymupdf', return_value=mock_text):
-                with patch('pdf_processor.fitz') as mock_fitz:
-                    mock_doc = Mock()
-                    mock_doc.__len__ = Mock(return_value=1)
-                    mock_fitz.open.return_value = mock_doc
-                    
-                    result = pdf_processor.extract_text_from_pdf(mock_pdf_content, 'test.pdf')
+    def test_extract_text_parses_pdf_once(self, pdf_processor):
+        """Test that a PDF with a good text layer is only parsed by PDFium"""
+        mock_text = "Revenue: $1,500,000 Net income: $250,000 for the fiscal year ended December 31"
         
-        assert result['text'] == mock_text
+        with patch.object(pdf_processor, '_extract_with_pdfium', return_value=mock_text):
+            with patch('pdf_processor.pdfium') as mock_pdfium, \
+                    patch('pdf_processor.fitz.open') as mock_fitz_open, \
+                    patch('pdf_processor.pdfplumber.open') as mock_pdfplumber_open, \
+                    patch.object(pdf_processor, '_extract_with_pymupdf') as mock_pymupdf, \
+                    patch.object(pdf_processor, '_extract_with_ocr') as mock_ocr:
+                mock_doc = MagicMock()
+                mock_doc.__len__.return_value = 1
+                mock_pdfium.PdfDocument.return_value = mock_doc
+                
+                result = pdf_processor.extract_text_from_pdf(b'%PDF-1.4 fake pdf content', 'test.pdf')
+        
+        assert result['extraction_method'] == 'pdfium'
+        assert mock_pdfium.PdfDocument.call_count == 1
+        mock_fitz_open.assert_not_called()
+        mock_pdfplumber_open.assert_not_called()
+        mock_pymupdf.assert_not_called()
+        mock_ocr.assert_not_called()
+    
+    def test_extract_text_short_triggers_fallback(self, pdf_processor):
+        """Test that text too short for the page count moves on to the next extractor"""
+        with patch('pdf_processor.pdfium') as mock_pdfium, \
+                patch.object(pdf_processor, '_extract_with_pdfium', return_value="Hi"), \
+                patch.object(pdf_processor, '_extract_with_pymupdf', return_value="Revenue " * 200) as mock_pymupdf, \
+                patch.object(pdf_processor, '_extract_with_pdfplumber') as mock_pdfplumber, \
+                patch.object(pdf_processor, '_extract_with_ocr') as mock_ocr:
+            mock_pdfium.PdfDocument.return_value.__len__.return_value = 5
+            
+            result = pdf_processor.extract_text_from_pdf(b'%PDF-1.4 fake pdf content', 'test.pdf')
+        
+        mock_pymupdf.assert_called_once()
+        mock_pdfplumber.assert_not_called()
+        mock_ocr.assert_not_called()
         assert result['extraction_method'] == 'pymupdf'
-        assert result['confidence_score'] == 0.90
     
-    def test_extract_text_fallback_to_ocr(self, pdf_processor):
-        """Test fallback to OCR when other methods fail"""
-        mock_pdf_content = b'%PDF-1.4 fake pdf content'
+    FALLBACK_TEXT = "Financial data: revenue $1,500,000 and net income $250,000 for fiscal 2023"
+    FALLBACK_OCR_RESULT = {
+        'text': 'OCR extracted financial data: revenue $1,500,000 and net income $250,000',
+        'extraction_method': 'ocr',
+        'has_text': True,
+        'has_images': True,
+        'confidence_score': 0.75,
+        'errors': []
+    }
+    
+    @pytest.mark.parametrize("pymupdf_text, pdfplumber_text, expected_method, expected_confidence", [
+        (FALLBACK_TEXT, "", 'pymupdf', 0.90),
+        ("", FALLBACK_TEXT, 'pdfplumber', 0.85),
+        ("", "", 'ocr', 0.75),
+    ])
+    def test_extract_text_fallback_chain(self, pdf_processor, pymupdf_text, pdfplumber_text,
+                                         expected_method, expected_confidence):
+        """Test fallback from PDFium to PyMuPDF, pdfplumber and finally OCR as each returns too little text"""
+        with patch('pdf_processor.pdfium') as mock_pdfium, \
+                patch.object(pdf_processor, '_extract_with_pdfium', return_value=""), \
+                patch.object(pdf_processor, '_extract_with_pymupdf', return_value=pymupdf_text), \
+                patch.object(pdf_processor, '_extract_with_pdfplumber', return_value=pdfplumber_text) as mock_pdfplumber, \
+                patch.object(pdf_processor, '_extract_with_ocr', return_value=self.FALLBACK_OCR_RESULT) as mock_ocr:
+            mock_pdfium.PdfDocument.return_value.__len__.return_value = 1
+            
+            result = pdf_processor.extract_text_from_pdf(b'%PDF-1.4 fake pdf content', 'test.pdf')
+        
+        assert result['extraction_method'] == expected_method
+        assert result['confidence_score'] == expected_confidence
+        assert result['has_text'] is True
+        if expected_method == 'ocr':
+            assert result['has_images'] is True
+            assert result['text'] == self.FALLBACK_OCR_RESULT['text']
+        else:
+            assert result['text'] == self.FALLBACK_TEXT
+            mock_ocr.assert_not_called()
+        assert mock_pdfplumber.called == (expected_method != 'pymupdf')
+    
+    def test_extract_text_scanned_sample_goes_straight_to_ocr(self, pdf_processor):
+        """Test that a PDF whose sampled pages have no text skips the text extractors"""
         mock_ocr_result = {
-            'text': 'OCR extracted financial data',
+            'text': 'OCR extracted financial data with sufficient length for testing purposes',
             'extraction_method': 'ocr',
             'has_text': True,
-            'has_images': True,
-            'confidence_score': 0.75,
+            'confidence_score': 0.8,
             'errors': []
         }
         
-        # Mock both pdfplumber and PyMuPDF failure, OCR success
-        with patch.object(pdf_processor, '_extract_with_pdfplumber', return_value=""):
-            with patch.object(pdf_processor, '_extract_with_pymupdf', return_value=""):
+        with patch.object(pdf_processor, '_classify_pdf', return_value='scanned'):
+            with patch.object(pdf_processor, '_extract_with_pdfplumber') as mock_pdfplumber:
                 with patch.object(pdf_processor, '_extract_with_ocr', return_value=mock_ocr_result):
-                    with patch('pdf_processor.fitz') as mock_fitz:
-                        mock_doc = Mock()
-                        mock_doc.__len__ = Mock(return_value=1)
-                        mock_fitz.open.return_value = mock_doc
-                        
-                        result = pdf_processor.extract_text_from_pdf(mock_pdf_content, 'test.pdf')
+                    with patch('pdf_processor.pdfium'):
+                        result = pdf_processor.extract_text_from_pdf(b'%PDF-1.4 fake pdf content', 'scan.pdf')
         
+        mock_pdfplumber.assert_not_called()
         assert result['extraction_method'] == 'ocr'
-        assert result['has_images'] is True
-        assert 'OCR extracted financial data' in result['text']
     
-    def test_validate_pdf_success(self, pdf_processor):
-        """Test successful PDF validation"""
+    def test_extract_text_low_coverage_skips_ocr_for_text_strategy(self, pdf_processor):
+        """Test that low text-layer coverage only falls back to OCR under the auto strategy"""
         mock_pdf_content = b'%PDF-1.4 fake pdf content'
+        short_text = "Revenue: $1,500,000 " * 10  # ~200 chars across 10 pages
         
-        with patch('pdf_processor.fitz') as mock_fitz:
-            mock_doc = Mock()
-            mock_doc.__len__ = Mock(return_value=5)  # 5 pages
-            mock_fitz.open.return_value = mock_doc
-            
-            is_valid, error_msg = pdf_processor.validate_pdf(mock_pdf_content)
+        with patch.object(pdf_processor, '_extract_with_pdfium', return_value=""):
+            with patch.object(pdf_processor, '_extract_with_pymupdf', return_value=""):
+                with patch.object(pdf_processor, '_extract_with_pdfplumber', return_value=short_text):
+                    with patch.object(pdf_processor, '_extract_with_ocr') as mock_ocr:
+                        with patch('pdf_processor.pdfium') as mock_pdfium:
+                            mock_doc = MagicMock()
+                            mock_doc.__len__.return_value = 10
+                            mock_pdfium.PdfDocument.return_value = mock_doc
+                            
+                            result = pdf_processor.extract_text_from_pdf(mock_pdf_content, 'test.pdf', strategy='text')
+        
+        mock_ocr.assert_not_called()
+        assert result['text'] == short_text
+        assert result['extraction_method'] == 'pdfplumber'
+        assert result['page_count'] == 10
+        assert pdf_processor._has_text_layer(short_text, 10) is False
+        assert pdf_processor._has_text_layer(short_text, 1) is True
+    
+    def test_extract_with_ocr_keeps_only_substantial_embedded_text(self, pdf_processor):
+        """Test that a stray page number doesn't stop a page being OCRed and embedded text isn't scored as certain"""
+        mock_doc = MagicMock()
+        mock_doc.__len__.return_value = 2
+        page_texts = ["Balance sheet as at 31 March 2023, total assets and liabilities", "  3  "]
+        
+        with patch('pdf_processor.PyTessBaseAPI', None):
+            with patch.object(pdf_processor, '_render_page_for_ocr'):
+                with patch.object(pdf_processor, '_ocr_pages_batch', return_value={0: (['Revenue', '1,500'], [80, 70])}) as mock_batch:
+                    result = pdf_processor._extract_with_ocr(mock_doc, page_texts)
+                    assert len(list(mock_batch.call_args[0][0])) == 1
+        
+        assert result['text'] == page_texts[0] + '\nRevenue 1,500'
+        assert result['confidence_score'] == pytest.approx((90 + 75) / 2 / 100)
+    
+    def test_ocr_render_scale_follows_embedded_image_dpi(self, pdf_processor):
+        """Test that OCR rendering matches the scan resolution within the scale and size caps"""
+        mock_page = MagicMock()
+        mock_page.rect.width = 612
+        mock_page.rect.height = 792
+        
+        # 150 DPI letter-size scan
+        mock_page.get_image_info.return_value = [{'width': 1275, 'bbox': (0, 0, 612, 792)}]
+        assert pdf_processor._ocr_render_scale(mock_page) == pytest.approx(150 / 72)
+        
+        # 600 DPI scan is rendered at no more than the maximum scale
+        mock_page.get_image_info.return_value = [{'width': 5100, 'bbox': (0, 0, 612, 792)}]
+        assert pdf_processor._ocr_render_scale(mock_page) == 3.0
+        
+        # Oversized pages are capped by their longest side
+        mock_page.rect.height = 1000
+        assert pdf_processor._ocr_render_scale(mock_page) == pytest.approx(2.5)
+        
+        # Low resolution or no images never drops below the minimum scale
+        mock_page.rect.height = 300
+        mock_page.get_image_info.return_value = [{'width': 300, 'bbox': (0, 0, 612, 300)}]
+        assert pdf_processor._ocr_render_scale(mock_page) == 1.5
+        mock_page.get_image_info.return_value = []
+        assert pdf_processor._ocr_render_scale(mock_page) == 3.0
+    
+    def test_validate_pdf_success(self, pdf_processor, mock_fitz):
+        """Test successful deep PDF validation"""
+        mock_fitz.open.return_value.__len__.return_value = 5  # 5 pages
+        
+        is_valid, error_msg = pdf_processor.validate_pdf(b'%PDF-1.4 fake pdf content\n%%EOF\n', deep=True)
         
         assert is_valid is True
         assert error_msg == ""
+        mock_fitz.open.return_value.close.assert_called_once()
     
-    def test_validate_pdf_no_pages(self, pdf_processor):
-        """Test PDF validation with no pages"""
-        mock_pdf_content = b'%PDF-1.4 fake pdf content'
+    def test_validate_pdf_no_pages(self, pdf_processor, mock_fitz):
+        """Test deep PDF validation with no pages"""
+        mock_fitz.open.return_value.__len__.return_value = 0  # No pages
         
-        with patch('pdf_processor.fitz') as mock_fitz:
-            mock_doc = Mock()
-            mock_doc.__len__ = Mock(return_value=0)  # No pages
-            mock_fitz.open.return_value = mock_doc
-            
-            is_valid, error_msg = pdf_processor.validate_pdf(mock_pdf_content)
+        is_valid, error_msg = pdf_processor.validate_pdf(b'%PDF-1.4 fake pdf content\n%%EOF\n', deep=True)
         
         assert is_valid is False
         assert "PDF has no pages" in error_msg
+        mock_fitz.open.return_value.close.assert_called_once()
+    
+    def test_validate_pdf_closes_doc_on_exception(self, pdf_processor, mock_fitz):
+        """Test that deep validation closes the document when reading it fails"""
+        mock_fitz.open.return_value.__len__.side_effect = RuntimeError("damaged xref")
+        
+        is_valid, error_msg = pdf_processor.validate_pdf(b'%PDF-1.4 fake pdf content\n%%EOF\n', deep=True)
+        
+        assert is_valid is False
+        assert "damaged xref" in error_msg
+        mock_fitz.open.return_value.close.assert_called_once()
+    
+    def test_validate_pdf_checks_header_and_trailer(self, pdf_processor, mock_fitz):
+        """Test that the default validation only checks the header and trailer without opening the PDF"""
+        assert pdf_processor.validate_pdf(b'%PDF-1.4 fake pdf content\n%%EOF\n') == (True, "")
+        
+        is_valid, error_msg = pdf_processor.validate_pdf(b'%PDF-1.4 truncated download')
+        assert is_valid is False
+        assert "%%EOF" in error_msg
+        mock_fitz.open.assert_not_called()
     
-    def test_validate_pdf_invalid_file(self, pdf_processor):
+    def test_validate_pdf_invalid_file(self, pdf_processor, mock_fitz):
         """Test PDF validation with invalid file"""
-        invalid_content = b'This is not a PDF file'
+        mock_fitz.open.side_effect = Exception("Invalid PDF format")
         
-        with patch('pdf_processor.fitz') as mock_fitz:
-            mock_fitz.open.side_effect = Exception("Invalid PDF format")
-            
-            is_valid, error_msg = pdf_processor.validate_pdf(invalid_content)
+        is_valid, error_msg = pdf_processor.validate_pdf(b'This is not a PDF file')
+        
+        assert is_valid is False
+        assert "Invalid PDF file" in error_msg
+        mock_fitz.open.assert_not_called()
+    
+    def test_validate_pdf_fast_reject(self, pdf_processor, mock_fitz):
+        """Test that deep validation rejects a missing header before opening the document"""
+        is_valid, error_msg = pdf_processor.validate_pdf(b'not a pdf', deep=True)
+        
+        assert is_valid is False
+        assert "%PDF-" in error_msg
+        mock_fitz.open.assert_not_called()
+    
+    def test_validate_pdf_deep_open_failure(self, pdf_processor, mock_fitz):
+        """Test deep validation of a PDF envelope PyMuPDF cannot open"""
+        mock_fitz.open.side_effect = Exception("Invalid PDF format")
+        
+        is_valid, error_msg = pdf_processor.validate_pdf(b'%PDF-1.4 corrupt\n%%EOF\n', deep=True)
         
         assert is_valid is False
         assert "Invalid PDF file" in error_msg
@@ -254,16 +501,214 @@ class TestPDFProcessor:
         pdf_keys = ['pdf1.pdf', 'pdf2.pdf']
         bucket_name = 'test-bucket'
         
-        # Mock the _process_single_pdf method
-        with patch.object(pdf_processor, '_process_single_pdf') as mock_process:
-            mock_process.side_effect = [
-                {'filename': 'pdf1.pdf', 'text': 'Content 1', 'confidence_score': 0.9},
-                {'filename': 'pdf2.pdf', 'text': 'Content 2', 'confidence_score': 0.8}
-            ]
-            
-            results = pdf_processor.process_multiple_pdfs(bucket_name, pdf_keys)
+        # Mock the download and extraction stages
+        with patch.object(pdf_processor, '_download_pdf', side_effect=lambda bucket, key, strategy, known_size, etag: (None, key.encode(), None)) as mock_download:
+            with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+                mock_extract.side_effect = lambda pdf_bytes, filename, strategy: {
+                    'filename': filename, 'text': f'Content of {pdf_bytes.decode()}', 'confidence_score': 0.9
+                }
+                
+                results = pdf_processor.process_multiple_pdfs(bucket_name, pdf_keys)
         
         assert len(results) == 2
         assert results[0]['filename'] == 'pdf1.pdf'
         assert results[1]['filename'] == 'pdf2.pdf'
-        assert mock_process.call_count == 2
+        assert results[0]['text'] == 'Content of pdf1.pdf'
+        assert results[1]['key'] == 'pdf2.pdf'
+        assert mock_download.call_count == 2
+        assert mock_extract.call_count == 2
+    
+    def test_process_multiple_pdfs_runs_concurrently(self, pdf_processor):
+        """Test that downloads and extractions overlap and results keep the input order"""
+        downloads_in_flight = threading.Barrier(2, timeout=5)
+        extractions_in_flight = threading.Barrier(2, timeout=5)
+        
+        def download(bucket, key, strategy, known_size, etag):
+            downloads_in_flight.wait()  # Breaks unless both downloads run at once
+            return None, key.encode(), None
+        
+        def extract(pdf_bytes, filename, strategy):
+            extractions_in_flight.wait()
+            if filename == 'pdf1.pdf':
+                time.sleep(0.05)  # Finish the first PDF last
+            return {'filename': filename, 'text': f'Content of {filename}', 'errors': []}
+        
+        with patch.object(pdf_processor, '_download_pdf', side_effect=download):
+            with patch.object(pdf_processor, 'extract_text_from_pdf', side_effect=extract):
+                results = pdf_processor.process_multiple_pdfs('test-bucket', ['pdf1.pdf', 'pdf2.pdf'], max_workers=2)
+        
+        assert [result['filename'] for result in results] == ['pdf1.pdf', 'pdf2.pdf']
+        assert all('error' not in result for result in results)
+    
+    def test_process_multiple_pdfs_bounds_extraction_concurrency(self, pdf_processor):
+        """Test that no more than max_workers extractions run at once"""
+        lock = threading.Lock()
+        active = 0
+        max_active = 0
+        
+        def extract(pdf_bytes, filename, strategy):
+            nonlocal active, max_active
+            with lock:
+                active += 1
+                max_active = max(max_active, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return {'filename': filename, 'text': 'Content', 'errors': []}
+        
+        pdf_keys = [f'pdf{i}.pdf' for i in range(12)]
+        with patch.object(pdf_processor, '_download_pdf', return_value=(None, b'%PDF-1.4', None)):
+            with patch.object(pdf_processor, 'extract_text_from_pdf', side_effect=extract):
+                results = pdf_processor.process_multiple_pdfs('test-bucket', pdf_keys, max_workers=3)
+        
+        assert len(results) == 12
+        assert max_active == 3
+        
+        with pytest.raises(ValueError):
+            pdf_processor.process_multiple_pdfs('test-bucket', pdf_keys, max_workers=0)
+    
+    def test_aprocess_multiple_pdfs(self, pdf_processor):
+        """Test that the async variant returns the threaded pipeline's results"""
+        with patch.object(pdf_processor, '_download_pdf', side_effect=lambda bucket, key, strategy, known_size, etag: (None, key.encode(), None)):
+            with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+                mock_extract.side_effect = lambda pdf_bytes, filename, strategy: {'filename': filename, 'text': 'Content'}
+                
+                results = asyncio.run(pdf_processor.aprocess_multiple_pdfs('test-bucket', ['pdf1.pdf', 'pdf2.pdf']))
+        
+        assert [result['key'] for result in results] == ['pdf1.pdf', 'pdf2.pdf']
+        assert mock_extract.call_count == 2
+    
+    def test_process_multiple_pdfs_timeout_returns_failed_results(self, pdf_processor):
+        """Test that a timed-out batch returns instead of leaving downloads blocked on memory permits"""
+        def extract(pdf_bytes, filename, strategy):
+            time.sleep(0.5)
+            return {'filename': filename, 'text': 'Content', 'errors': []}
+        
+        pdf_keys = [f'pdf{i}.pdf' for i in range(25)]
+        start = time.monotonic()
+        with patch('pdf_processor.PDF_TIMEOUT_SECONDS', 0.2):
+            with patch.object(pdf_processor, '_download_pdf', return_value=(None, b'%PDF-1.4', None)):
+                with patch.object(pdf_processor, 'extract_text_from_pdf', side_effect=extract):
+                    results = pdf_processor.process_multiple_pdfs('test-bucket', pdf_keys, max_workers=1)
+        
+        assert time.monotonic() - start < 5
+        assert len(results) == 25
+        assert any("Timed out" in result.get('error', '') for result in results)
+    
+    def test_process_multiple_pdfs_records_download_failure(self, pdf_processor):
+        """Test that a failed download yields an error result without running extraction"""
+        with patch.object(pdf_processor, '_download_pdf', side_effect=Exception("Failed to download PDF: bad.pdf")):
+            with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+                results = pdf_processor.process_multiple_pdfs('test-bucket', ['folder/bad.pdf'])
+        
+        mock_extract.assert_not_called()
+        assert results[0]['filename'] == 'bad.pdf'
+        assert results[0]['text'] == ''
+        assert "Failed to download PDF" in results[0]['error']
+    
+    def test_process_multiple_pdfs_reuses_cached_extraction(self, pdf_processor):
+        """Test that an unchanged object (same ETag) is neither downloaded nor extracted again"""
+        mock_body = Mock()
+        mock_body.read.return_value = b'%PDF-1.4 fake pdf content'
+        pdf_processor.s3_client.head_object.return_value = {'ContentLength': 1024, 'ETag': '"v1"'}
+        pdf_processor.s3_client.get_object.return_value = {'Body': mock_body, 'ContentLength': 1024, 'ETag': '"v1"'}
+        
+        with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+            mock_extract.side_effect = lambda pdf_bytes, filename, strategy: {
+                'filename': filename, 'text': 'Content', 'errors': []
+            }
+            
+            first = pdf_processor.process_multiple_pdfs('test-bucket', ['pdf1.pdf'])
+            second = pdf_processor.process_multiple_pdfs('test-bucket', ['pdf1.pdf'])
+        
+        assert first == second
+        assert mock_extract.call_count == 1
+        assert mock_body.read.call_count == 1
+        assert pdf_processor.s3_client.head_object.call_count == 2
+        pdf_processor.s3_client.get_object.assert_called_once()
+    
+    def test_process_multiple_pdfs_reports_progress(self, pdf_processor):
+        """Test that the progress callback is invoked once per completed PDF"""
+        pdf_keys = ['pdf1.pdf', 'pdf2.pdf', 'pdf3.pdf']
+        progress_updates = []
+        
+        with patch.object(pdf_processor, '_download_pdf', return_value=(None, b'%PDF-1.4', None)):
+            with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+                mock_extract.side_effect = lambda pdf_bytes, filename, strategy: {'filename': filename, 'text': 'Content'}
+                
+                results = pdf_processor.process_multiple_pdfs(
+                    'test-bucket', pdf_keys, max_workers=2,
+                    progress_callback=lambda done, total: progress_updates.append((done, total))
+                )
+        
+        assert len(results) == 3
+        assert progress_updates == [(1, 3), (2, 3), (3, 3)]
+
+
+SAMPLE_PDFS = {
+    'financial_statements/Q1_2023.pdf': b'%PDF-1.4 Q1 statement\n%%EOF\n',
+    'financial_statements/Q2_2023.pdf': b'%PDF-1.4 Q2 statement\n%%EOF\n',
+    'financial_statements/notes.txt': b'not a pdf'
+}
+
+@pytest.fixture(scope="module")
+def s3_bucket():
+    """Fake S3 bucket in moto's in-process S3 holding SAMPLE_PDFS, shared by the tests using it"""
+    mock_aws = pytest.importorskip("moto").mock_aws
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='test-bucket')
+        for key, body in SAMPLE_PDFS.items():
+            client.put_object(Bucket='test-bucket', Key=key, Body=body)
+        yield client
+
+class TestPDFProcessorS3:
+    """PDFProcessor against a fake S3 bucket, so the real botocore request paths run"""
+    
+    @pytest.fixture
+    def pdf_processor(self, s3_bucket):
+        """PDFProcessor reading the fake bucket in multi-bucket mode"""
+        processor = PDFProcessor(session=boto3.Session(region_name='us-east-1'))
+        processor.s3_client = s3_bucket
+        processor.s3_config = Mock(use_single_bucket=False, input_bucket=None)
+        return processor
+    
+    def test_list_pdfs_from_s3_success(self, pdf_processor):
+        """Test that only PDFs are listed, with the size and ETag S3 reports"""
+        result = pdf_processor.list_pdfs_from_s3('test-bucket')
+        
+        assert sorted(pdf['filename'] for pdf in result) == ['Q1_2023.pdf', 'Q2_2023.pdf']
+        for pdf in result:
+            assert pdf['size'] == len(SAMPLE_PDFS[pdf['key']])
+            assert pdf['etag']
+            assert pdf['bucket'] == 'test-bucket'
+    
+    def test_download_pdf_success(self, pdf_processor):
+        """Test downloading with and without a size known from the listing"""
+        key = 'financial_statements/Q1_2023.pdf'
+        
+        assert pdf_processor.download_pdf('test-bucket', key) == SAMPLE_PDFS[key]
+        assert pdf_processor.download_pdf('test-bucket', key, known_size=len(SAMPLE_PDFS[key])) == SAMPLE_PDFS[key]
+    
+    def test_download_pdf_missing_key(self, pdf_processor):
+        """Test that a missing object surfaces as a download failure"""
+        with pytest.raises(Exception) as exc_info:
+            pdf_processor.download_pdf('test-bucket', 'financial_statements/missing.pdf')
+        
+        assert "Failed to download PDF" in str(exc_info.value)
+    
+    def test_process_listed_pdfs_reuses_cached_extraction(self, pdf_processor):
+        """Test that listed PDFs are extracted once and then served from the ETag cache"""
+        pdf_infos = pdf_processor.list_pdfs_from_s3('test-bucket')
+        
+        with patch.object(pdf_processor, 'extract_text_from_pdf') as mock_extract:
+            mock_extract.side_effect = lambda pdf_bytes, filename, strategy: {
+                'filename': filename, 'text': pdf_bytes.decode(), 'errors': []
+            }
+            
+            first = pdf_processor.process_multiple_pdfs('test-bucket', pdf_infos)
+            second = pdf_processor.process_multiple_pdfs('test-bucket', pdf_infos)
+        
+        assert first == second
+        assert [result['text'] for result in first] == [SAMPLE_PDFS[pdf['key']].decode() for pdf in pdf_infos]
+        assert mock_extract.call_count == len(pdf_infos)